@@ -0,0 +1,127 @@
+"""Benchmark decoding a json show database.
+
+Compares building the decoded JSON tree and then the objects from it,
+both with the two pass decoder used before decode_registered and with
+today's Deserializer, with building the objects while the JSON is parsed
+(decode_registered as the object_hook). Time is the best of --repeat
+runs, and peak is the largest amount of memory allocated during a run.
+
+Usage:
+    $ python benchmarks/bench_decode.py --shows 1000 --seasons 8 --episodes 12
+"""
+import argparse
+import json
+import os
+import sys
+from tempfile import TemporaryDirectory
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bench_storage import synthetic_showdb
+from tracker.utils import decode_registered, Deserializer, EncodeShow, registry
+
+
+class TwoPassDeserializer:
+    """The Deserializer which decode_registered replaced, kept to compare against.
+
+    Each object is built with the decoded JSON of its attributes, then
+    the dicts in its attributes, and in the attributes of each season,
+    are replaced with the objects they encode. The attributes are read
+    through _fields, as the classes no longer have an instance dict.
+    """
+    def __init__(self, deserialized_data):
+        self.deserialized_data = deserialized_data
+        self.db = self._reconstruct_object(deserialized_data)
+
+    def deserialize(self):
+        for show, details in self.db._shows.items():
+            self.db._shows[show] = self.deserialize_show(details)
+        return self.db
+
+    @classmethod
+    def deserialize_show(cls, details):
+        show = cls._reconstruct_object(details)
+        cls._populate_attributes(show)
+        return show
+
+    @classmethod
+    def _populate_attributes(cls, obj, traverse_list=True):
+        for key in obj._fields:
+            value = getattr(obj, key)
+            if isinstance(value, dict):
+                setattr(obj, key, cls._reconstruct_object(value))
+            elif isinstance(value, list):
+                setattr(obj, key, [cls._reconstruct_object(details) for details in value])
+                if traverse_list:
+                    for season in getattr(obj, key):
+                        cls._populate_attributes(season, traverse_list=False)
+
+    @staticmethod
+    def _reconstruct_object(deserialized_data):
+        for key, value in deserialized_data.items():
+            key = key.strip('__')
+            if key in registry:
+                kwargs = dict(value.items())
+                return registry[key](**kwargs)
+
+
+def decode_two_pass(data):
+    return TwoPassDeserializer(json.loads(data)).deserialize()
+
+
+def decode_tree(data):
+    return Deserializer(json.loads(data)).deserialize()
+
+
+def decode_hook(data):
+    return json.loads(data, object_hook=decode_registered)
+
+
+def measure(repeat, func, data):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    func(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--shows', default=1000, type=int)
+    parser.add_argument('--seasons', default=8, type=int)
+    parser.add_argument('--episodes', default=12, type=int)
+    parser.add_argument('--repeat', default=5, type=int)
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as database_dir:
+        showdb = synthetic_showdb(database_dir, args.shows, args.seasons, args.episodes)
+    data = json.dumps(showdb, cls=EncodeShow, sort_keys=True)
+    for name, func in (('two pass', decode_two_pass), ('object_hook', decode_hook)):
+        if json.dumps(func(data), cls=EncodeShow, sort_keys=True) != data:
+            raise SystemExit('{} did not rebuild the database exactly'.format(name))
+
+    print('{} shows, {} seasons of {} episodes, {:.0f}kB of json'.format(
+        args.shows, args.seasons, args.episodes, len(data) / 1024,
+    ))
+    print('{:<14}{:>12}{:>12}'.format('decoder', 'time', 'peak'))
+    decoders = (
+        ('two pass', decode_two_pass),
+        ('Deserializer', decode_tree),
+        ('object_hook', decode_hook),
+    )
+    for name, func in decoders:
+        elapsed, peak = measure(args.repeat, func, data)
+        print('{:<14}{:>10.1f}ms{:>10.1f}MB'.format(name, elapsed * 1000, peak / 2**20))
+
+
+if __name__ == '__main__':
+    main()
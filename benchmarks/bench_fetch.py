@@ -0,0 +1,108 @@
+"""Benchmark populating, importing and refreshing shows against a local API stand-in.
+
+Synthetic shows are served by tracker.standin with the given latency,
+jitter and error rate, so results are repeatable and need no network.
+
+Usage:
+    $ python benchmarks/bench_fetch.py --shows 100 --latency 0.05 --concurrency 16
+"""
+import argparse
+import collections
+import os
+import sys
+from tempfile import TemporaryDirectory
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tracker
+from tracker.standin import StandInServer, write_synthetic_fixtures
+
+
+def timed(label, requests, func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    print('{:<24}{:>10.3f}s{:>12.1f} req/s'.format(label, elapsed, requests / elapsed))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--shows', default=50, type=int)
+    parser.add_argument('--seasons', default=5, type=int)
+    parser.add_argument('--episodes', default=10, type=int)
+    parser.add_argument('--latency', default=0.05, type=float)
+    parser.add_argument('--jitter', default=0.01, type=float)
+    parser.add_argument('--error-rate', default=0, type=float)
+    parser.add_argument('--concurrency', default=tracker.api.DEFAULT_CONCURRENCY, type=int)
+    parser.add_argument('--rate', default=1000, type=float)
+    parser.add_argument('--seed', default=0, type=int)
+    args = parser.parse_args()
+
+    ShowTitle = collections.namedtuple('ShowTitle', ('show_title',))
+    titles = ['Synthetic Show {}'.format(n) for n in range(args.shows)]
+    requests_per_show = 2 + args.seasons
+
+    with TemporaryDirectory() as fixture_dir, TemporaryDirectory() as database_dir:
+        write_synthetic_fixtures(fixture_dir, titles, args.seasons, args.episodes)
+        server = StandInServer(
+            fixture_dir,
+            latency=args.latency,
+            jitter=args.jitter,
+            error_rate=args.error_rate,
+            seed=args.seed,
+        )
+        with server:
+            tracker.set_api_url(server.url)
+            tracker.set_rate_limit(args.rate)
+
+            print('{} shows, {} seasons of {} episodes, latency={}s, concurrency={}'.format(
+                args.shows, args.seasons, args.episodes, args.latency, args.concurrency,
+            ))
+            timed(
+                'populate_seasons',
+                requests_per_show,
+                tracker.Show(titles[0]).populate_seasons,
+                concurrency=args.concurrency,
+            )
+
+            # The round-trip floor: every request spread evenly across the
+            # concurrent requests allowed, but no less than the three round
+            # trips (search, details, seasons) a single show needs.
+            total_requests = args.shows * requests_per_show
+            floor = args.latency * max(3, -(-total_requests // args.concurrency))
+            print('{:<24}{:>10.3f}s'.format('round-trip floor', floor))
+
+            showdb = tracker.ShowDatabase(database_dir)
+            timed(
+                'watchlist import',
+                args.shows * requests_per_show,
+                showdb.add_shows,
+                [ShowTitle(t) for t in titles],
+                concurrency=args.concurrency,
+            )
+            engine = tracker.FetchEngine(concurrency=args.concurrency)
+            shows = [tracker.Show(t) for t in titles]
+            timed(
+                'pipeline, no cache',
+                args.shows * requests_per_show,
+                engine.run,
+                engine.populate_shows,
+                shows,
+            )
+            for stats in engine.stage_stats.values():
+                print('    {!r}'.format(stats))
+
+            timed(
+                'refresh',
+                args.shows * 2,
+                showdb.refresh_shows,
+                concurrency=args.concurrency,
+            )
+
+        tracker.close_session()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Benchmark the memory taken by a loaded show database.
+
+A synthetic show database is written in the chosen format, then loaded
+by a fresh interpreter, so memory freed while building and writing it is
+not reused by the load. Resident memory is measured before and after
+loading, with every show decoded, and divided by the number of episodes.
+The scan column is the time taken to read the IMDb rating of every
+episode once loaded.
+
+Usage:
+    $ python benchmarks/bench_memory.py --shows 100000 --seasons 2 --episodes 10
+    $ python benchmarks/bench_memory.py --shows 10000 --format json
+"""
+import argparse
+import gc
+import os
+import subprocess
+import sys
+from tempfile import TemporaryDirectory
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bench_storage import synthetic_showdb
+import tracker
+from tracker.storage import FORMATS
+
+
+def resident_memory():
+    """Return the resident memory of this process in bytes."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        # Not Linux: fall back to the peak, in kB on Linux and bytes on macOS
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def load(path):
+    """Load the database at *path*, and print the memory it takes."""
+    gc.collect()
+    before = resident_memory()
+    start = time.perf_counter()
+    showdb = tracker.load_database(path)
+    shows = list(showdb._shows.values())
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    used = resident_memory() - before
+
+    start = time.perf_counter()
+    rated = sum(
+        rating is not None for show in shows for season in show._seasons
+        for rating in season.imdb_ratings()
+    )
+    scan = time.perf_counter() - start
+
+    episodes = sum(len(season) for show in shows for season in show._seasons)
+    print('{:<10}{:>12}{:>10.0f}MB{:>12.0f}B{:>11.0f}ms{:>11.0f}ms'.format(
+        showdb.storage_format, episodes, used / 2**20, used / episodes, elapsed * 1000, scan * 1000,
+    ))
+    assert rated == episodes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--shows', default=100000, type=int)
+    parser.add_argument('--seasons', default=2, type=int)
+    parser.add_argument('--episodes', default=10, type=int)
+    parser.add_argument('--format', default='binary', choices=FORMATS, dest='storage_format')
+    parser.add_argument('--load', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.load:
+        load(args.load)
+        return
+
+    with TemporaryDirectory() as database_dir:
+        showdb = synthetic_showdb(database_dir, args.shows, args.seasons, args.episodes)
+        showdb.write_db(storage_format=args.storage_format)
+        path = showdb.path_to_db
+        del showdb
+
+        print('{} shows, {} seasons of {} episodes'.format(args.shows, args.seasons, args.episodes))
+        print('{:<10}{:>12}{:>12}{:>13}{:>13}{:>13}'.format(
+            'format', 'episodes', 'resident', 'per episode', 'load', 'scan',
+        ), flush=True)
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--load', path], check=True)
+
+
+if __name__ == '__main__':
+    main()
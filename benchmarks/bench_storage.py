@@ -0,0 +1,98 @@
+"""Benchmark the size, write and load time of each database storage format.
+
+A synthetic show database is built in memory, so no requests are made.
+The update column is the time taken to write the database after one show
+has changed, and the one show column the time taken to load the database
+and read a single show from it, as a single show command does.
+
+Usage:
+    $ python benchmarks/bench_storage.py --shows 200 --seasons 8 --episodes 12
+    $ python benchmarks/bench_storage.py --shows 10000 --seasons 10 --episodes 10 \\
+          --formats binary,columnar --repeat 1
+"""
+import argparse
+import os
+import sys
+from tempfile import TemporaryDirectory
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tracker
+from tracker.storage import FORMATS, shard_dir
+
+
+def synthetic_showdb(database_dir, shows, seasons, episodes):
+    showdb = tracker.ShowDatabase(database_dir)
+    for n in range(shows):
+        show = tracker.Show('Synthetic Show {}'.format(n), imdb_id='tt{:07d}'.format(n))
+        for s in range(1, seasons+1):
+            season = tracker.Season()
+            for e in range(1, episodes+1):
+                season.add_episode(tracker.Episode(
+                    e, s, 'Episode #{}.{} of show {}'.format(s, e, n), {'imdb': 7 + (e % 30) / 10},
+                ))
+            season.episodes_this_season = len(season)
+            show._seasons.append(season)
+        showdb._shows[show.ltitle] = show
+    return showdb
+
+
+def database_size(path):
+    size = os.path.getsize(path)
+    if os.path.isdir(shard_dir(path)):
+        with os.scandir(shard_dir(path)) as entries:
+            size += sum(entry.stat().st_size for entry in entries)
+    return size
+
+
+def best_of(repeat, func, *args):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--shows', default=200, type=int)
+    parser.add_argument('--seasons', default=8, type=int)
+    parser.add_argument('--episodes', default=12, type=int)
+    parser.add_argument('--repeat', default=5, type=int)
+    parser.add_argument('--formats', default=','.join(FORMATS), help='comma separated formats')
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as database_dir:
+        showdb = synthetic_showdb(database_dir, args.shows, args.seasons, args.episodes)
+        print('{} shows, {} seasons of {} episodes'.format(args.shows, args.seasons, args.episodes))
+        print('{:<10}{:>12}{:>12}{:>12}{:>12}{:>12}'.format(
+            'format', 'size', 'write', 'update', 'load', 'one show',
+        ))
+
+        def write_all(storage_format):
+            showdb._changed = None
+            showdb.write_db(storage_format=storage_format)
+
+        def write_one():
+            showdb.mark_changed('synthetic_show_0')
+            showdb.write_db()
+
+        def load_one(path):
+            tracker.load_database(path)._shows['synthetic_show_0']._seasons[0][0]
+
+        for storage_format in args.formats.split(','):
+            write = best_of(args.repeat, write_all, storage_format)
+            size = database_size(showdb.path_to_db)
+            update = best_of(args.repeat, write_one)
+            load = best_of(args.repeat, tracker.load_database, showdb.path_to_db)
+            one = best_of(args.repeat, load_one, showdb.path_to_db)
+            print('{:<10}{:>10.0f}kB{:>11.1f}ms{:>11.1f}ms{:>11.1f}ms{:>11.1f}ms'.format(
+                storage_format, size / 1024, write * 1000, update * 1000, load * 1000, one * 1000,
+            ))
+
+
+if __name__ == '__main__':
+    main()
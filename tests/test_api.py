@@ -0,0 +1,644 @@
+import collections
+import copy
+from tempfile import TemporaryDirectory
+import json
+import os
+import time
+import unittest
+
+from .context import tracker
+from tracker import api
+from tracker.cache import payload_key, ResponseCache
+from tracker.standin import (
+    fixture_name,
+    StandInServer,
+    write_fixture,
+    write_synthetic_fixtures,
+)
+from tracker.exceptions import (
+    APIConnectionError,
+    APIResponseError,
+    CircuitOpenError,
+    DeadlineExceededError,
+)
+
+
+def setUpModule():
+    # Requests made with a fake session share the process wide rate limit
+    api.set_rate_limit(10000)
+
+
+def tearDownModule():
+    api.set_rate_limit()
+
+
+class FakeResponse:
+    """Minimal stand-in for a requests.Response"""
+    def __init__(self, payload, status_code=200, headers=None):
+        self.payload = payload
+        self.content = json.dumps(payload).encode('utf-8')
+        self.status_code = status_code
+        self.headers = {} if headers is None else headers
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+class FakeSession:
+    """Record the parameters of each request and return canned responses
+
+    *statuses* holds a list of response statuses to return, in turn, before
+    the canned response is returned with a 200 status.
+    """
+    def __init__(self, responses, delays=None, statuses=None):
+        self.responses = responses
+        self.delays = {} if delays is None else delays
+        self.statuses = [] if statuses is None else statuses
+        self.requests = []
+
+    def get(self, url, params=None, timeout=None):
+        key = json.dumps(params, sort_keys=True)
+        self.requests.append(params)
+        time.sleep(self.delays.get(key, 0))
+        if self.statuses:
+            return FakeResponse({}, status_code=self.statuses.pop(0))
+        return FakeResponse(self.responses[key])
+
+
+def fake_show_responses(total_seasons=3):
+    """Return canned search, details and season responses for a fake show"""
+    with open('got_s01_response.json', 'r') as f:
+        season_response = json.load(f)
+
+    responses = {
+        json.dumps({'s': 'game of thrones'}, sort_keys=True): {
+            'Response': 'True',
+            'Search': [
+                {'Type': 'movie', 'imdbID': 'tt0000001'},
+                {'Type': 'series', 'imdbID': 'tt0944947'},
+            ],
+        },
+        json.dumps({'i': 'tt0944947'}, sort_keys=True): {
+            'Title': 'Game of Thrones',
+            'totalSeasons': str(total_seasons),
+        },
+    }
+    for season in range(1, total_seasons+1):
+        response = copy.deepcopy(season_response)
+        response['Season'] = str(season)
+        payload = {'i': 'tt0944947', 'season': season}
+        responses[json.dumps(payload, sort_keys=True)] = response
+
+    return responses
+
+
+class SessionTestCase(unittest.TestCase):
+    """Test case for the shared HTTP session"""
+    def tearDown(self):
+        api.close_session()
+
+    def test_shared_session_reused(self):
+        """Test that every caller is handed the same session"""
+        self.assertIs(api.get_session(), api.get_session())
+
+    def test_close_session(self):
+        """Test that a new session is created after the shared one is closed"""
+        session = api.get_session()
+        api.close_session()
+        self.assertIsNot(session, api.get_session())
+
+    def test_pool_size(self):
+        """Test that the connection pool is sized as requested"""
+        session = api.create_session(pool_size=32)
+        adapter = session.get_adapter(api.API_URL)
+        self.assertEqual(adapter._pool_maxsize, 32)
+
+    def test_passed_session_shares_limits(self):
+        """Test that clients for passed sessions share the rate limit and breakers"""
+        first = api.get_client(session=FakeSession({}))
+        second = api.get_client(session=FakeSession({}))
+        self.assertIs(first.rate_limiter, second.rate_limiter)
+        self.assertIs(first.rate_limiter, api.get_client().rate_limiter)
+        self.assertIs(first.breaker(), second.breaker())
+        self.assertIs(first.breaker(), api.get_client().breaker())
+
+    def test_request_show_info_uses_passed_session(self):
+        """Test that the passed session is used to make the request"""
+        with open('got_s01_response.json', 'r') as f:
+            expected_response = json.load(f)
+        payload = {'i': 'tt0944947', 'season': 1}
+        session = FakeSession({json.dumps(payload, sort_keys=True): expected_response})
+
+        show = tracker.Show(title='Game of Thrones', imdb_id='tt0944947')
+        response = show.request_show_info(season=1, session=session)
+
+        self.assertDictEqual(response, expected_response)
+        self.assertEqual(session.requests, [payload])
+
+
+class TokenBucketTestCase(unittest.TestCase):
+    """Test case for the request rate limiter"""
+    def test_burst_not_delayed(self):
+        """Test that a burst of requests up to the bucket size is not delayed"""
+        bucket = api.TokenBucket(rate=1, burst=5)
+        start = time.monotonic()
+        for _ in range(5):
+            bucket.acquire()
+        self.assertLess(time.monotonic() - start, 0.5)
+
+    def test_acquire_waits_for_token(self):
+        """Test that requests beyond the burst are paced at the rate"""
+        bucket = api.TokenBucket(rate=50, burst=1)
+        start = time.monotonic()
+        for _ in range(4):
+            bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+    def test_acquire_deadline(self):
+        """Test that we do not wait for a token past the deadline"""
+        bucket = api.TokenBucket(rate=0.1, burst=1)
+        bucket.acquire()
+        with self.assertRaises(DeadlineExceededError):
+            bucket.acquire(deadline=time.monotonic() + 1)
+
+    def test_throttle_and_recover(self):
+        """Test that the rate is halved, and recovers to the configured rate"""
+        bucket = api.TokenBucket(rate=16)
+        bucket.throttle()
+        self.assertEqual(bucket.rate, 8)
+        for _ in range(20):
+            bucket.recover()
+        self.assertEqual(bucket.rate, 16)
+
+
+class CircuitBreakerTestCase(unittest.TestCase):
+    """Test case for the circuit breaker"""
+    def test_open_after_consecutive_failures(self):
+        """Test that requests fail fast once the failure threshold is reached"""
+        breaker = api.CircuitBreaker(failure_threshold=3)
+        for _ in range(3):
+            breaker.before_request()
+            breaker.record_failure()
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_request()
+
+    def test_success_resets_failures(self):
+        """Test that a success resets the consecutive failure count"""
+        breaker = api.CircuitBreaker(failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.before_request()
+
+    def test_trial_request_after_reset_timeout(self):
+        """Test that one trial request is allowed once the reset timeout passes"""
+        breaker = api.CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        breaker.before_request()
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_request()
+        breaker.record_success()
+        breaker.before_request()
+
+
+class ClientTestCase(unittest.TestCase):
+    """Test case for retrying requests in the API client"""
+    def setUp(self):
+        self.payload = {'i': 'tt0944947'}
+        self.responses = {json.dumps(self.payload, sort_keys=True): {'Title': 'Game of Thrones'}}
+
+    def test_retry_server_error(self):
+        """Test that we retry after a 5xx response"""
+        session = FakeSession(self.responses, statuses=[503, 502])
+        client = api.Client(session, backoff=0.001)
+        self.assertEqual(json.loads(client.request_content(self.payload))['Title'], 'Game of Thrones')
+        self.assertEqual(len(session.requests), 3)
+
+    def test_rate_limited_response_throttles(self):
+        """Test that a 429 response lowers the request rate"""
+        session = FakeSession(self.responses, statuses=[429])
+        client = api.Client(session, rate_limiter=api.TokenBucket(rate=100), backoff=0.001)
+        client.request_content(self.payload)
+        self.assertLess(client.rate_limiter.rate, 100)
+
+    def test_client_error_not_retried(self):
+        """Test that a 4xx response other than 429 is raised immediately"""
+        session = FakeSession(self.responses, statuses=[401])
+        with self.assertRaises(APIResponseError):
+            api.Client(session, backoff=0.001).request_content(self.payload)
+        self.assertEqual(len(session.requests), 1)
+
+    def test_retries_exhausted(self):
+        """Test that the last error is raised once retries are exhausted"""
+        session = FakeSession(self.responses, statuses=[500] * 3)
+        with self.assertRaises(APIResponseError):
+            api.Client(session, retries=2, backoff=0.001).request_content(self.payload)
+        self.assertEqual(len(session.requests), 3)
+
+    def test_half_open_trial_client_error(self):
+        """Test that a trial request answered with a 4xx closes the circuit"""
+        session = FakeSession(self.responses, statuses=[503, 404])
+        client = api.Client(session, retries=0, backoff=0.001)
+        client.breaker().failure_threshold = 1
+        client.breaker().reset_timeout = 0
+        for _ in range(2):
+            with self.assertRaises(APIResponseError):
+                client.request_content(self.payload)
+        self.assertEqual(json.loads(client.request_content(self.payload))['Title'], 'Game of Thrones')
+
+    def test_half_open_trial_deadline(self):
+        """Test that a trial request which times out waiting for a token ends the trial"""
+        session = FakeSession(self.responses, statuses=[503])
+        bucket = api.TokenBucket(rate=100, burst=1)
+        client = api.Client(session, rate_limiter=bucket, retries=0, deadline=0.001)
+        breaker = client.breaker()
+        breaker.failure_threshold = 1
+        breaker.reset_timeout = 0
+        with self.assertRaises(APIResponseError):
+            client.request_content(self.payload)
+        bucket.rate = 0.01
+        with self.assertRaises(DeadlineExceededError):
+            client.request_content(self.payload)
+        self.assertFalse(breaker._trial_in_progress)
+
+    def test_connection_error(self):
+        """Test that a connection failure is raised as a connection error"""
+        class RefusingSession:
+            def get(self, url, params=None, timeout=None):
+                raise api.requests.exceptions.ConnectionError('Connection refused')
+
+        with self.assertRaises(APIConnectionError):
+            api.Client(RefusingSession(), retries=0).request_content(self.payload)
+
+    def test_deadline_exceeded(self):
+        """Test that we do not back off past the request deadline"""
+        session = FakeSession(self.responses, statuses=[503])
+        client = api.Client(session, deadline=0.1, backoff=10)
+        client._backoff_delay = lambda attempt, retry_after=None: 10
+        with self.assertRaises(DeadlineExceededError):
+            client.request_content(self.payload)
+
+
+class FetchEngineTestCase(unittest.TestCase):
+    """Test case for populating shows with the FetchEngine"""
+    def test_populate_seasons_in_season_order(self):
+        """Test that seasons are stored in order when responses arrive out of order"""
+        first_season = json.dumps({'i': 'tt0944947', 'season': 1}, sort_keys=True)
+        session = FakeSession(fake_show_responses(), delays={first_season: 0.05})
+        show = tracker.Show('Game of Thrones')
+        show.populate_seasons(session=session, concurrency=4)
+        self.assertEqual([s[0].season for s in show._seasons], [1, 2, 3])
+
+    def test_populate_seasons_picks_series(self):
+        """Test that we pick the series rather than a film with the same name"""
+        show = tracker.Show('Game of Thrones')
+        show.populate_seasons(session=FakeSession(fake_show_responses()))
+        self.assertEqual(show.imdb_id, 'tt0944947')
+
+    def test_populate_seasons_request_count(self):
+        """Test that we make one search, one details and one request per season"""
+        session = FakeSession(fake_show_responses(total_seasons=5))
+        show = tracker.Show('Game of Thrones')
+        show.populate_seasons(session=session)
+        self.assertEqual(len(session.requests), 7)
+
+    def test_populate_seasons_show_not_found(self):
+        """Test that we raise a ShowNotFoundError for an unknown show"""
+        responses = {
+            json.dumps({'s': 'moonboy'}, sort_keys=True): {'Response': 'False'},
+        }
+        show = tracker.Show('Moonboy')
+        with self.assertRaises(tracker.ShowNotFoundError):
+            show.populate_seasons(session=FakeSession(responses))
+
+
+class AddShowsTestCase(unittest.TestCase):
+    """Test case for adding many shows to a ShowDatabase at once"""
+    def setUp(self):
+        self.ShowTitle = collections.namedtuple('ShowTitle', ('show_title',))
+        responses = fake_show_responses(total_seasons=2)
+        responses[json.dumps({'s': 'moonboy'}, sort_keys=True)] = {'Response': 'False'}
+        self.session = FakeSession(responses)
+
+    def test_add_shows_from_watchlist_skips_unknown_show(self):
+        """Test that an unknown show is skipped when adding from a watchlist"""
+        with TemporaryDirectory() as dirname:
+            showdb = tracker.ShowDatabase(dirname)
+            showdb.add_shows(
+                [self.ShowTitle('Moonboy'), self.ShowTitle('Game of Thrones')],
+                from_watchlist=True,
+                session=self.session,
+            )
+        self.assertEqual(list(showdb), ['game_of_thrones'])
+
+    def test_add_shows_raises_unknown_show(self):
+        """Test that known shows are added before raising for an unknown show"""
+        with TemporaryDirectory() as dirname:
+            showdb = tracker.ShowDatabase(dirname)
+            with self.assertRaises(tracker.ShowNotFoundError):
+                showdb.add_shows(
+                    [self.ShowTitle('Moonboy'), self.ShowTitle('Game of Thrones')],
+                    session=self.session,
+                )
+        self.assertIn('game_of_thrones', showdb)
+
+    def test_add_shows_populates_each_show(self):
+        """Test that every show found is populated"""
+        with TemporaryDirectory() as dirname:
+            showdb = tracker.ShowDatabase(dirname)
+            showdb.add_shows(
+                [self.ShowTitle('Game of Thrones'), self.ShowTitle('Moonboy')],
+                from_watchlist=True,
+                session=self.session,
+            )
+        self.assertEqual(len(showdb._shows['game_of_thrones']._seasons), 2)
+
+    def test_add_shows_identical_requests_made_once(self):
+        """Test that titles which sanitize to the same request share requests"""
+        titles = ['Game of Thrones', 'Game of Thrones: Extended', 'GAME OF THRONES']
+        with TemporaryDirectory() as dirname:
+            showdb = tracker.ShowDatabase(dirname)
+            showdb.add_shows([self.ShowTitle(t) for t in titles], session=self.session)
+        self.assertEqual(len(showdb._shows), 2)
+        self.assertEqual(len(self.session.requests), 4)
+
+    def test_add_shows_without_cache(self):
+        """Test that no response cache is written when the cache is disabled"""
+        with TemporaryDirectory() as dirname:
+            showdb = tracker.ShowDatabase(dirname)
+            showdb.add_shows([self.ShowTitle('Game of Thrones')], session=self.session, cache=False)
+            self.assertFalse(os.path.exists(os.path.join(dirname, '.cache')))
+        self.assertIn('game_of_thrones', showdb)
+
+
+class ShowPipelineTestCase(unittest.TestCase):
+    """Test case for populating shows through the staged ShowPipeline"""
+    def setUp(self):
+        responses = fake_show_responses(total_seasons=2)
+        responses[json.dumps({'s': 'moonboy'}, sort_keys=True)] = {'Response': 'False'}
+        details = json.dumps({'i': 'tt0944947'}, sort_keys=True)
+        self.session = FakeSession(responses, delays={details: 0.05})
+        self.shows = [tracker.Show('Game of Thrones'), tracker.Show('Moonboy')]
+
+    def populate(self, stage_concurrency=None, queue_size=None):
+        engine = tracker.FetchEngine(session=self.session, concurrency=4)
+        results = engine.run(engine.populate_shows, self.shows, stage_concurrency, queue_size)
+        return engine, results
+
+    def test_results_in_show_order(self):
+        """Test that each show gets its own result, in the order given"""
+        _, results = self.populate()
+        self.assertIsNone(results[0])
+        self.assertIsInstance(results[1], tracker.ShowNotFoundError)
+        self.assertEqual(len(self.shows[0]._seasons), 2)
+
+    def test_stages_overlap(self):
+        """Test that the next show is searched for while the first is in a later stage"""
+        self.populate(stage_concurrency=1)
+        requests = self.session.requests
+        self.assertLess(
+            requests.index({'s': 'moonboy'}),
+            requests.index({'i': 'tt0944947', 'season': 1}),
+        )
+
+    def test_single_worker_small_queues(self):
+        """Test that a pipeline with one worker per stage and no slack finishes"""
+        _, results = self.populate(stage_concurrency=1, queue_size=1)
+        self.assertIsNone(results[0])
+
+    def test_stage_stats(self):
+        """Test that the shows handled and errors raised are counted per stage"""
+        engine, _ = self.populate()
+        stats = engine.stage_stats
+        self.assertEqual((stats['search'].shows, stats['search'].errors), (2, 1))
+        self.assertEqual(stats['details'].shows, 1)
+        self.assertEqual(stats['seasons'].shows, 1)
+        self.assertGreater(stats['details'].throughput, 0)
+
+
+class RefreshShowTestCase(unittest.TestCase):
+    """Test case for incrementally refreshing shows"""
+    def setUp(self):
+        self.tempdir = TemporaryDirectory()
+        self.showdb = tracker.ShowDatabase(self.tempdir.name)
+        ShowTitle = collections.namedtuple('ShowTitle', ('show_title',))
+        self.showdb.add_show(
+            ShowTitle('Game of Thrones'),
+            session=FakeSession(fake_show_responses(total_seasons=2)),
+        )
+        self.show = self.showdb._shows['game_of_thrones']
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_refresh_up_to_date_show(self):
+        """Test that refreshing an up to date show costs two requests"""
+        session = FakeSession(fake_show_responses(total_seasons=2))
+        self.showdb.refresh_shows(session=session)
+        self.assertEqual(
+            session.requests,
+            [{'i': 'tt0944947'}, {'i': 'tt0944947', 'season': 2}],
+        )
+
+    def test_refresh_new_seasons(self):
+        """Test that only the latest stored and new seasons are requested"""
+        session = FakeSession(fake_show_responses(total_seasons=4))
+        seasons = self.show._seasons
+        self.showdb.refresh_shows(session=session)
+
+        self.assertEqual(len(session.requests), 4)
+        self.assertIs(self.show._seasons, seasons)
+        self.assertEqual([s[0].season for s in self.show._seasons], [1, 2, 3, 4])
+
+    def test_refresh_failed_show_unchanged(self):
+        """Test that a show which cannot be refreshed is reported and left alone"""
+        seasons = list(self.show._seasons)
+        failed = self.showdb.refresh_shows(session=FakeSession({}))
+        self.assertEqual(failed, ['game_of_thrones'])
+        self.assertEqual(self.show._seasons, seasons)
+
+
+class ResponseCacheTestCase(unittest.TestCase):
+    """Test case for the on-disk response cache"""
+    def setUp(self):
+        self.tempdir = TemporaryDirectory()
+        self.cache = ResponseCache(self.tempdir.name, max_entries=10)
+        self.payload = {'i': 'tt0944947', 'season': 1}
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_payload_key_normalised(self):
+        """Test that payloads differing only in value types share a key"""
+        self.assertEqual(
+            payload_key({'season': 1, 'i': 'tt0944947'}),
+            payload_key({'i': 'tt0944947', 'season': '1'}),
+        )
+
+    def test_get_stored_response(self):
+        """Test that a stored response is returned and counted as a hit"""
+        self.cache.put(self.payload, b'{}')
+        self.assertEqual(self.cache.get(self.payload), b'{}')
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 0))
+
+    def test_get_missing_response(self):
+        """Test that a missing response is counted as a miss"""
+        self.assertIsNone(self.cache.get(self.payload))
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 1))
+
+    def test_get_expired_response(self):
+        """Test that a response older than its TTL is ignored"""
+        self.cache.put(self.payload, b'{}')
+        self.cache.ttls['current_season'] = 0
+        time.sleep(0.01)
+        self.assertEqual(self.cache.get(self.payload, kind='season'), b'{}')
+        self.assertIsNone(self.cache.get(self.payload, kind='current_season'))
+
+    def test_evict_least_recently_used(self):
+        """Test that the least recently read entries are evicted first"""
+        for i in range(10):
+            self.cache.put({'s': str(i)}, b'{}')
+            path = self.cache._path({'s': str(i)})
+            os.utime(path, (i, time.time()))
+        # Reading an entry marks it as recently used
+        self.cache.get({'s': '0'})
+        self.cache.put({'s': '10'}, b'{}')
+
+        self.assertEqual(len(self.cache), 9)
+        self.assertIsNotNone(self.cache.get({'s': '0'}))
+        self.assertIsNone(self.cache.get({'s': '1'}))
+
+    def test_populate_from_cache(self):
+        """Test that a second populate of the same show makes no requests"""
+        session = FakeSession(fake_show_responses())
+        tracker.Show('Game of Thrones').populate_seasons(session=session, cache=self.cache)
+        session.requests = []
+
+        show = tracker.Show('Game of Thrones')
+        show.populate_seasons(session=session, cache=self.cache)
+
+        self.assertEqual(session.requests, [])
+        self.assertEqual(len(show._seasons), 3)
+
+    def test_responses_kept_apart_by_api(self):
+        """Test that a response from one API is not served for another"""
+        self.cache.put(self.payload, b'{}', url='http://127.0.0.1:8000')
+        self.assertIsNone(self.cache.get(self.payload))
+        self.assertEqual(self.cache.get(self.payload, url='http://127.0.0.1:8000'), b'{}')
+
+    def test_populate_from_stand_in_not_cached_for_api(self):
+        """Test that responses fetched from a stand-in are not used for the real API"""
+        session = FakeSession(fake_show_responses())
+        self.addCleanup(api.set_api_url)
+        api.set_api_url('http://127.0.0.1:8000')
+        tracker.Show('Game of Thrones').populate_seasons(session=session, cache=self.cache)
+        api.set_api_url()
+        session.requests = []
+
+        tracker.Show('Game of Thrones').populate_seasons(session=session, cache=self.cache)
+        self.assertEqual(len(session.requests), 5)
+
+    def test_error_response_not_cached(self):
+        """Test that a show not found response is not stored"""
+        responses = {json.dumps({'s': 'moonboy'}, sort_keys=True): {'Response': 'False'}}
+        with self.assertRaises(tracker.ShowNotFoundError):
+            tracker.Show('Moonboy').populate_seasons(
+                session=FakeSession(responses),
+                cache=self.cache,
+            )
+        self.assertEqual(len(self.cache), 0)
+
+
+class StandInServerTestCase(unittest.TestCase):
+    """Test case for fetching shows from a local API stand-in"""
+    def setUp(self):
+        self.fixture_dir = TemporaryDirectory()
+        with open('got_s01_response.json', 'r') as f:
+            self.season_response = json.load(f)
+        write_fixture(self.fixture_dir.name, {'i': 'tt0944947', 'season': 1}, self.season_response)
+        write_synthetic_fixtures(self.fixture_dir.name, ['Synthetic Show'], seasons=3)
+
+    def tearDown(self):
+        api.set_api_url()
+        self.fixture_dir.cleanup()
+
+    def test_fixture_name(self):
+        """Test that fixture names ignore the API key and value types"""
+        self.assertEqual(
+            fixture_name({'season': 1, 'i': 'tt0944947', 'apikey': 'secret'}),
+            'i=tt0944947&season=1.json',
+        )
+
+    def test_request_show_info_from_stand_in(self):
+        """Test that request_show_info is answered by the stand-in"""
+        with StandInServer(self.fixture_dir.name) as server:
+            api.set_api_url(server.url)
+            show = tracker.Show(title='Game of Thrones', imdb_id='tt0944947')
+            self.assertDictEqual(show.request_show_info(season=1), self.season_response)
+
+    def test_populate_seasons_from_stand_in(self):
+        """Test that a synthetic show is populated from the stand-in"""
+        with StandInServer(self.fixture_dir.name) as server:
+            api.set_api_url(server.url)
+            show = tracker.Show('Synthetic Show')
+            show.populate_seasons()
+        self.assertEqual(len(show._seasons), 3)
+        self.assertEqual(show._seasons[2][9].title, 'Episode #3.10')
+
+    def test_not_recorded(self):
+        """Test that a request which has not been recorded is answered as the API does"""
+        with StandInServer(self.fixture_dir.name) as server:
+            api.set_api_url(server.url)
+            show = tracker.Show(title='Game of Thrones', imdb_id='tt0944947')
+            self.assertEqual(show.request_show_info(season=2)['Response'], 'False')
+
+    def test_not_recorded_status(self):
+        """Test that a request which has not been recorded can be answered with an error"""
+        with StandInServer(self.fixture_dir.name, not_recorded_status=404) as server:
+            api.set_api_url(server.url)
+            show = tracker.Show(title='Game of Thrones', imdb_id='tt0944947')
+            with self.assertRaises(APIResponseError):
+                show.request_show_info(season=2)
+
+    def test_watchlist_skips_not_recorded(self):
+        """Test that a watchlist import through the stand-in skips a show which is not recorded"""
+        ShowTitle = collections.namedtuple('ShowTitle', ('show_title'))
+        with StandInServer(self.fixture_dir.name) as server, TemporaryDirectory() as dirname:
+            api.set_api_url(server.url)
+            showdb = tracker.ShowDatabase(dirname)
+            showdb.add_shows(
+                [ShowTitle('Unrecorded Show'), ShowTitle('Synthetic Show')],
+                from_watchlist=True,
+            )
+        self.assertEqual(list(showdb), ['synthetic_show'])
+
+    def test_injected_errors_retried(self):
+        """Test that injected errors are retried by the client"""
+        with StandInServer(self.fixture_dir.name, error_rate=0.5, seed=1) as server:
+            client = api.Client(url=server.url, backoff=0.001, retries=10)
+            content = client.request_content({'i': 'tt0944947', 'season': 1})
+        self.assertDictEqual(json.loads(content), self.season_response)
+
+    def test_injected_latency(self):
+        """Test that responses are delayed by the configured latency"""
+        with StandInServer(self.fixture_dir.name, latency=0.1) as server:
+            client = api.Client(url=server.url)
+            start = time.monotonic()
+            client.request_content({'i': 'tt0944947', 'season': 1})
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+
+    def test_record_missing_response(self):
+        """Test that a missing response is fetched and saved in record mode"""
+        with TemporaryDirectory() as record_dir:
+            with StandInServer(self.fixture_dir.name) as upstream:
+                with StandInServer(record_dir, record_url=upstream.url) as server:
+                    client = api.Client(url=server.url)
+                    client.request_content({'i': 'tt0944947', 'season': 1})
+            self.assertEqual(os.listdir(record_dir), ['i=tt0944947&season=1.json'])
+
+
+if __name__ == '__main__':
+    unittest.main()
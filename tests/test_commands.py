@@ -14,9 +14,23 @@ from tracker.exceptions import (
     ShowNotFoundError,
     ShowNotTrackedError,
 )
+from tracker.journal import journal_path
+from tracker.storage import index_path
 from tracker.utils import lunderize
 
 
+def remove_index(path_to_db):
+    """Remove the offset index written alongside a database, if there is one"""
+    if os.path.exists(index_path(path_to_db)):
+        os.remove(index_path(path_to_db))
+
+
+def remove_journal(path_to_db):
+    """Remove the journal of a database, if there is one"""
+    if os.path.exists(journal_path(path_to_db)):
+        os.remove(journal_path(path_to_db))
+
+
 class CommandLineArgsTestCase(unittest.TestCase):
     """Base class to test command line arguments"""
     @classmethod
@@ -38,6 +52,8 @@ class TempTrackerSetupTestCase(unittest.TestCase):
 
     def tearDown(self):
         os.rename(self.path_to_backup_tracker, self.path_to_tracker)
+        remove_index(self.path_to_tracker)
+        remove_journal(self.path_to_tracker)
 
 
 class AddShowTestCase(TempTrackerSetupTestCase):
@@ -54,11 +70,12 @@ class AddShowTestCase(TempTrackerSetupTestCase):
     @classmethod
     def tearDownClass(cls):
         os.rename(cls.path_to_backup_showdb, cls.path_to_showdb)
+        remove_index(cls.path_to_showdb)
 
     def test_add_show(self):
         """Test that we correctly add a show"""
         show = 'house'
-        args = self.parser.parse_args(['--database-dir=example', 'add', show])
+        args = self.parser.parse_args(['--database-dir=example', '--no-cache', 'add', show])
         tracker.tracker(args)
         _, trackerdb = tracker.load_all_dbs(self.database_dir)
         self.assertTrue(show in trackerdb)
@@ -66,7 +83,7 @@ class AddShowTestCase(TempTrackerSetupTestCase):
     def test_add_show_set_next_episode(self):
         """Test that we can add a show and set the next episode at the same time correctly"""
         show = 'house s07e21'
-        args = self.parser.parse_args(['--database-dir=example', 'add', show])
+        args = self.parser.parse_args(['--database-dir=example', '--no-cache', 'add', show])
         expected_tracked_show = tracker.TrackedShow(
             title='House',
             _next_episode='S07E21',
@@ -79,14 +96,22 @@ class AddShowTestCase(TempTrackerSetupTestCase):
     def test_add_show_bad_season_episode_code(self):
         """Test that we raise an OutofBoundsError for a bad season-episode code"""
         show = 'house s99e99'
-        args = self.parser.parse_args(['--database-dir=example', 'add', show])
+        args = self.parser.parse_args(['--database-dir=example', '--no-cache', 'add', show])
         with self.assertRaises(SeasonOutOfBoundsError):
             tracker.tracker(args)
 
     def test_add_show_and_short_code(self):
         """Test adding a show and short-code at the same time"""
         show = 'supernatural'
-        args = self.parser.parse_args(['--database-dir=example', 'add', show, '--short-code=spn'])
+        args = self.parser.parse_args(
+            [
+                '--database-dir=example',
+                '--no-cache',
+                'add',
+                show,
+                '--short-code=spn',
+            ]
+        )
         tracker.tracker(args)
         _, trackerdb = tracker.load_all_dbs(self.database_dir)
         self.assertEqual(trackerdb._shows[show].short_code, 'SPN')
@@ -95,7 +120,16 @@ class AddShowTestCase(TempTrackerSetupTestCase):
         """Test adding a show and note at the same time"""
         show = 'supernatural'
         note = 'returns 14/10/2016'
-        args = self.parser.parse_args(['--database-dir=example', 'add', show, '--note', note])
+        args = self.parser.parse_args(
+            [
+                '--database-dir=example',
+                '--no-cache',
+                'add',
+                show,
+                '--note',
+                note,
+            ]
+        )
         tracker.tracker(args)
         _, trackerdb = tracker.load_all_dbs(self.database_dir)
         self.assertEqual(trackerdb._shows[show].notes, note)
@@ -112,6 +146,7 @@ class AddShowTestCase(TempTrackerSetupTestCase):
         args = self.parser.parse_args(
             [
                 '--database-dir=example',
+                '--no-cache',
                 'add',
                 show,
                 '--short-code=spn',
@@ -127,7 +162,16 @@ class AddShowTestCase(TempTrackerSetupTestCase):
     def test_add_short_code_using_short_option(self):
         """Test that the short-option works for adding a short-code"""
         show = 'supernatural'
-        args = self.parser.parse_args(['--database-dir=example', 'add', show, '-c', 'spn'])
+        args = self.parser.parse_args(
+            [
+                '--database-dir=example',
+                '--no-cache',
+                'add',
+                show,
+                '-c',
+                'spn',
+            ]
+        )
         tracker.tracker(args)
         _, trackerdb = tracker.load_all_dbs(self.database_dir)
         self.assertEqual(trackerdb._shows[show].short_code, 'SPN')
@@ -136,7 +180,16 @@ class AddShowTestCase(TempTrackerSetupTestCase):
         """Test adding a short-code to an existing show"""
         show = 'game of thrones'
         lshow = lunderize(show)
-        args = self.parser.parse_args(['--database-dir=example', 'add', show, '-c', 'got'])
+        args = self.parser.parse_args(
+            [
+                '--database-dir=example',
+                '--no-cache',
+                'add',
+                show,
+                '-c',
+                'got',
+            ]
+        )
         tracker.tracker(args)
         _, trackerdb = tracker.load_all_dbs(self.database_dir)
         self.assertEqual(trackerdb._shows[lshow].short_code, 'GOT')
@@ -149,6 +202,7 @@ class AddShowTestCase(TempTrackerSetupTestCase):
         args = self.parser.parse_args(
             [
                 '--database-dir=example',
+                '--no-cache',
                 'add',
                 show,
                 '--note',
@@ -162,14 +216,14 @@ class AddShowTestCase(TempTrackerSetupTestCase):
     def test_add_existing_show(self):
         """Test trying to add an existing show to the tracker"""
         show = 'game of thrones'
-        args = self.parser.parse_args(['--database-dir=example', 'add', show,])
+        args = self.parser.parse_args(['--database-dir=example', '--no-cache', 'add', show,])
         with self.assertRaises(ShowAlreadyTrackedError):
             tracker.tracker(args)
 
     def test_add_non_existent_show(self):
         """Test we catch attempting to add a non-existent show"""
         show = 'The Adventures of Moonboy and Patchface'
-        args = self.parser.parse_args(['--database-dir=example', 'add', show])
+        args = self.parser.parse_args(['--database-dir=example', '--no-cache', 'add', show])
         with self.assertRaises(ShowNotFoundError):
             tracker.tracker(args)
 
@@ -185,7 +239,7 @@ class ListOptionTestCase(CommandLineArgsTestCase):
         "Game of Thrones      S06E10         9.9      The Winds of Winter   \n"
         "Person of Interest   S05E01         9.5      B.S.O.D.              \n"
         )
-        args = self.parser.parse_args(['--list', '--database-dir=example'])
+        args = self.parser.parse_args(['--list', '--database-dir=example', '--no-cache'])
         f = io.StringIO()
         with redirect_stdout(f):
             tracker.tracker(args)
@@ -204,7 +258,14 @@ class DecArgumentTestCase(TempTrackerSetupTestCase):
 
     def test_dec_command(self):
         """Test that the dec command works as expected"""
-        args = self.parser.parse_args(['--database-dir=example', 'dec', 'game of thrones'])
+        args = self.parser.parse_args(
+            [
+                '--database-dir=example',
+                '--no-cache',
+                'dec',
+                'game of thrones',
+            ]
+        )
         expected_next_episode = 9
         tracker.tracker(args)
         _, trackerdb = tracker.load_all_dbs(self.database_dir)
@@ -215,7 +276,15 @@ class DecArgumentTestCase(TempTrackerSetupTestCase):
 
     def test_dec_by_five(self):
         """Test that we decrement by five episodes correctly"""
-        args = self.parser.parse_args(['--database-dir=example', 'dec', 'game of thrones', '--by=5'])
+        args = self.parser.parse_args(
+            [
+                '--database-dir=example',
+                '--no-cache',
+                'dec',
+                'game of thrones',
+                '--by=5',
+            ]
+        )
         expected_next_episode = 5
         tracker.tracker(args)
         _, trackerdb = tracker.load_all_dbs(self.database_dir)
@@ -226,7 +295,15 @@ class DecArgumentTestCase(TempTrackerSetupTestCase):
 
     def test_dec_by_ten_correct_episode(self):
         """Test we decrement past a season boundry correctly"""
-        args = self.parser.parse_args(['--database-dir=example', 'dec', 'game of thrones', '--by=10'])
+        args = self.parser.parse_args(
+            [
+                '--database-dir=example',
+                '--no-cache',
+                'dec',
+                'game of thrones',
+                '--by=10',
+            ]
+        )
         expected_next_episode = 10
         tracker.tracker(args)
         _, trackerdb = tracker.load_all_dbs(self.database_dir)
@@ -237,7 +314,15 @@ class DecArgumentTestCase(TempTrackerSetupTestCase):
 
     def test_dec_by_ten_correct_season(self):
         """Test we decrement past a season boundry correctly"""
-        args = self.parser.parse_args(['--database-dir=example', 'dec', 'game of thrones', '--by=10'])
+        args = self.parser.parse_args(
+            [
+                '--database-dir=example',
+                '--no-cache',
+                'dec',
+                'game of thrones',
+                '--by=10',
+            ]
+        )
         expected_next_season = 5
         tracker.tracker(args)
         _, trackerdb = tracker.load_all_dbs(self.database_dir)
@@ -252,7 +337,14 @@ class IncArgumentTestCase(TempTrackerSetupTestCase):
 
     def test_inc_command(self):
         """Test that the inc command works as expected"""
-        args = self.parser.parse_args(['--database-dir=example', 'inc', 'game of thrones'])
+        args = self.parser.parse_args(
+            [
+                '--database-dir=example',
+                '--no-cache',
+                'inc',
+                'game of thrones',
+            ]
+        )
         expected_next_episode = 1
         tracker.tracker(args)
         _, trackerdb = tracker.load_all_dbs(self.database_dir)
@@ -263,7 +355,15 @@ class IncArgumentTestCase(TempTrackerSetupTestCase):
 
     def test_inc_by_five(self):
         """Test that we increment by five episodes correctly"""
-        args = self.parser.parse_args(['--database-dir=example', 'inc', 'game of thrones', '--by=5'])
+        args = self.parser.parse_args(
+            [
+                '--database-dir=example',
+                '--no-cache',
+                'inc',
+                'game of thrones',
+                '--by=5',
+            ]
+        )
         expected_next_episode = 5
         tracker.tracker(args)
         _, trackerdb = tracker.load_all_dbs(self.database_dir)
@@ -274,7 +374,15 @@ class IncArgumentTestCase(TempTrackerSetupTestCase):
 
     def test_inc_by_seven_correct_episode(self):
         """Test we increment past a season boundry correctly"""
-        args = self.parser.parse_args(['--database-dir=example', 'inc', 'game of thrones', '--by=7'])
+        args = self.parser.parse_args(
+            [
+                '--database-dir=example',
+                '--no-cache',
+                'inc',
+                'game of thrones',
+                '--by=7',
+            ]
+        )
         expected_next_episode = 7
         tracker.tracker(args)
         _, trackerdb = tracker.load_all_dbs(self.database_dir)
@@ -285,7 +393,15 @@ class IncArgumentTestCase(TempTrackerSetupTestCase):
 
     def test_inc_by_ten_correct_season(self):
         """Test we increment past a season boundry correctly"""
-        args = self.parser.parse_args(['--database-dir=example', 'inc', 'game of thrones', '--by=7'])
+        args = self.parser.parse_args(
+            [
+                '--database-dir=example',
+                '--no-cache',
+                'inc',
+                'game of thrones',
+                '--by=7',
+            ]
+        )
         expected_next_season = 7
         tracker.tracker(args)
         _, trackerdb = tracker.load_all_dbs(self.database_dir)
@@ -304,7 +420,7 @@ class IncDecShortCodeTestCase(TempTrackerSetupTestCase):
 
     def test_inc_using_short_code(self):
         """Test that the tracker can be incremented using a short-code"""
-        args = self.parser.parse_args(['--database-dir=example', 'inc', 'got'])
+        args = self.parser.parse_args(['--database-dir=example', '--no-cache', 'inc', 'got'])
         show = 'Game of Thrones'
         expected_tracked_show = tracker.TrackedShow(
             title=show,
@@ -318,7 +434,7 @@ class IncDecShortCodeTestCase(TempTrackerSetupTestCase):
 
     def test_dec_using_short_code(self):
         """Test that the tracker can be decremented using a short-code"""
-        args = self.parser.parse_args(['--database-dir=example', 'dec', 'got'])
+        args = self.parser.parse_args(['--database-dir=example', '--no-cache', 'dec', 'got'])
         show = 'Game of Thrones'
         expected_tracked_show = tracker.TrackedShow(
             title=show,
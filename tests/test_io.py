@@ -72,7 +72,7 @@ class ShowDBTestCase(unittest.TestCase):
     @classmethod
     def tearDownClass(cls):
         os.remove(os.path.join(cls.testdir, '.showdb.json'))
-        os.rmdir(cls.testdir)
+        shutil.rmtree(cls.testdir)
 
 
 class ShowDBLoadTestCase(unittest.TestCase):
@@ -99,7 +99,7 @@ class ShowDBLoadTestCase(unittest.TestCase):
     @classmethod
     def tearDownClass(cls):
         os.remove(os.path.join(cls.testdir, '.showdb.json'))
-        os.rmdir(cls.testdir)
+        shutil.rmtree(cls.testdir)
 
 
 class TrackerTestCase(unittest.TestCase):
@@ -130,7 +130,7 @@ class TrackerTestCase(unittest.TestCase):
     @classmethod
     def tearDownClass(cls):
         os.remove(os.path.join(cls.testdir, '.tracker.json'))
-        os.rmdir(cls.testdir)
+        shutil.rmtree(cls.testdir)
 
 
 class TrackerDBLoadTestCase(unittest.TestCase):
@@ -178,7 +178,7 @@ class TrackerDBLoadTestCase(unittest.TestCase):
     def tearDownClass(cls):
         os.remove(os.path.join(cls.testdir, '.tracker.json'))
         os.remove(os.path.join(cls.testdir, '.showdb.json'))
-        os.rmdir(cls.testdir)
+        shutil.rmtree(cls.testdir)
 
 
 class WatchlistOptionTestCase(unittest.TestCase):
@@ -0,0 +1,685 @@
+import json
+import os
+import shutil
+import sqlite3
+import sys
+from tempfile import TemporaryDirectory
+import unittest
+from unittest import mock
+
+from .context import tracker
+from tracker.journal import Journal, journal_path
+from tracker.storage import (
+    detect_format,
+    dumps_binary,
+    index_path,
+    LazyShows,
+    loads_binary,
+    path_for_format,
+    shard_dir,
+    ShardedShows,
+    StagedWrite,
+)
+from tracker.utils import EncodeShow
+
+
+def encode_json(database):
+    return json.dumps(database, cls=EncodeShow, sort_keys=True)
+
+
+def run_command(database_dir, *argv):
+    """Run a tracker command, and return the databases it loaded."""
+    module = sys.modules['tracker.tracker']
+    load_all_dbs = module.load_all_dbs
+    loaded = []
+
+    def load_and_keep(database_dir):
+        loaded.extend(load_all_dbs(database_dir))
+        return tuple(loaded)
+
+    args = tracker.process_args().parse_args(
+        ['--database-dir={}'.format(database_dir), '--no-journal', *argv]
+    )
+    with mock.patch.object(module, 'load_all_dbs', load_and_keep):
+        tracker.tracker(args)
+    return loaded
+
+
+class BinaryFormatTestCase(unittest.TestCase):
+    """Test case for the binary storage format"""
+    @classmethod
+    def setUpClass(cls):
+        cls.showdb = tracker.load_database(os.path.join('example', '.showdb.json'))
+        cls.trackerdb = tracker.load_database(os.path.join('example', '.tracker.json'))
+
+    def test_showdb_round_trip(self):
+        """Test that a show database is rebuilt exactly from the binary format"""
+        showdb = loads_binary(dumps_binary(self.showdb))
+        self.assertIsInstance(showdb, tracker.ShowDatabase)
+        self.assertEqual(encode_json(showdb), encode_json(self.showdb))
+
+    def test_tracker_round_trip(self):
+        """Test that a tracker database is rebuilt exactly from the binary format"""
+        trackerdb = loads_binary(dumps_binary(self.trackerdb))
+        self.assertEqual(encode_json(trackerdb), encode_json(self.trackerdb))
+        self.assertEqual(trackerdb._shows['game_of_thrones']._next_coords, (6, 10))
+
+    def test_episodes_loaded_as_columns(self):
+        """Test that the episodes of a loaded season are held in an EpisodeArray"""
+        showdb = loads_binary(dumps_binary(self.showdb))
+        season = showdb._shows['game_of_thrones']._seasons[5]
+        expected = self.showdb._shows['game_of_thrones']._seasons[5]
+        self.assertIsInstance(season._episodes, tracker.EpisodeArray)
+        self.assertEqual(list(season), list(expected))
+        self.assertEqual(season.imdb_ratings(), expected.imdb_ratings())
+
+    def test_smaller_than_json(self):
+        """Test that the binary format is smaller than the json format"""
+        self.assertLess(len(dumps_binary(self.showdb)) * 2, len(encode_json(self.showdb)))
+
+    def test_missing_rating(self):
+        """Test that an episode without a rating keeps a rating of None"""
+        showdb = tracker.ShowDatabase('unused')
+        show = tracker.Show('Moonboy')
+        season = tracker.Season()
+        season.add_episode(tracker.Episode(1, 1, 'Pilot', {'imdb': None}))
+        show._seasons.append(season)
+        showdb._shows[show.ltitle] = show
+
+        showdb = loads_binary(dumps_binary(showdb))
+        self.assertIsNone(showdb._shows['moonboy']._seasons[0][0].ratings['imdb'])
+
+
+class StorageFormatTestCase(unittest.TestCase):
+    """Test case for choosing, detecting and converting storage formats"""
+    def setUp(self):
+        self.tempdir = TemporaryDirectory()
+        self.database_dir = self.tempdir.name
+        for name in ('.showdb.json', '.tracker.json'):
+            shutil.copy(os.path.join('example', name), self.database_dir)
+        self.showdb, self.trackerdb = tracker.load_all_dbs(self.database_dir)
+        self.showdb.path_to_db = os.path.join(self.database_dir, '.showdb.json')
+        self.trackerdb.path_to_db = os.path.join(self.database_dir, '.tracker.json')
+        self.showdb.write_db()
+        self.trackerdb.write_db()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_path_for_format(self):
+        """Test that only the extension of the path is changed"""
+        self.assertEqual(path_for_format('dir/.tracker.bin', 'json'), 'dir/.tracker.json')
+
+    def test_convert_to_binary(self):
+        """Test that converting a database replaces the file in the old format"""
+        self.showdb.write_db(storage_format='binary')
+        self.assertEqual(os.listdir(self.database_dir).count('.showdb.bin'), 1)
+        self.assertFalse(os.path.exists(os.path.join(self.database_dir, '.showdb.json')))
+        self.assertEqual(detect_format(self.showdb.path_to_db), 'binary')
+        self.assertEqual(self.showdb.storage_format, 'binary')
+
+    def test_load_all_dbs_detects_format(self):
+        """Test that databases are found and loaded in either format"""
+        self.showdb.write_db(storage_format='binary')
+        showdb, trackerdb = tracker.load_all_dbs(self.database_dir)
+        self.assertEqual(encode_json(showdb), encode_json(self.showdb))
+        self.assertIn('game_of_thrones', trackerdb)
+
+    def test_format_option_converts_databases(self):
+        """Test that --format converts existing databases, and keeps them converted"""
+        parser = tracker.process_args()
+        args = parser.parse_args(
+            ['--database-dir={}'.format(self.database_dir), '--format=binary', 'inc', 'game of thrones']
+        )
+        tracker.tracker(args)
+        expected = ['.showdb.bin', '.tracker.bin', '.tracker.journal']
+        self.assertEqual(sorted(os.listdir(self.database_dir)), expected)
+
+        args = parser.parse_args(['--database-dir={}'.format(self.database_dir), '--list'])
+        with open(os.devnull, 'w') as devnull, mock.patch('sys.stdout', devnull):
+            tracker.tracker(args)
+        self.assertEqual(sorted(os.listdir(self.database_dir)), expected)
+
+    def test_export_to_json(self):
+        """Test that a binary database can be exported back to json"""
+        self.showdb.write_db(storage_format='binary')
+        self.showdb.write_db(storage_format='json')
+        with open(self.showdb.path_to_db, 'r') as f:
+            self.assertIn('__ShowDatabase__', json.load(f))
+
+
+class SQLiteFormatTestCase(unittest.TestCase):
+    """Test case for the sqlite storage format"""
+    def setUp(self):
+        self.tempdir = TemporaryDirectory()
+        self.database_dir = self.tempdir.name
+        for name in ('.showdb.json', '.tracker.json'):
+            shutil.copy(os.path.join('example', name), self.database_dir)
+        showdb, trackerdb = tracker.load_all_dbs(self.database_dir)
+        self.expected = encode_json(showdb), encode_json(trackerdb)
+        for db in (showdb, trackerdb):
+            db.path_to_db = os.path.join(self.database_dir, os.path.basename(db.path_to_db))
+            db.write_db(storage_format='sqlite')
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_round_trip(self):
+        """Test that both databases are rebuilt from the sqlite format"""
+        showdb, trackerdb = tracker.load_all_dbs(self.database_dir)
+        self.assertEqual(detect_format(showdb.path_to_db), 'sqlite')
+        self.assertEqual(
+            showdb._shows['game_of_thrones']._seasons[5]._episodes[9].title,
+            'The Winds of Winter',
+        )
+        self.assertEqual(trackerdb._shows['game_of_thrones']._next.episode, 10)
+        self.assertIsNone(trackerdb._shows['game_of_thrones'].notes)
+
+    def test_only_changed_rows_written(self):
+        """Test that shows which were not marked as changed are left alone"""
+        _, trackerdb = tracker.load_all_dbs(self.database_dir)
+        unmarked_notes = trackerdb._shows['person_of_interest'].notes
+        trackerdb._shows['game_of_thrones'].notes = 'marked'
+        trackerdb._shows['person_of_interest'].notes = 'not marked'
+        trackerdb.mark_changed('game_of_thrones')
+        trackerdb.write_db()
+
+        _, trackerdb = tracker.load_all_dbs(self.database_dir)
+        self.assertEqual(trackerdb._shows['game_of_thrones'].notes, 'marked')
+        self.assertEqual(trackerdb._shows['person_of_interest'].notes, unmarked_notes)
+
+    def test_removed_show(self):
+        """Test that a show removed from the database has its rows deleted"""
+        parser = tracker.process_args()
+        args = parser.parse_args(
+            ['--database-dir={}'.format(self.database_dir), 'rm', 'game of thrones']
+        )
+        tracker.tracker(args)
+
+        _, trackerdb = tracker.load_all_dbs(self.database_dir)
+        self.assertNotIn('game_of_thrones', trackerdb)
+        self.assertIn('person_of_interest', trackerdb)
+
+    def test_inc_command(self):
+        """Test that a sub-command writes the tracked show it changed"""
+        parser = tracker.process_args()
+        args = parser.parse_args(
+            ['--database-dir={}'.format(self.database_dir), 'dec', 'game of thrones']
+        )
+        tracker.tracker(args)
+
+        _, trackerdb = tracker.load_all_dbs(self.database_dir)
+        self.assertEqual(trackerdb._shows['game_of_thrones']._next_episode, 'S06E09')
+        self.assertEqual(sorted(os.listdir(self.database_dir)), ['.showdb.sqlite', '.tracker.sqlite'])
+
+    def test_failed_commit_rolls_back(self):
+        """Test that a tracker written before another database fails is left alone"""
+        showdb, trackerdb = tracker.load_all_dbs(self.database_dir)
+        notes = trackerdb._shows['game_of_thrones'].notes
+        trackerdb._shows['game_of_thrones'].notes = 'rolled back'
+        trackerdb.mark_changed('game_of_thrones')
+        showdb._shows['game_of_thrones']._seasons[0][0].title = object()
+        showdb.mark_changed('game_of_thrones')
+
+        with self.assertRaises(sqlite3.Error):
+            tracker.commit_databases(trackerdb, showdb)
+        self.assertEqual(trackerdb._changed, {'game_of_thrones'})
+        self.assertEqual(sorted(os.listdir(self.database_dir)), ['.showdb.sqlite', '.tracker.sqlite'])
+
+        _, trackerdb = tracker.load_all_dbs(self.database_dir)
+        self.assertEqual(trackerdb._shows['game_of_thrones'].notes, notes)
+
+    def test_failed_conversion_leaves_no_file(self):
+        """Test that a database which fails to convert to sqlite leaves no file behind"""
+        showdb = tracker.load_database(os.path.join('example', '.showdb.json'))
+        showdb.database_dir = self.database_dir
+        showdb.path_to_db = os.path.join(self.database_dir, '.converted.json')
+        showdb._shows['game_of_thrones']._seasons[0][0].title = object()
+        with self.assertRaises(sqlite3.Error):
+            showdb.write_db(storage_format='sqlite')
+        self.assertEqual(sorted(os.listdir(self.database_dir)), ['.showdb.sqlite', '.tracker.sqlite'])
+
+
+class OffsetIndexTestCase(unittest.TestCase):
+    """Test case for lazily loading a json database through its offset index"""
+    def setUp(self):
+        self.tempdir = TemporaryDirectory()
+        self.database_dir = self.tempdir.name
+        for name in ('.showdb.json', '.tracker.json'):
+            shutil.copy(os.path.join('example', name), self.database_dir)
+        self.showdb, self.trackerdb = tracker.load_all_dbs(self.database_dir)
+        for db in (self.showdb, self.trackerdb):
+            db.path_to_db = os.path.join(self.database_dir, os.path.basename(db.path_to_db))
+            db.write_db()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_same_output_as_json_dump(self):
+        """Test that the indexed writer writes the same json as json.dump"""
+        with open(self.showdb.path_to_db, 'r') as f:
+            self.assertEqual(f.read(), encode_json(self.showdb))
+
+    def test_derived_titles_not_written(self):
+        """Test that the titles derived from a show's title are not written"""
+        with open(self.showdb.path_to_db, 'r') as f:
+            data = f.read()
+        self.assertNotIn('"ltitle"', data)
+        self.assertNotIn('"request_title"', data)
+
+    def test_titles_shared_on_load(self):
+        """Test that a json database without an index keeps one copy of each title"""
+        seasons = self.showdb._shows['game_of_thrones']._seasons
+        seasons[0][1].title = seasons[1][0].title = 'Repeated'
+        self.showdb.mark_changed('game_of_thrones')
+        self.showdb.write_db()
+        os.remove(index_path(self.showdb.path_to_db))
+
+        seasons = tracker.load_database(self.showdb.path_to_db)._shows['game_of_thrones']._seasons
+        self.assertIs(seasons[0][1].title, seasons[1][0].title)
+
+    def test_shows_decoded_on_access(self):
+        """Test that a show is only decoded when it is accessed"""
+        showdb, trackerdb = tracker.load_all_dbs(self.database_dir)
+        self.assertIsInstance(showdb._shows, LazyShows)
+        self.assertEqual(showdb._shows.decoded, 0)
+        self.assertIn('game_of_thrones', showdb)
+
+        trackerdb._shows['game_of_thrones'].inc_dec_episode(showdb, dec=True)
+        self.assertEqual(showdb._shows.decoded, 1)
+        self.assertEqual(trackerdb._shows['game_of_thrones']._next.title, 'Battle of the Bastards')
+
+    def test_showdb_attached_as_shows_are_decoded(self):
+        """Test that tracked shows decoded after loading look up episodes in the showdb"""
+        showdb, trackerdb = tracker.load_all_dbs(self.database_dir)
+        self.assertIsInstance(trackerdb._shows, LazyShows)
+        self.assertEqual(trackerdb._shows.decoded, 0)
+        self.assertIn('game_of_thrones', trackerdb)
+        self.assertEqual(trackerdb._shows.decoded, 0)
+        self.assertEqual(trackerdb._shows['game_of_thrones']._next.title, 'The Winds of Winter')
+        with open(trackerdb.path_to_db, 'r') as f:
+            self.assertNotIn('__Episode__', f.read())
+
+    def test_command_decodes_one_tracked_show(self):
+        """Test that a command given a full title decodes only the show it changes"""
+        _, trackerdb = run_command(self.database_dir, 'inc', 'game of thrones')
+        self.assertEqual(trackerdb._shows.decoded, 1)
+
+    def test_short_code_found_without_decoding(self):
+        """Test that a show is found by its short code without decoding the others"""
+        trackerdb = tracker.load_database(self.trackerdb.path_to_db)
+        trackerdb.set_short_code('game_of_thrones', 'GOT')
+        trackerdb.write_db()
+
+        _, trackerdb = run_command(self.database_dir, 'inc', 'got')
+        self.assertEqual(trackerdb._shows.decoded, 1)
+        self.assertEqual(trackerdb.find_short_code('GOT'), 'game_of_thrones')
+
+    def test_write_copies_undecoded_shows(self):
+        """Test that a changed show is written alongside the undecoded shows"""
+        showdb, _ = tracker.load_all_dbs(self.database_dir)
+        showdb._shows['game_of_thrones'].short_code = 'GOT'
+        showdb.write_db()
+        self.assertEqual(showdb._shows.decoded, 1)
+
+        with open(showdb.path_to_db, 'r') as f:
+            self.assertEqual(f.read(), encode_json(showdb))
+        showdb, _ = tracker.load_all_dbs(self.database_dir)
+        self.assertEqual(showdb._shows['game_of_thrones'].short_code, 'GOT')
+        self.assertEqual(
+            encode_json(showdb._shows['person_of_interest']),
+            encode_json(self.showdb._shows['person_of_interest']),
+        )
+
+    def test_stale_index_ignored(self):
+        """Test that the index is not used once the database has changed"""
+        with open(self.showdb.path_to_db, 'a') as f:
+            f.write(' ')
+        showdb, _ = tracker.load_all_dbs(self.database_dir)
+        self.assertIsInstance(showdb._shows, dict)
+
+    def test_index_removed_with_database(self):
+        """Test that converting to another format removes the index"""
+        self.showdb.write_db(storage_format='binary')
+        self.assertFalse(os.path.exists(index_path(os.path.join(self.database_dir, '.showdb.json'))))
+
+
+class ColumnarFormatTestCase(unittest.TestCase):
+    """Test case for the memory-mapped columnar storage format"""
+    def setUp(self):
+        self.tempdir = TemporaryDirectory()
+        self.database_dir = self.tempdir.name
+        for name in ('.showdb.json', '.tracker.json'):
+            shutil.copy(os.path.join('example', name), self.database_dir)
+        showdb, trackerdb = tracker.load_all_dbs(self.database_dir)
+        for db in (showdb, trackerdb):
+            db.path_to_db = os.path.join(self.database_dir, os.path.basename(db.path_to_db))
+            db.write_db(storage_format='columnar')
+        self.expected = encode_json(showdb)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_round_trip(self):
+        """Test that a columnar database is written back out unchanged"""
+        showdb, _ = tracker.load_all_dbs(self.database_dir)
+        self.assertEqual(detect_format(showdb.path_to_db), 'columnar')
+        self.assertEqual(encode_json(showdb), self.expected)
+
+    def test_seasons_are_mapped(self):
+        """Test that seasons are views of the episode columns"""
+        showdb, _ = tracker.load_all_dbs(self.database_dir)
+        season = showdb._shows['game_of_thrones']._seasons[5]
+        self.assertIsInstance(season, tracker.MappedSeason)
+        self.assertEqual(len(season), 10)
+        self.assertEqual(season.episodes_this_season, 10)
+        self.assertEqual(season[-1].title, 'The Winds of Winter')
+        self.assertEqual([e.episode for e in season][:3], [1, 2, 3])
+        self.assertEqual(season[9], tracker.Episode(10, 6, 'The Winds of Winter', {'imdb': 9.9}))
+        with self.assertRaises(IndexError):
+            season[10]
+
+    def test_rewrite_in_place(self):
+        """Test that a loaded columnar database can overwrite its own file"""
+        showdb, _ = tracker.load_all_dbs(self.database_dir)
+        season = showdb._shows['game_of_thrones']._seasons[0]
+        showdb.write_db()
+        self.assertEqual(season[0].title, 'Winter Is Coming')
+
+        showdb, _ = tracker.load_all_dbs(self.database_dir)
+        self.assertEqual(encode_json(showdb), self.expected)
+
+    def test_dec_command(self):
+        """Test that the next episode is found from a columnar show database"""
+        parser = tracker.process_args()
+        args = parser.parse_args(
+            ['--database-dir={}'.format(self.database_dir), 'dec', 'game of thrones']
+        )
+        tracker.tracker(args)
+
+        _, trackerdb = tracker.load_all_dbs(self.database_dir)
+        self.assertEqual(trackerdb._shows['game_of_thrones']._next.title, 'Battle of the Bastards')
+
+
+class JournalTestCase(unittest.TestCase):
+    """Test case for recording tracker changes in an append-only journal"""
+    def setUp(self):
+        self.tempdir = TemporaryDirectory()
+        self.database_dir = self.tempdir.name
+        for name in ('.showdb.json', '.tracker.json'):
+            shutil.copy(os.path.join('example', name), self.database_dir)
+        self.showdb, self.trackerdb = tracker.load_all_dbs(self.database_dir)
+        for db in (self.showdb, self.trackerdb):
+            db.path_to_db = os.path.join(self.database_dir, os.path.basename(db.path_to_db))
+            db.write_db()
+        self.parser = tracker.process_args()
+        self.path_to_journal = journal_path(self.trackerdb.path_to_db)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def run_command(self, *argv):
+        args = self.parser.parse_args(['--database-dir={}'.format(self.database_dir)] + list(argv))
+        tracker.tracker(args)
+
+    def test_command_appends_to_journal(self):
+        """Test that a sub-command appends to the journal, and leaves the tracker alone"""
+        with open(self.trackerdb.path_to_db, 'rb') as f:
+            snapshot = f.read()
+        self.run_command('dec', 'game of thrones')
+
+        with open(self.trackerdb.path_to_db, 'rb') as f:
+            self.assertEqual(f.read(), snapshot)
+        records = [record for _, record in Journal(self.path_to_journal).records()]
+        self.assertEqual([(r['op'], r['key']) for r in records], [('dec', 'game_of_thrones')])
+
+        _, trackerdb = tracker.load_all_dbs(self.database_dir)
+        self.assertEqual(trackerdb._shows['game_of_thrones']._next_episode, 'S06E09')
+        self.assertEqual(trackerdb._shows['game_of_thrones']._next_coords, (6, 9))
+
+    def test_unchanged_show_not_written(self):
+        """Test that a command which changes nothing writes neither the tracker nor the journal"""
+        self.run_command('--no-journal', 'dec', 'game of thrones', '--by', '1000')
+        inode = os.stat(self.trackerdb.path_to_db).st_ino
+        self.assertFalse(os.path.exists(self.path_to_journal))
+
+        self.run_command('dec', 'game of thrones')
+        self.run_command('rm', 'game of thrones', '--note')
+        self.run_command('rm', 'game of thrones', '--short-code')
+        self.assertEqual(os.stat(self.trackerdb.path_to_db).st_ino, inode)
+        self.assertFalse(os.path.exists(self.path_to_journal))
+
+    def test_replay_in_order(self):
+        """Test that later records win, and that removed shows stay removed"""
+        self.run_command('dec', 'game of thrones')
+        self.run_command('dec', 'game of thrones')
+        self.run_command('rm', 'person of interest')
+
+        _, trackerdb = tracker.load_all_dbs(self.database_dir)
+        self.assertEqual(trackerdb._shows['game_of_thrones']._next_episode, 'S06E08')
+        self.assertNotIn('person_of_interest', trackerdb)
+
+    def test_incomplete_record_ignored(self):
+        """Test that a record cut short by a crash is not replayed"""
+        self.run_command('dec', 'game of thrones')
+        with open(self.path_to_journal, 'ab') as f:
+            f.write(b'{"op": "rm", "key": "game_of_thr')
+
+        _, trackerdb = tracker.load_all_dbs(self.database_dir)
+        self.assertEqual(trackerdb._shows['game_of_thrones']._next_episode, 'S06E09')
+
+    def test_write_db_absorbs_journal(self):
+        """Test that writing the tracker drops the records it now holds"""
+        self.run_command('dec', 'game of thrones')
+        _, trackerdb = tracker.load_all_dbs(self.database_dir)
+        # A record appended by another command after the tracker was loaded
+        Journal(self.path_to_journal).append('rm', 'person_of_interest', None)
+        trackerdb.write_db()
+
+        records = [record for _, record in Journal(self.path_to_journal).records()]
+        self.assertEqual([r['key'] for r in records], ['person_of_interest'])
+        _, trackerdb = tracker.load_all_dbs(self.database_dir)
+        self.assertEqual(trackerdb._shows['game_of_thrones']._next_episode, 'S06E09')
+        self.assertNotIn('person_of_interest', trackerdb)
+
+    def test_background_compaction(self):
+        """Test that a journal past its size threshold is compacted into the tracker"""
+        _, trackerdb = tracker.load_all_dbs(self.database_dir)
+        trackerdb.journal.compact_size = 0
+        trackerdb._shows['game_of_thrones'].notes = 'compacted'
+        trackerdb.journal_change('add', 'game_of_thrones')
+        self.assertTrue(trackerdb.journal.needs_compaction())
+
+        trackerdb.journal.compact_in_background(trackerdb).join()
+        self.assertFalse(os.path.exists(self.path_to_journal))
+        _, trackerdb = tracker.load_all_dbs(self.database_dir)
+        self.assertEqual(trackerdb._shows['game_of_thrones'].notes, 'compacted')
+
+    def test_no_journal_option(self):
+        """Test that --no-journal writes the whole tracker instead"""
+        self.run_command('--no-journal', 'dec', 'game of thrones')
+        self.assertFalse(os.path.exists(self.path_to_journal))
+        _, trackerdb = tracker.load_all_dbs(self.database_dir)
+        self.assertEqual(trackerdb._shows['game_of_thrones']._next_episode, 'S06E09')
+
+
+class AtomicWriteTestCase(unittest.TestCase):
+    """Test case for dirty tracking, and atomic writes of the databases"""
+    def setUp(self):
+        self.tempdir = TemporaryDirectory()
+        self.database_dir = self.tempdir.name
+        for name in ('.showdb.json', '.tracker.json'):
+            shutil.copy(os.path.join('example', name), self.database_dir)
+        self.showdb, self.trackerdb = tracker.load_all_dbs(self.database_dir)
+        for db in (self.showdb, self.trackerdb):
+            db.path_to_db = os.path.join(self.database_dir, os.path.basename(db.path_to_db))
+            db.write_db()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def inode(self, db):
+        return os.stat(db.path_to_db).st_ino
+
+    def test_loaded_databases_are_clean(self):
+        """Test that a database is only dirty once it has been changed"""
+        showdb, trackerdb = tracker.load_all_dbs(self.database_dir)
+        self.assertFalse(showdb.dirty)
+        self.assertFalse(trackerdb.dirty)
+        trackerdb.mark_changed('game_of_thrones')
+        self.assertTrue(trackerdb.dirty)
+        self.assertTrue(tracker.ShowDatabase(self.database_dir).dirty)
+
+    def test_commit_only_writes_dirty_databases(self):
+        """Test that an unchanged database is not rewritten"""
+        showdb, trackerdb = tracker.load_all_dbs(self.database_dir)
+        showdb_inode, trackerdb_inode = self.inode(showdb), self.inode(trackerdb)
+        trackerdb._shows['game_of_thrones'].notes = 'committed'
+        trackerdb.mark_changed('game_of_thrones')
+
+        self.assertEqual(tracker.commit_databases(showdb, trackerdb), [trackerdb])
+        self.assertEqual(self.inode(showdb), showdb_inode)
+        self.assertNotEqual(self.inode(trackerdb), trackerdb_inode)
+        self.assertFalse(trackerdb.dirty)
+        self.assertEqual(tracker.commit_databases(showdb, trackerdb), [])
+
+        _, trackerdb = tracker.load_all_dbs(self.database_dir)
+        self.assertEqual(trackerdb._shows['game_of_thrones'].notes, 'committed')
+
+    def test_list_writes_nothing(self):
+        """Test that a command which changes nothing leaves both databases alone"""
+        inodes = self.inode(self.showdb), self.inode(self.trackerdb)
+        args = tracker.process_args().parse_args(
+            ['--database-dir={}'.format(self.database_dir), '--list']
+        )
+        with open(os.devnull, 'w') as devnull, mock.patch('sys.stdout', devnull):
+            tracker.tracker(args)
+        self.assertEqual((self.inode(self.showdb), self.inode(self.trackerdb)), inodes)
+
+    def test_failed_commit_leaves_databases_alone(self):
+        """Test that an error writing one database replaces neither of them"""
+        showdb, trackerdb = tracker.load_all_dbs(self.database_dir)
+        with open(showdb.path_to_db, 'rb') as f:
+            showdb_data = f.read()
+        with open(trackerdb.path_to_db, 'rb') as f:
+            trackerdb_data = f.read()
+        showdb.mark_changed('game_of_thrones')
+        trackerdb._shows['game_of_thrones'].notes = object()
+        trackerdb.mark_changed('game_of_thrones')
+
+        with self.assertRaises(TypeError):
+            tracker.commit_databases(showdb, trackerdb)
+        with open(showdb.path_to_db, 'rb') as f:
+            self.assertEqual(f.read(), showdb_data)
+        with open(trackerdb.path_to_db, 'rb') as f:
+            self.assertEqual(f.read(), trackerdb_data)
+        self.assertEqual(
+            sorted(os.listdir(self.database_dir)),
+            ['.showdb.json', '.showdb.json.idx', '.tracker.json', '.tracker.json.idx'],
+        )
+
+    def test_staged_files_published_together(self):
+        """Test that staged files only replace their destinations once published"""
+        path = os.path.join(self.database_dir, 'staged')
+        staged = StagedWrite()
+        with staged.open(path) as f:
+            f.write(b'new')
+        self.assertFalse(os.path.exists(path))
+        staged.publish()
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), b'new')
+
+
+class ShardedFormatTestCase(unittest.TestCase):
+    """Test case for the sharded storage format"""
+    def setUp(self):
+        self.tempdir = TemporaryDirectory()
+        self.database_dir = self.tempdir.name
+        for name in ('.showdb.json', '.tracker.json'):
+            shutil.copy(os.path.join('example', name), self.database_dir)
+        self.showdb, self.trackerdb = tracker.load_all_dbs(self.database_dir)
+        for db in (self.showdb, self.trackerdb):
+            db.path_to_db = os.path.join(self.database_dir, os.path.basename(db.path_to_db))
+            db.write_db(storage_format='sharded')
+        self.path_to_shards = shard_dir(self.showdb.path_to_db)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def inode(self, *path):
+        return os.stat(os.path.join(*path)).st_ino
+
+    def test_round_trip(self):
+        """Test that a database is read back lazily, and unchanged"""
+        self.assertEqual(detect_format(self.showdb.path_to_db), 'sharded')
+        self.assertEqual(
+            sorted(os.listdir(self.path_to_shards)),
+            sorted('{}.json'.format(ltitle) for ltitle in self.showdb),
+        )
+        showdb, _ = tracker.load_all_dbs(self.database_dir)
+        self.assertIsInstance(showdb._shows, ShardedShows)
+        self.assertEqual(showdb._shows.decoded, 0)
+        self.assertEqual(encode_json(showdb), encode_json(self.showdb))
+
+    def test_command_decodes_one_tracked_show(self):
+        """Test that a command reads the shard of the show it was given, by title or short code"""
+        trackerdb = tracker.load_database(self.trackerdb.path_to_db)
+        trackerdb.set_short_code('person_of_interest', 'POI')
+        trackerdb.write_db()
+
+        _, trackerdb = run_command(self.database_dir, 'inc', 'game of thrones')
+        self.assertEqual(trackerdb._shows.decoded, 1)
+        _, trackerdb = run_command(self.database_dir, 'inc', 'poi')
+        self.assertEqual(trackerdb._shows.decoded, 1)
+        self.assertEqual(trackerdb._shows['person_of_interest'].short_code, 'POI')
+
+    def test_only_changed_shards_written(self):
+        """Test that changing one show only rewrites its shard"""
+        showdb, _ = tracker.load_all_dbs(self.database_dir)
+        manifest = self.inode(showdb.path_to_db)
+        untouched = self.inode(self.path_to_shards, 'person_of_interest.json')
+        changed = self.inode(self.path_to_shards, 'game_of_thrones.json')
+        showdb._shows['game_of_thrones'].imdb_id = 'changed'
+        showdb.mark_changed('game_of_thrones')
+        tracker.commit_databases(showdb)
+
+        self.assertEqual(self.inode(showdb.path_to_db), manifest)
+        self.assertEqual(self.inode(self.path_to_shards, 'person_of_interest.json'), untouched)
+        self.assertNotEqual(self.inode(self.path_to_shards, 'game_of_thrones.json'), changed)
+        self.assertEqual(showdb._shows.decoded, 1)
+        showdb, _ = tracker.load_all_dbs(self.database_dir)
+        self.assertEqual(showdb._shows['game_of_thrones'].imdb_id, 'changed')
+
+    def test_add_and_remove_shows(self):
+        """Test that added and removed shows update the manifest and their shards"""
+        showdb, _ = tracker.load_all_dbs(self.database_dir)
+        showdb._shows['moon/boy'] = tracker.Show('Moon/Boy')
+        showdb.mark_changed('moon/boy')
+        del showdb._shows['person_of_interest']
+        showdb.mark_changed('person_of_interest')
+        showdb.write_db()
+
+        self.assertIn('moon%2Fboy.json', os.listdir(self.path_to_shards))
+        self.assertNotIn('person_of_interest.json', os.listdir(self.path_to_shards))
+        showdb, _ = tracker.load_all_dbs(self.database_dir)
+        self.assertEqual(showdb._shows['moon/boy'].title, 'Moon/Boy')
+        self.assertNotIn('person_of_interest', showdb)
+
+    def test_sub_command(self):
+        """Test that a sub-command writes the shard of the tracked show it changed"""
+        args = tracker.process_args().parse_args(
+            ['--database-dir={}'.format(self.database_dir), 'dec', 'game of thrones']
+        )
+        tracker.tracker(args)
+
+        self.assertNotIn('.tracker.journal', os.listdir(self.database_dir))
+        _, trackerdb = tracker.load_all_dbs(self.database_dir)
+        self.assertEqual(trackerdb._shows['game_of_thrones']._next_episode, 'S06E09')
+
+    def test_convert_to_json(self):
+        """Test that converting away from the sharded format removes the shards"""
+        showdb, _ = tracker.load_all_dbs(self.database_dir)
+        showdb.write_db(storage_format='json')
+        self.assertFalse(os.path.exists(self.path_to_shards))
+        self.assertFalse(os.path.exists(self.showdb.path_to_db))
+        self.assertEqual(encode_json(tracker.load_database(showdb.path_to_db)), encode_json(showdb))
@@ -9,12 +9,17 @@ from .context import tracker
 from tracker.exceptions import (
     EpisodeOutOfBoundsError,
     SeasonOutOfBoundsError,
+    ShortCodeAlreadyAssignedError,
     ShowNotFoundError,
 )
 from tracker.utils import (
     check_file_exists,
     check_for_databases,
     check_for_season_episode_code,
+    decode_registered,
+    decode_season_response,
+    Deserializer,
+    EncodeShow,
     extract_episode_details,
     extract_season_episode_from_str,
     get_show_database_entry,
@@ -59,6 +64,13 @@ class GoodEpisodeInitTestCase(unittest.TestCase):
         """Test we build an episode with a good rating"""
         self.assertEqual(self.episode.ratings['imdb'], 8.9)
 
+    def test_slotted_episode(self):
+        """Test that an episode has no instance dict, and keeps only the IMDb rating"""
+        self.assertFalse(hasattr(self.episode, '__dict__'))
+        self.episode.ratings = {'imdb': 9.1}
+        self.assertEqual(self.episode.imdb_rating, 9.1)
+        self.assertEqual(self.episode.ratings, {'imdb': 9.1})
+
     # def test_bad_episode_title(self):
     #     raise NotImplementedError
 
@@ -116,6 +128,50 @@ class SeasonTestCase(unittest.TestCase):
         s.build_season(self.response)
         self.assertEqual(len(s), 10)
 
+    def test_build_season_from_content(self):
+        """Test that building from an undecoded response matches build_season"""
+        expected = tracker.Season()
+        expected.build_season(self.response)
+
+        with open('got_s01_response.json', 'rb') as f:
+            content = f.read()
+        s = tracker.Season()
+        s.build_season_from_content(content)
+
+        self.assertEqual(s.episodes_this_season, 10)
+        self.assertEqual(list(s), list(expected))
+
+    def test_pack_season(self):
+        """Test that a packed season holds its episodes in columns, and reads the same"""
+        expected = tracker.Season()
+        expected.build_season(self.response)
+        s = tracker.Season()
+        s.build_season(self.response)
+        s._episodes[2].ratings = {'imdb': None}
+
+        s.pack()
+        self.assertIsInstance(s._episodes, tracker.EpisodeArray)
+        self.assertEqual(len(s), 10)
+        self.assertEqual(s[9], expected[9])
+        self.assertEqual(list(s)[3:], list(expected)[3:])
+        self.assertIsNone(s[2].imdb_rating)
+        self.assertEqual(s.imdb_ratings()[:3], [8.9, 8.7, None])
+
+    def test_packed_season_changes(self):
+        """Test that episodes can be added to and replaced in a packed season"""
+        s = tracker.Season()
+        s.build_season(self.response)
+        s.pack()
+        episode = s[0]
+        episode.title = 'Changed'
+        self.assertEqual(s[0].title, 'Winter Is Coming')
+
+        s._episodes[0] = episode
+        s.add_episode(tracker.Episode(11, 1, 'Extra', {'imdb': 7.5}))
+        self.assertEqual(s[0].title, 'Changed')
+        self.assertEqual(s[-1].title, 'Extra')
+        self.assertEqual(s.imdb_ratings()[-1], 7.5)
+
 
 class ShowDetailsTestCase(unittest.TestCase):
     """Test case for ShowDetails class"""
@@ -148,6 +204,25 @@ class ShowDetailsTestCase(unittest.TestCase):
         s = tracker.Show(show_title)
         self.assertEqual(s.request_title, 'american crime story')
 
+    def test_derived_titles_not_written(self):
+        """Test that the derived title forms are not written, and still read"""
+        self.assertNotIn('ltitle', self.show.serializable_attributes())
+        self.assertNotIn('request_title', self.show.serializable_attributes())
+        show = tracker.Show(self.s, ltitle='stale', request_title='stale')
+        self.assertEqual(show.ltitle, 'game_of_thrones')
+
+    def test_renamed_show_keeps_ltitle(self):
+        """Test that the derived titles follow the title the show was created with"""
+        self.show.title = 'Game of Thrones (2011)'
+        self.assertEqual(self.show.ltitle, 'game_of_thrones')
+        self.assertEqual(self.show.request_title, 'game of thrones')
+
+    def test_titles_shared(self):
+        """Test that a show and its tracked show share one title string"""
+        tracked_show = tracker.TrackedShow(title=''.join(['Game of ', 'Thrones']))
+        self.assertIs(tracked_show.title, self.show.title)
+        self.assertIs(tracked_show.ltitle, self.show.ltitle)
+
 
 class ShowTestCase(unittest.TestCase):
     """Test case for Show object and its methods"""
@@ -164,6 +239,15 @@ class ShowTestCase(unittest.TestCase):
         show.add_season(response)
         self.assertIsInstance(show._seasons[0], tracker.Season)
 
+    def test_slotted_show(self):
+        """Test that shows and seasons have no instance dict, and write their fields"""
+        show = tracker.Show('Game of Thrones', imdb_id='tt0944947')
+        show._seasons.append(tracker.Season())
+        self.assertFalse(hasattr(show, '__dict__'))
+        self.assertFalse(hasattr(show._seasons[0], '__dict__'))
+        self.assertEqual(list(show.serializable_attributes()), list(tracker.Show._fields))
+        self.assertEqual(show.serializable_attributes()['imdb_id'], 'tt0944947')
+
 
 class TrackedShowTestCase(unittest.TestCase):
     """Test case for a Tracked show class"""
@@ -395,6 +479,158 @@ class TrackedShowPrevNextEpisodeTestCase(unittest.TestCase):
         tracked_show.inc_dec_episode(self.database, dec=True, by=3)
         self.assertEqual(tracked_show._next.episode, 1)
 
+    def test_episodes_stored_as_coordinates(self):
+        """Make sure only the coordinates of the next and previous episodes are written"""
+        self.assertEqual(self.tracked_show._next_coords, (6, 9))
+        self.assertEqual(self.tracked_show._prev_coords, (6, 8))
+        encoded = json.dumps(self.tracked_show, cls=EncodeShow)
+        self.assertNotIn('__Episode__', encoded)
+        self.assertNotIn('_showdb', encoded)
+
+    def test_episode_details_looked_up_in_showdb(self):
+        """Make sure refreshed episode details are picked up without a tracker change"""
+        episode = self.database._shows['game_of_thrones']._seasons[5]._episodes[8]
+        title = episode.title
+        episode.title = 'Refreshed Title'
+        try:
+            self.assertEqual(self.tracked_show._next.title, 'Refreshed Title')
+        finally:
+            episode.title = title
+
+    def test_legacy_episodes_converted_to_coordinates(self):
+        """Make sure trackers written with copies of the episodes still load"""
+        tracked_show = tracker.TrackedShow(
+            title='Game of Thrones',
+            _next_episode='S06E10',
+            _next=tracker.Episode(10, 6, 'The Winds of Winter', {'imdb': 9.9}),
+        )
+        self.assertEqual(tracked_show._next_coords, (6, 10))
+        self.assertIsNone(tracked_show._prev_coords)
+
+    def test_no_showdb_attached(self):
+        """Make sure looking up an episode without a show database fails clearly"""
+        tracked_show = tracker.TrackedShow(title='Game of Thrones', _next_coords=[6, 10])
+        self.assertEqual(tracked_show._next_coords, (6, 10))
+        with self.assertRaises(tracker.DatabaseError):
+            tracked_show._next
+
+
+class EpisodeIndexTestCase(unittest.TestCase):
+    """Test case for finding and moving between episodes through a show's EpisodeIndex"""
+    def setUp(self):
+        # Two long seasons, with episode 3 of season 2 missing
+        self.showdb = tracker.ShowDatabase('unused')
+        show = tracker.Show('Long Runner')
+        for number, missing in ((1, None), (2, 3)):
+            season = tracker.Season()
+            for e in range(1, 1001):
+                if e != missing:
+                    season.add_episode(tracker.Episode(e, number, 'S{}E{}'.format(number, e), {'imdb': None}))
+            show._seasons.append(season)
+        self.showdb._shows[show.ltitle] = show
+        self.show = show
+
+        self.tracked_show = tracker.TrackedShow(title='Long Runner', _next_episode='S01E990')
+        self.tracked_show._set_next_prev(self.showdb)
+
+    def test_inc_by_across_gap(self):
+        """Test that a large increment lands on the right episode across a season and a gap"""
+        self.tracked_show.inc_dec_episode(self.showdb, inc=True, by=500)
+        self.assertEqual(self.tracked_show._next_coords, (2, 491))
+        self.assertEqual(self.tracked_show._prev_coords, (2, 490))
+        self.assertEqual(self.tracked_show._next.title, 'S2E491')
+
+        self.tracked_show.inc_dec_episode(self.showdb, dec=True, by=500)
+        self.assertEqual(self.tracked_show._next_coords, (1, 990))
+
+    def test_jump_past_gap(self):
+        """Test that an episode after a gap is found by its number"""
+        tracked_show = tracker.TrackedShow(title='Long Runner', _next_episode='S02E04')
+        tracked_show._set_next_prev(self.showdb)
+        self.assertEqual(tracked_show._next.episode, 4)
+        self.assertEqual(tracked_show._prev_coords, (2, 2))
+        self.assertEqual(season_episode_str_from_show(tracked_show), 'S02E04')
+
+    def test_missing_episode(self):
+        """Test that the missing episode, and one past the last season, are out of bounds"""
+        tracked_show = tracker.TrackedShow(title='Long Runner', _next_episode='S02E03')
+        with self.assertRaises(EpisodeOutOfBoundsError):
+            tracked_show._set_next_prev(self.showdb)
+        tracked_show._next_episode = 'S03E01'
+        with self.assertRaises(SeasonOutOfBoundsError):
+            tracked_show._set_next_prev(self.showdb)
+
+    def test_inc_past_last_episode(self):
+        """Test that advancing past the last episode fails, and leaves the show alone"""
+        with self.assertRaises(SeasonOutOfBoundsError):
+            self.tracked_show.inc_dec_episode(self.showdb, inc=True, by=2000)
+        self.assertEqual(self.tracked_show._next_coords, (1, 990))
+
+    def test_index_rebuilt_when_seasons_change(self):
+        """Test that the index picks up a season added after it was built"""
+        self.assertEqual(len(self.show.episode_index()), 1999)
+        season = tracker.Season()
+        season.add_episode(tracker.Episode(1, 3, 'S3E1', {'imdb': None}))
+        self.show._seasons.append(season)
+        self.assertEqual(self.show.find_episode(3, 1), 1999)
+        self.assertEqual(self.show.episode_at(1999).title, 'S3E1')
+
+    def test_index_rebuilt_when_season_replaced(self):
+        """Test that the index picks up a season replaced by one of the same length"""
+        self.assertEqual(self.show.find_episode(2, 1000), 1998)
+        self.show._seasons[1] = None
+        season = tracker.Season()
+        for e in range(1001, 2000):
+            season.add_episode(tracker.Episode(e, 2, 'S2E{}'.format(e), {'imdb': None}))
+        self.show._seasons[1] = season
+        self.assertEqual(self.show.find_episode(2, 1999), 1998)
+
+
+class ShortCodeTestCase(unittest.TestCase):
+    """Test case for looking up tracked shows by short code"""
+    def setUp(self):
+        self.trackerdb = tracker.TrackerDatabase('unused')
+        for title, short_code in (('Game of Thrones', 'GOT'), ('House', None), ('Lost', 'LST')):
+            show = tracker.TrackedShow(title=title, short_code=short_code)
+            self.trackerdb._shows[show.ltitle] = show
+
+    def test_find_short_code(self):
+        """Test that a short code is found in any case, and a title is contained"""
+        self.assertEqual(self.trackerdb.find_short_code('got'), 'game_of_thrones')
+        self.assertIsNone(self.trackerdb.find_short_code('HSE'))
+        self.assertIn('house', self.trackerdb)
+        self.assertIn('lst', self.trackerdb)
+        self.assertNotIn('hse', self.trackerdb)
+
+    def test_set_short_code(self):
+        """Test that changing a short code keeps the index up to date"""
+        self.trackerdb.set_short_code('house', 'hse')
+        self.assertEqual(self.trackerdb._shows['house'].short_code, 'HSE')
+        self.assertEqual(self.trackerdb.find_short_code('HSE'), 'house')
+
+        self.trackerdb.set_short_code('game_of_thrones', None)
+        self.assertIsNone(self.trackerdb.find_short_code('GOT'))
+        with self.assertRaises(ShortCodeAlreadyAssignedError):
+            self.trackerdb.set_short_code('lost', 'HSE')
+        self.assertEqual(self.trackerdb._shows['lost'].short_code, 'LST')
+
+    def test_remove_tracked_show(self):
+        """Test that the short code of a removed show is free again"""
+        self.assertIn('LST', self.trackerdb)
+        self.trackerdb.remove_tracked_show('lost')
+        self.assertNotIn('LST', self.trackerdb)
+        self.trackerdb.set_short_code('house', 'LST')
+        self.assertEqual(self.trackerdb.find_short_code('LST'), 'house')
+
+    def test_replace_show(self):
+        """Test that a show replaced, e.g., from the journal, keeps the index up to date"""
+        self.assertEqual(self.trackerdb.find_short_code('LST'), 'lost')
+        self.trackerdb.replace_show('lost', tracker.TrackedShow(title='Lost', short_code='LOS'))
+        self.assertIsNone(self.trackerdb.find_short_code('LST'))
+        self.assertEqual(self.trackerdb.find_short_code('LOS'), 'lost')
+        self.trackerdb.replace_show('lost', None)
+        self.assertIsNone(self.trackerdb.find_short_code('LOS'))
+
 
 class UtilsTestCase(unittest.TestCase):
     """Test case for utility functions"""
@@ -459,6 +695,22 @@ class UtilsTestCase(unittest.TestCase):
 
         self.assertEqual(episode_details['ratings']['imdb'], None)
 
+    def test_decode_season_response(self):
+        """Test that we decode a season response into episode columns"""
+        content = json.dumps({
+            'Title': 'Game of Thrones',
+            'Season': '7',
+            'Episodes': [
+                {'Title': 'Dragonstone', 'Episode': '1', 'imdbRating': '8.6'},
+                {'Title': 'Episode #7.2', 'Episode': '2', 'imdbRating': 'N/A'},
+            ],
+        }).encode('utf-8')
+
+        self.assertEqual(
+            decode_season_response(content),
+            (7, ['Dragonstone', 'Episode #7.2'], [1, 2], [8.6, None]),
+        )
+
     def test_tabulator(self):
         """Test that we correctly tabulate output"""
         # A little setup required
@@ -550,6 +802,10 @@ class UtilsTestCase(unittest.TestCase):
         expected_output = (6, 10)
         self.assertEqual(expected_output, extract_season_episode_from_str(s))
 
+    def test_extract_season_episode_code_long_season(self):
+        """Test that episode numbers beyond 99 are extracted"""
+        self.assertEqual((2, 491), extract_season_episode_from_str('long runner S02E491'))
+
     def test_extract_season_episode_code_nott_present(self):
         """Test we extract the correct season-episode code from a string."""
         s = 'game of thrones'
@@ -564,6 +820,39 @@ class UtilsTestCase(unittest.TestCase):
         show._set_next_prev(showdb)
         self.assertEqual('S06E09', season_episode_str_from_show(show))
 
+    def test_decode_registered_round_trip(self):
+        """Test that the object_hook builds the same database as Deserializer"""
+        with open(os.path.join('example', '.showdb.json'), 'r') as f:
+            data = f.read()
+        showdb = json.loads(data, object_hook=decode_registered)
+        self.assertIsInstance(showdb, tracker.ShowDatabase)
+        episode = showdb._shows['game_of_thrones']._seasons[0]._episodes[0]
+        self.assertIsInstance(episode, tracker.Episode)
+        self.assertIsInstance(episode.ratings, dict)
+
+        tree_showdb = Deserializer(json.loads(data)).deserialize()
+        self.assertEqual(
+            json.dumps(showdb, cls=EncodeShow, sort_keys=True),
+            json.dumps(tree_showdb, cls=EncodeShow, sort_keys=True),
+        )
+
+    def test_compiled_encoders_match_reflective_encoder(self):
+        """Test that the per-class encoders write the same json as encoding each attribute dict"""
+        class ReflectiveEncoder(json.JSONEncoder):
+            def default(self, obj):
+                if isinstance(obj, tracker.RegisteredSerializable):
+                    return {'__{}__'.format(obj.serialized_name()): obj.serializable_attributes()}
+                return json.JSONEncoder.default(self, obj)
+
+        for name in ('.showdb.json', '.tracker.json'):
+            database = tracker.load_database(os.path.join('example', name))
+            database._shows = dict(database._shows)
+            self.assertEqual(
+                json.dumps(database, cls=EncodeShow, sort_keys=True),
+                json.dumps(database, cls=ReflectiveEncoder, sort_keys=True),
+            )
+
+
 class DBCheckTestCase(unittest.TestCase):
     """Small test case for checking for database existence"""
     @classmethod
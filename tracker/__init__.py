@@ -5,21 +5,42 @@ from .tracker import (
     Show,
     ShowDetails,
     Episode,
+    MappedSeason,
     Season,
     TrackerDatabase,
     add_show_to_showdb,
+    add_shows_to_showdb,
     command_add,
     command_inc_dec,
     command_rm,
+    commit_databases,
     handle_watchlist,
     tracker,
     process_args,
     load_database,
     load_all_dbs,
+    update_database,
     update_tracker_title,
 )
+from .api import (
+    CircuitBreaker,
+    Client,
+    close_session,
+    create_session,
+    get_api_url,
+    get_client,
+    get_session,
+    set_api_url,
+    set_rate_limit,
+    TokenBucket,
+)
+from .cache import ResponseCache
 from .exceptions import (
+    APIConnectionError,
     APIRequestError,
+    APIResponseError,
+    CircuitOpenError,
+    DeadlineExceededError,
     DatabaseError,
     EpisodeOutOfBoundsError,
     FoundFilmError,  # API request related
@@ -33,13 +54,26 @@ from .exceptions import (
     TrackerDatabaseNotFoundError,
     WatchlistError,
 )
+from .fetch import FetchEngine, ShowPipeline, StageStats
+from .storage import (
+    detect_format,
+    dumps_binary,
+    EpisodeArray,
+    LazyShows,
+    loads_binary,
+    ShardedShows,
+    StagedWrite,
+)
 from .utils import (
     check_for_databases,
     check_for_season_episode_code,
+    decode_registered,
+    decode_season_response,
     Deserializer,
     extract_season_episode_from_str,
     EncodeShow,
     extract_episode_details,
+    find_database,
     get_show_database_entry,
     logging_init,
     lunderize,
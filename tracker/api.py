@@ -0,0 +1,414 @@
+"""This module contains the HTTP client used to talk to the external API (OMDbAPI)."""
+import json
+import logging
+import os
+import random
+import threading
+import time
+import urllib.parse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .exceptions import (
+    APIConnectionError,
+    APIResponseError,
+    CircuitOpenError,
+    DeadlineExceededError,
+)
+
+logger = logging.getLogger(__name__)
+
+API_URL = 'http://www.omdbapi.com'
+
+# Set TVST_API_URL (or call set_api_url) to send requests somewhere other
+# than the real API, e.g., a tracker.standin server.
+_api_url = os.environ.get('TVST_API_URL', API_URL)
+
+# Number of requests we expect to have in flight at any one time. The
+# connection pool is sized to match so that connections are reused
+# rather than opened and discarded.
+DEFAULT_CONCURRENCY = 8
+
+# Requests per second allowed by the rate limiter.
+DEFAULT_RATE = 10
+
+# Retry policy: retries per request, the base of the exponential backoff
+# in seconds, and the longest we will wait between two attempts.
+DEFAULT_RETRIES = 4
+DEFAULT_BACKOFF = 0.5
+MAX_BACKOFF = 30
+
+# Seconds allowed for a single attempt, and for a request as a whole
+# (including retries).
+DEFAULT_TIMEOUT = 10
+DEFAULT_DEADLINE = 60
+
+# Response statuses which mean the request is worth retrying.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_session = None
+_client = None
+_rate = DEFAULT_RATE
+_rate_limiter = None
+_session_lock = threading.Lock()
+
+# Circuit breakers shared by every client made by get_client, by host.
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_api_url():
+    """Return the URL which API requests are sent to."""
+    return _api_url
+
+
+def set_api_url(url=None):
+    """Send API requests to *url*, or to the real API if *url* is None."""
+    global _api_url
+    _api_url = API_URL if url is None else url
+    logger.info('Send API requests to %r', _api_url)
+
+
+def set_rate_limit(rate=None):
+    """Limit requests made through the shared client to *rate* per second."""
+    global _client, _rate, _rate_limiter
+    with _session_lock:
+        _rate = DEFAULT_RATE if rate is None else rate
+        _rate_limiter = None
+        _client = None
+
+
+def create_session(pool_size=DEFAULT_CONCURRENCY):
+    """Return a requests.Session backed by a keep-alive connection pool.
+
+    Args:
+        pool_size: Maximum number of connections kept open to the API.
+            Callers beyond this limit wait for a free connection instead
+            of opening (and then throwing away) a new one.
+
+    Returns:
+        A requests.Session instance.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=pool_size,
+        pool_block=True,
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    logger.debug('Create HTTP session with pool_size=%r', pool_size)
+    return session
+
+
+def get_session(pool_size=DEFAULT_CONCURRENCY):
+    """Return the session shared by every API request in this process.
+
+    The session is created on first use and lives until close_session()
+    is called, so a single run (or a long-lived process) pays for
+    connection set up once.
+
+    Args:
+        pool_size: Size of the connection pool if the session has not
+            been created yet.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session(pool_size)
+        return _session
+
+
+def close_session():
+    """Close the shared session, if one was created."""
+    global _session, _client
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+            _client = None
+
+
+class TokenBucket:
+    """Limit the rate at which requests are made.
+
+    Tokens are added at *rate* per second, up to *burst* tokens, and each
+    request takes one. When the API starts rejecting requests the rate is
+    halved by throttle(), and recover() creeps it back up towards the
+    configured rate after each success, so requests are made at about the
+    highest rate the API will accept.
+    """
+    def __init__(self, rate=None, burst=None, min_rate=None):
+        self.max_rate = DEFAULT_RATE if rate is None else rate
+        self.rate = self.max_rate
+        self.min_rate = self.max_rate / 16 if min_rate is None else min_rate
+        self.burst = DEFAULT_CONCURRENCY if burst is None else burst
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline=None):
+        """Block until a token is available, and take it.
+
+        Raises:
+            DeadlineExceededError: a token will not be available before
+                *deadline*, a time.monotonic() value.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst,
+                    self._tokens + (now - self._updated) * self.rate,
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+
+            if deadline is not None and now + wait > deadline:
+                raise DeadlineExceededError('Request deadline passed waiting for rate limit.')
+            time.sleep(wait)
+
+    def throttle(self):
+        """Halve the request rate."""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            logger.info('Throttle API request rate to %.2f/s', self.rate)
+
+    def recover(self):
+        """Increase the request rate a little, up to the configured rate."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 16)
+
+
+class CircuitBreaker:
+    """Stop making requests to a host which keeps failing.
+
+    After *failure_threshold* failures in a row the circuit opens and
+    requests fail immediately. Once *reset_timeout* seconds have passed a
+    single trial request is let through: if it succeeds the circuit
+    closes again, otherwise it stays open for another *reset_timeout*.
+    """
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at = None
+        self._trial_in_progress = False
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        """Check that a request may be made.
+
+        Returns:
+            True if the request is the trial request of an open circuit,
+            in which case end_trial() must be called once it is over.
+
+        Raises:
+            CircuitOpenError: the circuit is open.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            if (
+                self._trial_in_progress
+                or time.monotonic() - self._opened_at < self.reset_timeout
+            ):
+                raise CircuitOpenError(
+                    'Requests suspended after {} consecutive failures.'.format(self.failures)
+                )
+            self._trial_in_progress = True
+            return True
+
+    def end_trial(self):
+        """Let another trial request through, if no outcome was recorded for this one."""
+        with self._lock:
+            self._trial_in_progress = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._trial_in_progress = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_progress or self.failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning('Open circuit after %r consecutive failures', self.failures)
+                self._opened_at = time.monotonic()
+                self._trial_in_progress = False
+
+
+class Client:
+    """Make requests to the API without overwhelming it.
+
+    Every request waits for the rate limiter, goes through the circuit
+    breaker for the API host, and is retried with jittered exponential
+    backoff if it times out or the API responds with 429 or a 5xx status.
+    A request, including its retries, must finish within *deadline*
+    seconds. Requests are sent to *url*, which defaults to get_api_url().
+
+    Clients given the same *breakers*, a dictionary of circuit breakers
+    by host, share their breakers, as those made by get_client() do.
+    """
+    def __init__(
+        self,
+        session=None,
+        url=None,
+        rate_limiter=None,
+        retries=DEFAULT_RETRIES,
+        timeout=DEFAULT_TIMEOUT,
+        deadline=DEFAULT_DEADLINE,
+        backoff=DEFAULT_BACKOFF,
+        breakers=None,
+    ):
+        self.session = get_session() if session is None else session
+        self.url = get_api_url() if url is None else url
+        self.rate_limiter = TokenBucket() if rate_limiter is None else rate_limiter
+        self.retries = retries
+        self.timeout = timeout
+        self.deadline = deadline
+        self.backoff = backoff
+        self._breakers = {} if breakers is None else breakers
+
+    def breaker(self, url=None):
+        """Return the circuit breaker for the host of *url*."""
+        host = urllib.parse.urlsplit(self.url if url is None else url).netloc
+        with _breakers_lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker()
+            return self._breakers[host]
+
+    def request_content(self, payload):
+        """Make an API request and return the undecoded response body.
+
+        Raises:
+            APIConnectionError: the API could not be reached.
+            APIResponseError: the API responded with an error status.
+            CircuitOpenError: requests to the API host are suspended.
+            DeadlineExceededError: the request did not succeed before the
+                deadline.
+        """
+        deadline = time.monotonic() + self.deadline
+        breaker = self.breaker()
+
+        for attempt in range(self.retries+1):
+            trial = breaker.before_request()
+            try:
+                self.rate_limiter.acquire(deadline)
+                timeout = min(self.timeout, deadline - time.monotonic())
+
+                logger.debug('Make API request with payload=%r', payload)
+                response = self.session.get(self.url, params=payload, timeout=timeout)
+            except requests.exceptions.Timeout as e:
+                logger.warning('Request with payload=%r timed out: %s', payload, e)
+                breaker.record_failure()
+                error = DeadlineExceededError(
+                    'Request timed out for payload={!r}: {}'.format(payload, e)
+                )
+                delay = self._backoff_delay(attempt)
+            except requests.exceptions.ConnectionError as e:
+                logger.warning('Request with payload=%r failed to connect: %s', payload, e)
+                breaker.record_failure()
+                error = APIConnectionError(
+                    'Could not connect to the API for payload={!r}: {}'.format(payload, e)
+                )
+                delay = self._backoff_delay(attempt)
+            else:
+                if response.status_code < 400:
+                    breaker.record_success()
+                    self.rate_limiter.recover()
+                    return response.content
+
+                error = APIResponseError(
+                    'API responded with status={} for payload={!r}'.format(
+                        response.status_code, payload,
+                    )
+                )
+                if response.status_code not in RETRY_STATUSES:
+                    # The host is up, the request itself is at fault
+                    breaker.record_success()
+                    raise error
+
+                logger.warning(error)
+                breaker.record_failure()
+                if response.status_code == 429:
+                    self.rate_limiter.throttle()
+                delay = self._backoff_delay(attempt, response.headers.get('Retry-After'))
+            finally:
+                if trial:
+                    # e.g., the deadline passed waiting for the rate limiter
+                    breaker.end_trial()
+
+            if attempt == self.retries:
+                break
+            if time.monotonic() + delay > deadline:
+                raise DeadlineExceededError(
+                    'Request deadline passed for payload={!r}: {}'.format(payload, error)
+                )
+            time.sleep(delay)
+
+        raise error
+
+    def _backoff_delay(self, attempt, retry_after=None):
+        """Return how long to wait before retry number *attempt*.
+
+        Uses "full jitter", a random delay of up to backoff * 2**attempt
+        seconds, so that concurrent requests which failed together do not
+        retry together. A Retry-After header in seconds is respected.
+        """
+        delay = random.uniform(0, min(MAX_BACKOFF, self.backoff * 2**attempt))
+        try:
+            return max(delay, float(retry_after))
+        except (TypeError, ValueError):
+            return delay
+
+
+def get_client(pool_size=DEFAULT_CONCURRENCY, session=None):
+    """Return the client shared by every API request in this process.
+
+    The client uses the shared session, and shares its rate limit and
+    circuit breakers with every other request in this process.
+
+    Args:
+        pool_size: Size of the connection pool if the shared session has
+            not been created yet.
+        session: requests.Session to make requests with instead of the
+            shared session. The client returned still shares the rate
+            limit and circuit breakers.
+    """
+    global _client, _rate_limiter
+    if session is None:
+        session = get_session(pool_size)
+    with _session_lock:
+        if _rate_limiter is None:
+            _rate_limiter = TokenBucket(rate=_rate, burst=pool_size)
+        if session is not _session:
+            return Client(session, rate_limiter=_rate_limiter, breakers=_breakers)
+        if _client is None or _client.session is not session or _client.url != _api_url:
+            _client = Client(session, rate_limiter=_rate_limiter, breakers=_breakers)
+        return _client
+
+
+def request(payload, session=None):
+    """Make a single API request.
+
+    Args:
+        payload: Dictionary of query parameters for the request.
+        session: requests.Session to make the request with. Defaults to
+            the session shared by the whole process.
+
+    Returns:
+        Decoded JSON response.
+    """
+    return json.loads(request_content(payload, session))
+
+
+def request_content(payload, session=None):
+    """Make a single API request and return the undecoded response body."""
+    return get_client(session=session).request_content(payload)
@@ -0,0 +1,182 @@
+"""This module contains an on-disk cache of responses from the external API."""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from .api import get_api_url
+
+logger = logging.getLogger(__name__)
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+# How long a cached response stays fresh, in seconds, for each kind of
+# request. Search results and the episodes of finished seasons rarely
+# change, whereas the show details (which hold the number of seasons) and
+# the current season pick up new episodes and ratings.
+DEFAULT_TTLS = {
+    'search': 30 * DAY,
+    'details': DAY,
+    'season': 30 * DAY,
+    'current_season': 6 * HOUR,
+}
+
+DEFAULT_MAX_ENTRIES = 10000
+
+
+def payload_kind(payload):
+    """Return the kind of request made with *payload*.
+
+    The caller is responsible for deciding whether a season request is
+    for the current season.
+    """
+    if 's' in payload:
+        return 'search'
+    elif 'season' in payload:
+        return 'season'
+    return 'details'
+
+
+def payload_key(payload):
+    """Return a normalised key for the request made with *payload*.
+
+    Values are compared as strings, so {'season': 1} and {'season': '1'}
+    share a key.
+
+    Usage:
+    >>> payload_key({'season': 1, 'i': 'tt0944947'})
+    '{"i": "tt0944947", "season": "1"}'
+    """
+    return json.dumps({k: str(v) for k, v in payload.items()}, sort_keys=True)
+
+
+class ResponseCache:
+    """Store raw API responses on disk, one file per request.
+
+    A file's modification time records when the response was stored, and
+    its access time records when it was last read. Entries older than the
+    TTL for their kind are ignored, and the least recently read entries
+    are removed once there are more than *max_entries* of them.
+
+    Entries are kept apart by the URL of the API which answered them, so
+    responses from a stand-in are never served for the real API. The
+    cache may be used from several threads at once.
+    """
+    def __init__(self, directory, ttls=None, max_entries=DEFAULT_MAX_ENTRIES):
+        self.directory = directory
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls is not None:
+            self.ttls.update(ttls)
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._entries = sum(1 for e in os.scandir(self.directory) if e.name.endswith('.json'))
+
+    def _path(self, payload, url=None):
+        if url is None:
+            url = get_api_url()
+        key = '{} {}'.format(url, payload_key(payload))
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, '{}.json'.format(digest))
+
+    def get(self, payload, kind=None, url=None):
+        """Return the cached response content for *payload*, or None.
+
+        *url* is the API the request would be sent to, by default
+        get_api_url().
+        """
+        if kind is None:
+            kind = payload_kind(payload)
+        path = self._path(payload, url)
+        now = time.time()
+
+        try:
+            stored = os.stat(path).st_mtime
+            if now - stored > self.ttls[kind]:
+                raise FileNotFoundError(path)
+            with open(path, 'rb') as f:
+                content = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            logger.debug('Cache miss for payload=%r', payload)
+            return None
+
+        # Mark the entry as recently used, leaving the time it was stored
+        # untouched.
+        try:
+            os.utime(path, (now, stored))
+        except FileNotFoundError:
+            # Evicted since it was read
+            pass
+        with self._lock:
+            self.hits += 1
+        logger.debug('Cache hit for payload=%r', payload)
+        return content
+
+    def put(self, payload, content, url=None):
+        """Store the response *content* for *payload*, answered by the API at *url*."""
+        path = self._path(payload, url)
+        existed = os.path.exists(path)
+
+        # Write to a temporary file first so that a concurrent reader never
+        # sees a partially written response.
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+        if not existed:
+            with self._lock:
+                self._entries += 1
+                if self._entries > self.max_entries:
+                    self._evict()
+
+    def evict(self):
+        """Remove the least recently used entries.
+
+        Removes enough entries to leave the cache 10% below max_entries,
+        so that the directory is not scanned on every new entry.
+        """
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.json'):
+                entries.append((entry.stat().st_atime, entry.path))
+        entries.sort()
+
+        target = int(self.max_entries * 0.9)
+        excess = max(len(entries) - target, 0)
+        for _, path in entries[:excess]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+        logger.debug('Evicted %r entries from response cache', excess)
+        self.evictions += excess
+        self._entries = len(entries) - excess
+
+    def __len__(self):
+        return self._entries
+
+    def __repr__(self):
+        return '{}({!r}, hits={!r}, misses={!r}, evictions={!r})'.format(
+            self.__class__.__name__,
+            self.directory,
+            self.hits,
+            self.misses,
+            self.evictions,
+        )
@@ -13,6 +13,22 @@ class ShowNotFoundError(APIRequestError):
     """The requested show was not found in the external database."""
 
 
+class APIResponseError(APIRequestError):
+    """The external API responded with an error status."""
+
+
+class CircuitOpenError(APIRequestError):
+    """Requests to the external API are suspended after repeated failures."""
+
+
+class DeadlineExceededError(APIRequestError):
+    """A request to the external API did not succeed before its deadline."""
+
+
+class APIConnectionError(APIRequestError):
+    """The external API could not be reached."""
+
+
 class TrackerError(Exception):
     """Base class for errors relating to the Tracker database."""
 
@@ -0,0 +1,386 @@
+"""This module contains the asyncio engine used to populate shows from the external API."""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import re
+import time
+
+from .api import DEFAULT_CONCURRENCY, get_client
+from .cache import payload_key, payload_kind
+
+logger = logging.getLogger(__name__)
+
+# Matches the error flag of a response, without decoding the whole response
+ERROR_RESPONSE = re.compile(rb'"Response"\s*:\s*"False"')
+
+
+class FetchEngine:
+    """Issue API requests concurrently on an asyncio event loop.
+
+    At most *concurrency* requests are in flight at any one time. The
+    HTTP client is blocking, so each request is handed to a worker pool
+    of the same size; the event loop only schedules and collects them.
+    Requests are made through an api.Client, which applies the rate limit,
+    retries and circuit breaker.
+
+    If a ResponseCache is given, fresh cached responses are used instead
+    of making a request, and new responses are added to it.
+
+    Identical requests which are in flight at the same time are made only
+    once, and every caller shares the response. The number of requests
+    saved this way is kept in *coalesced*.
+
+    Usage:
+    >>> engine = FetchEngine(concurrency=16)
+    >>> engine.run(engine.populate_show, Show('Game of Thrones'))
+    """
+    def __init__(self, session=None, concurrency=None, cache=None, client=None):
+        self.concurrency = DEFAULT_CONCURRENCY if concurrency is None else concurrency
+        if client is None:
+            client = get_client(self.concurrency, session)
+        self.client = client
+        self.cache = cache
+        self.coalesced = 0
+        self.stage_stats = {}
+        self._semaphore = None
+        self._executor = None
+        self._in_flight = {}
+
+    def run(self, func, *args):
+        """Run the coroutine function *func* to completion and return its result.
+
+        This creates a new event loop, so it must not be called from code
+        which is already running inside one.
+        """
+        return asyncio.run(self._run(func, *args))
+
+    async def _run(self, func, *args):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._in_flight = {}
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            self._executor = executor
+            try:
+                return await func(*args)
+            finally:
+                self._executor = None
+
+    async def request(self, payload, kind=None, refresh=False):
+        """Make an API request once a slot is available.
+
+        Args:
+            payload: Dictionary of query parameters for the request.
+            kind: Kind of request, used to pick how long a cached response
+                stays fresh. Worked out from *payload* if not given.
+            refresh: Always make the request, even if a fresh response is
+                cached. The new response is still stored in the cache.
+
+        Returns:
+            Decoded JSON response.
+        """
+        return json.loads(await self.request_content(payload, kind, refresh))
+
+    async def request_content(self, payload, kind=None, refresh=False):
+        """Make an API request and return the undecoded response body.
+
+        Takes the same arguments as request().
+        """
+        if self.cache is not None and not refresh:
+            # Cache reads and writes go to the default executor, rather
+            # than waiting for a worker busy with a request.
+            loop = asyncio.get_running_loop()
+            content = await loop.run_in_executor(
+                None, self.cache.get, payload, kind or payload_kind(payload), self.client.url
+            )
+            if content is not None:
+                return content
+
+        key = payload_key(payload)
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._request_content(payload))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+            logger.debug('Share in-flight request for payload=%r', payload)
+
+        # Shield the shared request, so that one caller being cancelled
+        # does not cancel it for everybody else.
+        return await asyncio.shield(task)
+
+    async def _request_content(self, payload):
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            content = await loop.run_in_executor(
+                self._executor, self.client.request_content, payload
+            )
+
+        # Don't hold on to errors, e.g., show not found or request limit
+        # reached.
+        if self.cache is not None and not ERROR_RESPONSE.search(content):
+            await loop.run_in_executor(None, self.cache.put, payload, content, self.client.url)
+
+        return content
+
+    async def populate_show(self, show):
+        """Request the search, details and every season of *show*.
+
+        The season requests are made concurrently, and their responses are
+        stored in show._seasons in season order.
+
+        Raises:
+            ShowNotFoundError: the show could not be found in the external
+                database.
+        """
+        await self.search_show(show)
+        show_details = await self.request_details(show)
+        await self.request_seasons(show, show_details)
+
+    async def search_show(self, show):
+        """Search for *show*, and set its IMDb ID from the first result.
+
+        Raises:
+            ShowNotFoundError: the show could not be found in the external
+                database.
+        """
+        search_response = await self.request(show.payload(search=True))
+        show.set_imdb_id(search_response)
+
+    async def request_details(self, show):
+        """Return the details of a *show* whose IMDb ID is set."""
+        show_details = await self.request(show.payload())
+        logger.debug(show_details)
+        return show_details
+
+    async def request_seasons(self, show, show_details):
+        """Request every season listed in *show_details*, and store them in *show*."""
+        total_seasons = int(show_details['totalSeasons'])
+        logger.debug('Total seasons for show <%r>: %r', show.request_title, total_seasons)
+
+        # gather() returns responses in the order the requests were made,
+        # regardless of the order in which they complete.
+        # Season responses are left undecoded, and are decoded straight into
+        # Episode instances by add_season.
+        season_responses = await asyncio.gather(
+            *(self.request_content(show.payload(season=s), self._season_kind(s, total_seasons))
+              for s in range(1, total_seasons+1))
+        )
+
+        show._seasons = []
+        for season_details in season_responses:
+            show.add_season(season_details)
+
+        show.set_title(show_details)
+
+    async def refresh_show(self, show):
+        """Update a populated *show* with new seasons and episodes.
+
+        Only the show details, the most recent stored season and any new
+        seasons are requested, so refreshing a show which is already up to
+        date costs two requests. Seasons are patched into show._seasons in
+        place.
+
+        Raises:
+            ShowNotFoundError: the show has never been populated and could
+                not be found in the external database.
+        """
+        if not (show.imdb_id and show._seasons):
+            await self.populate_show(show)
+            return
+
+        show_details = await self.request(show.payload(), refresh=True)
+        total_seasons = int(show_details['totalSeasons'])
+        stored_seasons = len(show._seasons)
+        logger.debug(
+            'Refresh show <%r>: %r seasons stored, %r seasons available',
+            show.request_title,
+            stored_seasons,
+            total_seasons,
+        )
+
+        # The most recent stored season may have gained episodes or ratings
+        seasons = range(stored_seasons, max(stored_seasons, total_seasons)+1)
+        season_responses = await asyncio.gather(
+            *(self.request_content(show.payload(season=s), self._season_kind(s, total_seasons), True)
+              for s in seasons)
+        )
+
+        for season, season_details in zip(seasons, season_responses):
+            show.update_season(season, season_details)
+
+        show.set_title(show_details)
+
+    async def refresh_shows(self, shows):
+        """Refresh many shows at once.
+
+        Returns:
+            A list with an entry for each show, in the order given: None if
+            the show was refreshed, otherwise the exception raised.
+        """
+        return await asyncio.gather(
+            *(self.refresh_show(show) for show in shows),
+            return_exceptions=True,
+        )
+
+    @staticmethod
+    def _season_kind(season, total_seasons):
+        return 'current_season' if season == total_seasons else 'season'
+
+    async def populate_shows(self, shows, stage_concurrency=None, queue_size=None):
+        """Populate many shows at once.
+
+        The shows are passed through a ShowPipeline, so one show's search
+        overlaps with another show's season requests. The statistics for
+        each stage are kept in *stage_stats*.
+
+        Returns:
+            A list with an entry for each show, in the order given: None if
+            the show was populated, otherwise the exception raised.
+        """
+        pipeline = ShowPipeline(self, stage_concurrency, queue_size)
+        results = await pipeline.run(shows)
+        self.stage_stats = pipeline.stats
+        for stats in pipeline.stats.values():
+            logger.info(stats)
+        return results
+
+
+class StageStats:
+    """Throughput of one stage of a ShowPipeline.
+
+    *busy* is the time spent handling shows, summed across the workers of
+    the stage, and *elapsed* is the time from the first show starting the
+    stage to the last show leaving it.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.shows = 0
+        self.errors = 0
+        self.busy = 0
+        self._started = None
+        self._finished = None
+
+    def record(self, started, finished, error=False):
+        self.shows += 1
+        self.errors += error
+        self.busy += finished - started
+        if self._started is None or started < self._started:
+            self._started = started
+        if self._finished is None or finished > self._finished:
+            self._finished = finished
+
+    @property
+    def elapsed(self):
+        if self._started is None:
+            return 0
+        return self._finished - self._started
+
+    @property
+    def throughput(self):
+        """Shows handled per second."""
+        return self.shows / self.elapsed if self.elapsed else 0
+
+    def __repr__(self):
+        return '{}({!r}, shows={!r}, errors={!r}, elapsed={:.3f}s, throughput={:.1f}/s)'.format(
+            self.__class__.__name__,
+            self.name,
+            self.shows,
+            self.errors,
+            self.elapsed,
+            self.throughput,
+        )
+
+
+class ShowPipeline:
+    """Populate shows in three stages: search, details and seasons.
+
+    Each stage has a bounded queue and its own number of workers. A worker
+    takes a show from its queue, makes the requests for its stage, and
+    hands the show on to the queue of the next stage, so the stages of
+    different shows overlap. Every request still goes through the
+    engine, and so shares its concurrency limit, cache and rate limit.
+
+    Args:
+        engine: FetchEngine to make requests with.
+        concurrency: Number of workers for each stage, either a single
+            number or a dictionary keyed by stage name. Defaults to the
+            concurrency of *engine*.
+        queue_size: Maximum number of shows waiting in front of each
+            stage. Defaults to twice the number of workers of the stage.
+    """
+    STAGES = ('search', 'details', 'seasons')
+
+    def __init__(self, engine, concurrency=None, queue_size=None):
+        self.engine = engine
+        if concurrency is None:
+            concurrency = engine.concurrency
+        if not isinstance(concurrency, dict):
+            concurrency = dict.fromkeys(self.STAGES, concurrency)
+        self.concurrency = {
+            stage: max(1, concurrency.get(stage, engine.concurrency)) for stage in self.STAGES
+        }
+        self.queue_size = queue_size
+        self.stats = {stage: StageStats(stage) for stage in self.STAGES}
+
+    async def _handle(self, stage, show, value):
+        if stage == 'search':
+            await self.engine.search_show(show)
+        elif stage == 'details':
+            return await self.engine.request_details(show)
+        else:
+            await self.engine.request_seasons(show, value)
+
+    async def run(self, shows):
+        """Pass every show in *shows* through the pipeline.
+
+        Returns:
+            A list with an entry for each show, in the order given: None if
+            the show was populated, otherwise the exception raised.
+        """
+        results = [None] * len(shows)
+        queues = {
+            stage: asyncio.Queue(
+                2 * self.concurrency[stage] if self.queue_size is None else self.queue_size
+            )
+            for stage in self.STAGES
+        }
+        next_stages = dict(zip(self.STAGES, self.STAGES[1:] + (None,)))
+
+        async def worker(stage):
+            queue = queues[stage]
+            next_stage = next_stages[stage]
+            while True:
+                index, value = await queue.get()
+                started = time.perf_counter()
+                try:
+                    value = await self._handle(stage, shows[index], value)
+                except Exception as e:
+                    results[index] = e
+                    self.stats[stage].record(started, time.perf_counter(), error=True)
+                else:
+                    self.stats[stage].record(started, time.perf_counter())
+                    if next_stage is not None:
+                        await queues[next_stage].put((index, value))
+                finally:
+                    queue.task_done()
+
+        workers = [
+            asyncio.ensure_future(worker(stage))
+            for stage in self.STAGES
+            for _ in range(self.concurrency[stage])
+        ]
+        try:
+            for index in range(len(shows)):
+                await queues['search'].put((index, None))
+            # A show is put on the next queue before it is marked done on
+            # its own, so once each queue is drained in stage order every
+            # show has left the pipeline.
+            for stage in self.STAGES:
+                await queues[stage].join()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        return results
@@ -0,0 +1,185 @@
+"""This module contains the append-only journal of changes to a database.
+
+A sub-command only changes one tracked show, so rather than rewriting the
+whole tracker, the new state of that show is appended to a journal next
+to it, e.g., .tracker.journal next to .tracker.json. Each line of the
+journal is a JSON record:
+
+    {"op": "inc", "key": "game_of_thrones", "time": 1700000000.0,
+     "show": {"__TrackedShow__": {...}}}
+
+where *show* is null if the show was removed. Loading a database replays
+its journal on top of it. Records hold the whole show rather than the
+operation, so replaying them does not need the show database, and
+replaying a record twice is harmless.
+
+Once the journal grows past a size threshold it is compacted: the
+database is written in full, and the records it now holds are dropped
+from the journal. The journal also serves as a log of every change made
+by a sub-command since the last compaction.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from .utils import decode_registered, EncodeShow
+
+logger = logging.getLogger(__name__)
+
+# Size in bytes past which a journal is compacted into its database
+DEFAULT_COMPACT_SIZE = 64 * 1024
+
+
+def journal_path(path_to_db):
+    """Return the path of the journal of the database at *path_to_db*.
+
+    The journal is shared by every storage format of the database.
+
+    Usage:
+    >>> journal_path('example/.tracker.json')
+    'example/.tracker.journal'
+    """
+    return os.path.splitext(path_to_db)[0] + '.journal'
+
+
+class Journal:
+    """Append-only journal of changes to the shows of a database.
+
+    *applied* is the number of bytes at the start of the journal whose
+    records are held by the database in memory, either because they were
+    replayed into it or because it made them. Only those are dropped when
+    the database is written.
+
+    Usage:
+    >>> journal = Journal(journal_path(trackerdb.path_to_db))
+    >>> journal.append('inc', 'game_of_thrones', trackerdb._shows['game_of_thrones'])
+    >>> journal.replay(load('.tracker.json'))
+    """
+    def __init__(self, path, compact_size=DEFAULT_COMPACT_SIZE):
+        self.path = path
+        self.compact_size = compact_size
+        self.applied = 0
+
+    def size(self):
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    def append(self, op, key, show):
+        """Record that *op* left the show stored under *key* as *show*.
+
+        The record is on disk when this returns. Pass None as *show* if
+        the show was removed.
+        """
+        record = {'op': op, 'key': key, 'time': time.time(), 'show': show}
+        line = json.dumps(record, cls=EncodeShow, sort_keys=True).encode('utf-8') + b'\n'
+        with open(self.path, 'ab') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+            end = f.tell()
+        if self.applied == end - len(line):
+            self.applied = end
+        logger.debug('Append %r of show=%r to journal=%r', op, key, self.path)
+
+    def records(self):
+        """Yield each record in the journal, with the offset of its end.
+
+        The show of each record is decoded into a registered class.
+
+        A partly written record at the end of the journal, e.g., from a
+        crash during an append, is ignored.
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+
+        pos = 0
+        while True:
+            end = data.find(b'\n', pos)
+            if end == -1:
+                if pos < len(data):
+                    logger.warning('Ignore incomplete record at end of journal=%r', self.path)
+                return
+            try:
+                record = json.loads(data[pos:end].decode('utf-8'), object_hook=decode_registered)
+            except (TypeError, ValueError):
+                logger.warning('Ignore corrupt record at offset=%r of journal=%r', pos, self.path)
+                return
+            pos = end + 1
+            yield pos, record
+
+    def replay(self, database):
+        """Apply the records in the journal to *database*.
+
+        Returns:
+            Number of records applied.
+        """
+        count = 0
+        for end, record in self.records():
+            database.replace_show(record['key'], record['show'])
+            self.applied = end
+            count += 1
+
+        if count:
+            logger.info('Replay %r records from journal=%r', count, self.path)
+        return count
+
+    def needs_compaction(self):
+        return self.size() > self.compact_size
+
+    def discard_applied(self):
+        """Drop the applied records, after the database has been written.
+
+        Records appended by somebody else since are kept.
+        """
+        if not self.applied:
+            return
+
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(self.applied)
+                tail = f.read()
+        except FileNotFoundError:
+            tail = b''
+
+        if tail:
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or '.')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(tail)
+            os.replace(temp_path, self.path)
+        else:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+        self.applied = 0
+
+    def compact(self, database):
+        """Write *database* in full, which drops the records it holds."""
+        logger.info('Compact journal=%r of %r bytes', self.path, self.size())
+        database.write_db()
+
+    def compact_in_background(self, database):
+        """Compact the journal on a new thread, and return the thread.
+
+        *database* must not be changed until the thread has finished. The
+        thread is not a daemon, so the interpreter waits for it to finish
+        before exiting.
+        """
+        thread = threading.Thread(
+            target=self.compact,
+            args=(database,),
+            name='journal-compaction',
+        )
+        thread.start()
+        return thread
+
+    def __repr__(self):
+        return '{}({!r})'.format(self.__class__.__name__, self.path)
@@ -0,0 +1,286 @@
+"""This module contains a local stand-in for the external API (OMDbAPI).
+
+The stand-in serves recorded search, details and season responses from a
+fixture directory, so that fetching can be tested and benchmarked
+offline. Latency, jitter and errors can be injected into its responses.
+
+Run a stand-in from the command line, and point the tracker at it:
+
+    $ python -m tracker.standin fixtures/ --port 8080 --latency 0.05
+    $ TVST_API_URL=http://127.0.0.1:8080 ./tvst --watchlist
+
+Pass --record to fetch and save any response which is not in the fixture
+directory from the real API.
+"""
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import logging
+import os
+import random
+import threading
+import time
+import urllib.parse
+
+import requests
+
+from .api import API_URL
+
+logger = logging.getLogger(__name__)
+
+NOT_RECORDED = b'{"Response": "False", "Error": "Response not recorded."}'
+INJECTED_ERROR = b'{"Response": "False", "Error": "Injected error."}'
+
+
+def fixture_name(payload):
+    """Return the fixture file name for the request made with *payload*.
+
+    Usage:
+    >>> fixture_name({'season': 1, 'i': 'tt0944947'})
+    'i=tt0944947&season=1.json'
+    """
+    params = sorted((k, str(v)) for k, v in payload.items() if k != 'apikey')
+    return '{}.json'.format(urllib.parse.urlencode(params))
+
+
+class StandInRequestHandler(BaseHTTPRequestHandler):
+    """Answer an API request from the fixtures of the server"""
+    def do_GET(self):
+        server = self.server
+        query = urllib.parse.urlsplit(self.path).query
+        params = dict(urllib.parse.parse_qsl(query))
+
+        server.delay()
+
+        if server.inject_error():
+            self._respond(503, INJECTED_ERROR)
+            return
+
+        content = server.load_fixture(params)
+        if content is None and server.record_url:
+            content = server.record_fixture(params)
+
+        if content is None:
+            self._respond(server.not_recorded_status, NOT_RECORDED)
+        else:
+            self._respond(200, content)
+
+    def _respond(self, status, content):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Local HTTP server which replays recorded API responses.
+
+    Args:
+        fixture_dir: Directory of recorded responses, named by fixture_name.
+        address: (host, port) to listen on. Port 0 picks a free port.
+        latency: Seconds to wait before answering each request.
+        jitter: Each delay is varied by up to this many seconds either way.
+        error_rate: Fraction of requests answered with a 503 error.
+        record_url: If set, responses missing from fixture_dir are fetched
+            from this URL and saved.
+        seed: Seed for the random delays and errors, for repeatable runs.
+        not_recorded_status: Status of the answer to a request which has
+            not been recorded. The answer is "Response": "False", by
+            default with a 200 status, as the API answers a title it does
+            not know.
+
+    Usage:
+    >>> with StandInServer('fixtures', latency=0.05) as server:
+    ...     set_api_url(server.url)
+    """
+    daemon_threads = True
+
+    def __init__(
+        self,
+        fixture_dir,
+        address=('127.0.0.1', 0),
+        latency=0,
+        jitter=0,
+        error_rate=0,
+        record_url=None,
+        seed=None,
+        not_recorded_status=200,
+    ):
+        super().__init__(address, StandInRequestHandler)
+        self.fixture_dir = fixture_dir
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.record_url = record_url
+        self.not_recorded_status = not_recorded_status
+        self.random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    def delay(self):
+        """Sleep for the configured latency, varied by the jitter."""
+        with self._random_lock:
+            jitter = self.random.uniform(-self.jitter, self.jitter)
+        delay = max(self.latency + jitter, 0)
+        if delay:
+            time.sleep(delay)
+
+    def inject_error(self):
+        """Return True if this request should fail."""
+        with self._random_lock:
+            return self.random.random() < self.error_rate
+
+    def load_fixture(self, params):
+        """Return the recorded response for *params*, or None."""
+        path = os.path.join(self.fixture_dir, fixture_name(params))
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def record_fixture(self, params):
+        """Fetch the response for *params* from record_url and save it.
+
+        Errors are passed on but not saved.
+        """
+        logger.info('Record response for params=%r', params)
+        response = requests.get(self.record_url, params=params)
+        if response.status_code != 200:
+            return None
+
+        os.makedirs(self.fixture_dir, exist_ok=True)
+        path = os.path.join(self.fixture_dir, fixture_name(params))
+        with open(path, 'wb') as f:
+            f.write(response.content)
+        return response.content
+
+    def start(self):
+        """Serve requests on a background thread."""
+        self._thread = threading.Thread(
+            target=self.serve_forever,
+            kwargs={'poll_interval': 0.05},
+            daemon=True,
+        )
+        self._thread.start()
+        logger.info('Serve API stand-in at %s', self.url)
+        return self
+
+    def stop(self):
+        """Stop serving requests, and close the server."""
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def write_fixture(fixture_dir, payload, response):
+    """Save *response* as the recorded response for *payload*."""
+    os.makedirs(fixture_dir, exist_ok=True)
+    with open(os.path.join(fixture_dir, fixture_name(payload)), 'w', encoding='utf-8') as f:
+        json.dump(response, f)
+
+
+def write_synthetic_fixtures(fixture_dir, titles, seasons=5, episodes=10):
+    """Write made up responses for a show per title in *titles*.
+
+    Each show has *seasons* seasons of *episodes* episodes, so that
+    fetching can be benchmarked without recording real shows.
+    """
+    for number, title in enumerate(titles, 1):
+        imdb_id = 'tt{:07d}'.format(number)
+        write_fixture(fixture_dir, {'s': title.lower()}, {
+            'Response': 'True',
+            'Search': [{'Title': title, 'Type': 'series', 'imdbID': imdb_id}],
+        })
+        write_fixture(fixture_dir, {'i': imdb_id}, {
+            'Response': 'True',
+            'Title': title,
+            'totalSeasons': str(seasons),
+        })
+        for season in range(1, seasons+1):
+            write_fixture(fixture_dir, {'i': imdb_id, 'season': season}, {
+                'Response': 'True',
+                'Title': title,
+                'Season': str(season),
+                'totalSeasons': str(seasons),
+                'Episodes': [
+                    {
+                        'Title': 'Episode #{}.{}'.format(season, episode),
+                        'Episode': str(episode),
+                        'imdbRating': '{:.1f}'.format(7 + (episode % 30) / 10),
+                        'imdbID': 'tt{:07d}'.format(episode),
+                    }
+                    for episode in range(1, episodes+1)
+                ],
+            })
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Serve recorded API responses for offline testing',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument('fixture_dir', help='directory of recorded responses')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', default=8080, type=int, help='port to listen on')
+    parser.add_argument('--latency', default=0, type=float, help='seconds to delay each response')
+    parser.add_argument('--jitter', default=0, type=float, help='seconds to vary each delay by')
+    parser.add_argument(
+        '--error-rate',
+        default=0,
+        type=float,
+        help='fraction of requests answered with an error',
+    )
+    parser.add_argument(
+        '--record',
+        help='fetch and save responses which have not been recorded',
+        action='store_true',
+    )
+    parser.add_argument('--seed', type=int, help='seed for delays and errors')
+    parser.add_argument(
+        '--not-recorded-status',
+        default=200,
+        type=int,
+        help='status of the answer to a request which has not been recorded',
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = StandInServer(
+        args.fixture_dir,
+        address=(args.host, args.port),
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        record_url=API_URL if args.record else None,
+        seed=args.seed,
+        not_recorded_status=args.not_recorded_status,
+    )
+    logger.info('Serve API stand-in at %s', server.url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,1478 @@
+"""This module contains the on-disk formats of the show and tracker databases.
+
+Five formats are available:
+
+    json: the original format, written by EncodeShow and read back by
+        decode_registered. Easy to read and edit, so kept for export.
+    binary: a compact format which is much quicker to load.
+    sqlite: a SQLite database with a row per show, season, episode and
+        tracked show. Only the rows of shows marked as changed (see
+        Database.mark_changed) are written, so the cost of a write does
+        not grow with the number of shows stored.
+    columnar: the binary format, but with the episodes of every season
+        stored in columns which are memory-mapped on load, see below.
+    sharded: a small manifest, with each show stored as json in its own
+        file. Like sqlite, only the shows marked as changed are written,
+        and shows are only read once they are accessed, see below.
+
+load() detects the format of a database from its first bytes, so any
+format can be loaded without being told which one it is.
+
+Every file is written alongside its destination, flushed to disk, and
+then renamed over it (see StagedWrite), so a crash part way through a
+write leaves the previous version in place rather than a truncated file.
+SQLite databases are updated in place, in a transaction.
+
+Columnar format
+---------------
+All integers are little-endian.
+
+    header          COLUMNAR_MAGIC, a one byte format version, and a u32
+                    count of sections
+    section table   u64 offset and u64 byte length of each section
+    sections        each aligned to 8 bytes:
+                        the database in the binary format, with every
+                            Season replaced by a 'c' tag and its u32 row
+                            number in the season columns, and every list
+                            of seasons by a 'C' tag, the u32 row of its
+                            first season and a u32 count
+                        season columns: u32 first episode row, u32
+                            episode count
+                        episode columns: u32 season, u32 episode, f64
+                            IMDb rating (NaN if not rated)
+                        u32 title offsets, one more than there are
+                            episodes, into the UTF-8 title bytes
+                        the UTF-8 title bytes
+
+Only IMDb ratings are stored. The episodes of a loaded season are read
+from the map as they are accessed, see MappedSeason.
+
+Offset index
+------------
+Alongside a json database, dump() writes a sidecar index (the database
+path with '.idx' appended) holding the byte offset and length of each
+show's entry. load() uses it to return a database whose shows are a
+LazyShows mapping: only the shows a command touches are decoded. The
+index records the size and modification time of the database, and is
+ignored if they no longer match, e.g., after the file has been edited by
+hand.
+
+Sharded format
+--------------
+The database path holds the manifest: SHARDS_MAGIC followed by a json
+object with the class of the database, its attributes other than the
+shows, and the shard file name of each show. The shards live in a
+directory named after the database path with '.d' appended, and each
+holds one show encoded as json. The manifest is only rewritten when
+shows are added or removed.
+
+Binary format
+-------------
+All integers are little-endian.
+
+    header          MAGIC, then a one byte format version
+    string table    u32 byte length, u32 count, then the strings encoded
+                    as UTF-8 and separated by NUL bytes
+    root value      a tagged value, see below
+
+Every string in the database (attribute names, class names, titles,
+etc.) is stored once in the string table, and referred to by its u32
+index. Each value starts with a one byte tag:
+
+    N, T, F         None, True, False
+    i               i64
+    f               f64
+    s               u32 string index
+    l               u32 count, then count values
+    d               u32 count, then count (u32 key string index, value)
+    o               u32 class name string index, then a dictionary body
+                    (count and key/value pairs) of the instance attributes
+    e               a list of Episode instances: u32 count, then count
+                    fixed size (u16 episode, u16 season, u32 title string
+                    index, f64 IMDb rating, NaN if not rated) records.
+                    Decoded into an EpisodeArray, so no Episode is built
+                    until it is accessed.
+    r               the shows of a database: u32 count, then for each
+                    show a u32 key string index, a u32 byte length, and
+                    the show as a value of that length
+"""
+from array import array
+import collections.abc
+from contextlib import closing, contextmanager
+from functools import partial
+import json
+import logging
+import math
+import mmap
+import os
+import shutil
+import sqlite3
+import struct
+import tempfile
+import urllib.parse
+
+from .utils import (
+    DATABASE_EXTENSIONS,
+    decode_registered,
+    EncodeShow,
+    registry,
+)
+
+logger = logging.getLogger(__name__)
+
+FORMATS = tuple(DATABASE_EXTENSIONS)
+DEFAULT_FORMAT = 'json'
+
+MAGIC = b'TVSTDB'
+VERSION = 1
+
+_HEADER = struct.Struct('<6sB')
+_U32 = struct.Struct('<I')
+_I64 = struct.Struct('<q')
+_F64 = struct.Struct('<d')
+_STRING_TABLE = struct.Struct('<II')
+_RECORD = struct.Struct('<II')
+_EPISODE = struct.Struct('<HHId')
+
+_MAX_U16 = 0xffff
+
+COLUMNAR_MAGIC = b'TVSTCOL'
+_COLUMNAR_HEADER = struct.Struct('<7sBI')
+_SECTION = struct.Struct('<QQ')
+
+SQLITE_MAGIC = b'SQLite format 3\x00'
+
+SHARDS_MAGIC = b'TVSTSHARDS\n'
+
+# Formats which only write the shows marked as changed, see
+# Database.mark_changed
+INCREMENTAL_FORMATS = ('sqlite', 'sharded')
+
+
+def format_from_path(path):
+    """Return the storage format implied by the extension of *path*.
+
+    Usage:
+    >>> format_from_path('example/.showdb.bin')
+    'binary'
+    """
+    for storage_format, extension in DATABASE_EXTENSIONS.items():
+        if path.endswith(extension):
+            return storage_format
+    return DEFAULT_FORMAT
+
+
+def path_for_format(path, storage_format):
+    """Return *path* with the extension of *storage_format*.
+
+    Usage:
+    >>> path_for_format('example/.showdb.json', 'binary')
+    'example/.showdb.bin'
+    """
+    for extension in DATABASE_EXTENSIONS.values():
+        if path.endswith(extension):
+            path = path[:-len(extension)]
+            break
+    return path + DATABASE_EXTENSIONS[storage_format]
+
+
+def detect_format(path):
+    """Return the storage format of the database at *path*."""
+    with open(path, 'rb') as f:
+        start = f.read(len(SQLITE_MAGIC))
+
+    if start.startswith(MAGIC):
+        return 'binary'
+    elif start.startswith(COLUMNAR_MAGIC):
+        return 'columnar'
+    elif start == SQLITE_MAGIC:
+        return 'sqlite'
+    elif start.startswith(SHARDS_MAGIC):
+        return 'sharded'
+    return 'json'
+
+
+def index_path(path):
+    """Return the path of the offset index of the database at *path*."""
+    return path + '.idx'
+
+
+def shard_dir(path):
+    """Return the directory holding the shards of the sharded database at *path*."""
+    return path + '.d'
+
+
+def remove_database(path, staged=None):
+    """Remove the database at *path*, along with its offset index or shards.
+
+    Args:
+        staged: StagedWrite to remove the files with once it is
+            published. By default they are removed straight away.
+    """
+    if staged is None:
+        staged = StagedWrite()
+        remove_database(path, staged)
+        staged.publish()
+        return
+
+    staged.remove(path)
+    staged.remove(index_path(path))
+    if os.path.isdir(shard_dir(path)):
+        staged.remove(shard_dir(path))
+
+
+class StagedWrite:
+    """Files written alongside their destinations, to be moved into place together.
+
+    Each file is written to a temporary file in the directory of its
+    destination, and flushed to disk. publish() then renames every file
+    over its destination and flushes each directory once, so the files of
+    several databases can be committed with a single flush per directory.
+    Until then, readers still see the previous files. SQLite databases are
+    written in a transaction instead, which publish() commits before any
+    file is moved into place.
+
+    Usage:
+    >>> staged = StagedWrite()
+    >>> with staged.open('.tracker.json') as f:
+    ...     f.write(data)
+    >>> staged.publish()
+    """
+    def __init__(self):
+        self._files = []
+        self._removals = []
+        self._callbacks = []
+        self._connections = []
+
+    @contextmanager
+    def open(self, path):
+        """Return a binary file to write the new contents of *path* to."""
+        directory = os.path.dirname(path) or '.'
+        fd, temp_path = tempfile.mkstemp(
+            dir=directory, prefix=os.path.basename(path) + '.', suffix='.tmp'
+        )
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                yield f
+                f.flush()
+                os.fsync(f.fileno())
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        self._files.append((temp_path, path))
+
+    @contextmanager
+    def create(self, path):
+        """Return the name of an empty file to build the new contents of *path* in.
+
+        For files which are not written as a stream, e.g., SQLite
+        databases. The file must be flushed to disk by the caller.
+        """
+        directory = os.path.dirname(path) or '.'
+        fd, temp_path = tempfile.mkstemp(
+            dir=directory, prefix=os.path.basename(path) + '.', suffix='.tmp'
+        )
+        os.close(fd)
+        try:
+            yield temp_path
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        self._files.append((temp_path, path))
+
+    def remove(self, path):
+        """Remove the file or directory *path*, if it exists, once the files are published."""
+        self._removals.append(path)
+
+    def on_publish(self, callback):
+        """Call *callback* once the files are published."""
+        self._callbacks.append(callback)
+
+    def transaction(self, conn):
+        """Commit the open transaction of the sqlite3 connection *conn* on publish.
+
+        The transaction is rolled back if the files are discarded instead,
+        and the connection is closed either way.
+        """
+        self._connections.append(conn)
+
+    def publish(self):
+        """Commit every transaction, move every file into place, and make the renames durable."""
+        connections, self._connections = self._connections, []
+        try:
+            for conn in connections:
+                conn.commit()
+        except BaseException:
+            for conn in connections:
+                conn.close()
+            self.discard()
+            raise
+        for conn in connections:
+            conn.close()
+
+        directories = set()
+        for temp_path, path in self._files:
+            os.replace(temp_path, path)
+            directories.add(os.path.dirname(path) or '.')
+        for path in self._removals:
+            try:
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+            except FileNotFoundError:
+                continue
+            directories.add(os.path.dirname(path) or '.')
+        for directory in directories:
+            _fsync_directory(directory)
+
+        callbacks = self._callbacks
+        self._files, self._removals, self._callbacks = [], [], []
+        for callback in callbacks:
+            callback()
+
+    def discard(self):
+        """Remove the files which have not been published, and roll back every transaction."""
+        for conn in self._connections:
+            # Closing a connection rolls back its open transaction
+            conn.close()
+        for temp_path, _ in self._files:
+            try:
+                os.remove(temp_path)
+            except FileNotFoundError:
+                pass
+        self._files, self._removals, self._callbacks, self._connections = [], [], [], []
+
+
+def _fsync_directory(directory):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        # e.g., directories cannot be opened on Windows
+        logger.debug('Could not open directory=%r to flush it', directory)
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def dump(database, path, storage_format=DEFAULT_FORMAT, indent=None, staged=None):
+    """Write *database* to *path* in *storage_format*.
+
+    An offset index is written for the json format, unless *indent* is
+    given.
+
+    Args:
+        staged: StagedWrite to add the files to, which the caller then
+            publishes. By default the files are published straight away.
+    """
+    if staged is None:
+        staged = StagedWrite()
+        try:
+            dump(database, path, storage_format, indent, staged)
+        except BaseException:
+            staged.discard()
+            raise
+        staged.publish()
+        return
+
+    index = None
+    if storage_format == 'binary':
+        with staged.open(path) as f:
+            f.write(dumps_binary(database))
+    elif storage_format == 'json' and indent is None:
+        index = dump_json_indexed(database, path, staged)
+    elif storage_format == 'json':
+        with staged.open(path) as f:
+            f.write(json.dumps(
+                database, cls=EncodeShow, indent=indent, sort_keys=True
+            ).encode('utf-8'))
+    elif storage_format == 'sqlite':
+        dump_sqlite(database, path, staged)
+    elif storage_format == 'columnar':
+        dump_columnar(database, path, staged)
+    elif storage_format == 'sharded':
+        dump_sharded(database, path, staged)
+    else:
+        raise ValueError('Unknown storage format={!r}'.format(storage_format))
+
+    if index is None:
+        staged.remove(index_path(path))
+
+
+def load(path):
+    """Read a database from *path*, in whichever format it was written."""
+    storage_format = detect_format(path)
+    if storage_format == 'sqlite':
+        return load_sqlite(path)
+    elif storage_format == 'columnar':
+        return load_columnar(path)
+    elif storage_format == 'sharded':
+        return load_sharded(path)
+    elif storage_format == 'json':
+        database = load_json_indexed(path)
+        if database is not None:
+            return database
+
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    if data.startswith(MAGIC):
+        return loads_binary(data)
+    return json.loads(data.decode('utf-8'), object_hook=partial(decode_registered, titles={}))
+
+
+class _LazyMapping(collections.abc.MutableMapping):
+    """Shows which are read from disk and decoded on first access.
+
+    Subclasses implement _read(key), and keep the keys of every show in
+    the database, decoded or not, in _keys.
+
+    *on_decode*, if set, is called with each show as it is decoded.
+    """
+    def __init__(self, keys):
+        self._keys = keys
+        self._loaded = {}
+        self.on_decode = None
+
+    @property
+    def decoded(self):
+        """Number of shows which have been decoded."""
+        return len(self._loaded)
+
+    def loaded(self):
+        """Return the shows which have been decoded."""
+        return list(self._loaded.values())
+
+    def _read(self, key):
+        raise NotImplementedError
+
+    def __getitem__(self, key):
+        try:
+            return self._loaded[key]
+        except KeyError:
+            show = self._loaded[key] = self._read(key)
+
+        if self.on_decode is not None:
+            self.on_decode(show)
+        return show
+
+    def __delitem__(self, key):
+        del self._keys[key]
+        self._loaded.pop(key, None)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class LazyShows(_LazyMapping):
+    """The shows of a json database, decoded on first access.
+
+    Args:
+        path: Path to the json database.
+        index: Dictionary of ltitle to the (offset, length) of the show's
+            entry in the database.
+    """
+    def __init__(self, path, index):
+        super().__init__(dict(index))
+        self.path = path
+
+    def location(self, key):
+        """Return the (offset, length) of an undecoded show, or None."""
+        if key in self._loaded:
+            return None
+        return self._keys[key]
+
+    def reindex(self, index):
+        """Point the undecoded shows at their entries in a rewritten database."""
+        for key in self._keys:
+            if key not in self._loaded:
+                self._keys[key] = index[key]
+
+    def _read(self, key):
+        offset, length = self._keys[key]
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            entry = f.read(length)
+        return json.loads(entry.decode('utf-8'), object_hook=decode_registered)
+
+    def __setitem__(self, key, show):
+        self._loaded[key] = show
+        if key not in self._keys:
+            self._keys[key] = None
+
+    def __repr__(self):
+        return '{}({!r}, shows={!r}, decoded={!r})'.format(
+            self.__class__.__name__,
+            self.path,
+            len(self),
+            self.decoded,
+        )
+
+
+def _short_codes(database):
+    # Short code to ltitle of the shows of a tracker, which are stored with
+    # the database, so that finding a show by short code decodes no show
+    if type(database).__name__ == 'TrackerDatabase':
+        return dict(database._short_codes())
+    return None
+
+
+def dump_json_indexed(database, path, staged):
+    """Write *database* as json to *path*, along with its offset index.
+
+    The output is the same as json.dump(..., sort_keys=True). Shows of a
+    LazyShows mapping which have not been decoded are copied from their
+    database without being decoded. Both files are added to *staged*.
+
+    Returns:
+        Dictionary of ltitle to the (offset, length) of each show's entry.
+    """
+    encoder = EncodeShow(sort_keys=True)
+    attributes = database.serializable_attributes()
+    shows = attributes['_shows']
+
+    source = None
+    if isinstance(shows, LazyShows) and shows.decoded < len(shows):
+        with open(shows.path, 'rb') as f:
+            source = f.read()
+
+    index = {}
+    with staged.open(path) as f:
+        position = 0
+
+        def write(text):
+            nonlocal position
+            data = text.encode('ascii') if isinstance(text, str) else text
+            f.write(data)
+            position += len(data)
+
+        write('{{{}: {{'.format(json.dumps('__{}__'.format(type(database).__name__))))
+        for i, name in enumerate(sorted(attributes)):
+            write('{}{}: '.format(', ' if i else '', json.dumps(name)))
+            if name != '_shows':
+                write(encoder.encode(attributes[name]))
+                continue
+
+            write('{')
+            for j, ltitle in enumerate(sorted(shows)):
+                write('{}{}: '.format(', ' if j else '', json.dumps(ltitle)))
+                location = shows.location(ltitle) if source is not None else None
+                if location is None:
+                    entry = encoder.encode(shows[ltitle])
+                else:
+                    offset, length = location
+                    entry = source[offset:offset+length]
+                index[ltitle] = (position, len(entry))
+                write(entry)
+            write('}')
+        write('}}')
+        f.flush()
+        # Renaming the file keeps its modification time
+        stat = os.fstat(f.fileno())
+
+    metadata = {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'class': type(database).__name__,
+        'attributes': {k: v for k, v in attributes.items() if k != '_shows'},
+        'shows': index,
+    }
+    short_codes = _short_codes(database)
+    if short_codes is not None:
+        metadata['short_codes'] = short_codes
+    with staged.open(index_path(path)) as f:
+        f.write(json.dumps(metadata, cls=EncodeShow).encode('utf-8'))
+
+    if isinstance(shows, LazyShows) and shows.path == path:
+        staged.on_publish(partial(shows.reindex, index))
+
+    return index
+
+
+def load_json_indexed(path):
+    """Return the json database at *path* with lazily decoded shows.
+
+    Returns:
+        The database, or None if it has no up to date offset index.
+    """
+    try:
+        with open(index_path(path), 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+    stat = os.stat(path)
+    if (stat.st_size, stat.st_mtime_ns) != (metadata['size'], metadata['mtime_ns']):
+        return None
+
+    database = registry[metadata['class']](
+        _shows=LazyShows(path, metadata['shows']),
+        **metadata['attributes']
+    )
+    if 'short_codes' in metadata:
+        database._short_code_index = metadata['short_codes']
+    return database
+
+
+class _BinaryEncoder:
+    def __init__(self, season_sink=None):
+        self.strings = {}
+        self.episode_class = registry['Episode']
+        self.season_class = registry['Season']
+        self.season_sink = season_sink
+
+    def string(self, s):
+        index = self.strings.get(s)
+        if index is None:
+            if '\0' in s:
+                raise ValueError('Cannot store string containing a NUL byte: {!r}'.format(s))
+            index = self.strings[s] = len(self.strings)
+        return index
+
+    def encode(self, value, out):
+        if value is None:
+            out += b'N'
+        elif value is True:
+            out += b'T'
+        elif value is False:
+            out += b'F'
+        elif isinstance(value, int):
+            out += b'i'
+            out += _I64.pack(value)
+        elif isinstance(value, float):
+            out += b'f'
+            out += _F64.pack(value)
+        elif isinstance(value, str):
+            out += b's'
+            out += _U32.pack(self.string(value))
+        elif isinstance(value, (list, tuple, EpisodeArray)):
+            if value and self._packable_episodes(value):
+                self._encode_episodes(value, out)
+            elif (
+                value and self.season_sink is not None
+                and all(isinstance(v, self.season_class) for v in value)
+            ):
+                # Seasons are given consecutive row numbers, so a list of
+                # them is stored as a range of rows.
+                rows = [self.season_sink(season) for season in value]
+                out += b'C'
+                out += _RECORD.pack(rows[0], len(rows))
+            else:
+                out += b'l'
+                out += _U32.pack(len(value))
+                for item in value:
+                    self.encode(item, out)
+        elif isinstance(value, collections.abc.Mapping):
+            out += b'd'
+            self._encode_items(value, out)
+        elif self.season_sink is not None and isinstance(value, self.season_class):
+            out += b'c'
+            out += _U32.pack(self.season_sink(value))
+        elif type(value).__name__ in registry:
+            out += b'o'
+            out += _U32.pack(self.string(value.serialized_name()))
+            self._encode_items(value.serializable_attributes(), out)
+        else:
+            raise TypeError('Cannot store value of type {}'.format(type(value).__name__))
+
+    def _encode_items(self, mapping, out):
+        out += _U32.pack(len(mapping))
+        for key, value in mapping.items():
+            out += _U32.pack(self.string(key))
+            if key == '_shows' and isinstance(value, collections.abc.Mapping):
+                self._encode_records(value, out)
+            else:
+                self.encode(value, out)
+
+    def _encode_records(self, shows, out):
+        out += b'r'
+        out += _U32.pack(len(shows))
+        for key, show in shows.items():
+            record = bytearray()
+            self.encode(show, record)
+            out += _RECORD.pack(self.string(key), len(record))
+            out += record
+
+    def _packable_episodes(self, episodes):
+        """Return True if every item of *episodes* fits an 'e' record."""
+        if isinstance(episodes, EpisodeArray):
+            return max(episodes.seasons) <= _MAX_U16 and max(episodes.episodes) <= _MAX_U16
+
+        for episode in episodes:
+            if type(episode) is not self.episode_class:
+                return False
+            number, season, title = episode.episode, episode.season, episode.title
+            if not (
+                type(number) is int and 0 <= number <= _MAX_U16
+                and type(season) is int and 0 <= season <= _MAX_U16
+                and isinstance(title, str)
+            ):
+                return False
+            rating = episode.imdb_rating
+            if not (rating is None or type(rating) is float):
+                return False
+        return True
+
+    def _encode_episodes(self, episodes, out):
+        out += b'e'
+        out += _U32.pack(len(episodes))
+        pack = _EPISODE.pack
+        string = self.string
+        if isinstance(episodes, EpisodeArray):
+            for record in zip(episodes.episodes, episodes.seasons, episodes.titles, episodes.ratings):
+                out += pack(record[0], record[1], string(record[2]), record[3])
+            return
+
+        for e in episodes:
+            rating = e.imdb_rating
+            out += pack(e.episode, e.season, string(e.title), math.nan if rating is None else rating)
+
+
+def dumps_binary(database, season_sink=None):
+    """Return *database* encoded in the binary format.
+
+    If *season_sink* is given, each Season is passed to it instead of
+    being encoded, and stored as the row number it returns.
+    """
+    encoder = _BinaryEncoder(season_sink)
+    body = bytearray()
+    encoder.encode(database, body)
+
+    strings = '\0'.join(encoder.strings).encode('utf-8')
+    out = bytearray(_HEADER.pack(MAGIC, VERSION))
+    out += _STRING_TABLE.pack(len(strings), len(encoder.strings))
+    out += strings
+    out += body
+    return bytes(out)
+
+
+class _BinaryDecoder:
+    def __init__(self, data, strings, season_source=None):
+        self.data = data
+        self.strings = strings
+        self.episode_class = registry['Episode']
+        self.season_source = season_source
+
+    def decode(self, pos):
+        """Return the value starting at *pos*, and the position after it."""
+        data = self.data
+        tag = data[pos]
+        pos += 1
+
+        if tag == 0x4e:  # N
+            return None, pos
+        elif tag == 0x54:  # T
+            return True, pos
+        elif tag == 0x46:  # F
+            return False, pos
+        elif tag == 0x69:  # i
+            return _I64.unpack_from(data, pos)[0], pos + 8
+        elif tag == 0x66:  # f
+            return _F64.unpack_from(data, pos)[0], pos + 8
+        elif tag == 0x73:  # s
+            return self.strings[_U32.unpack_from(data, pos)[0]], pos + 4
+        elif tag == 0x6c:  # l
+            count = _U32.unpack_from(data, pos)[0]
+            pos += 4
+            items = []
+            for _ in range(count):
+                item, pos = self.decode(pos)
+                items.append(item)
+            return items, pos
+        elif tag == 0x64:  # d
+            return self._decode_items(pos)
+        elif tag == 0x6f:  # o
+            name = self.strings[_U32.unpack_from(data, pos)[0]]
+            kwargs, pos = self._decode_items(pos + 4)
+            return registry[name](**kwargs), pos
+        elif tag == 0x65:  # e
+            return self._decode_episodes(pos)
+        elif tag == 0x72:  # r
+            return self._decode_records(pos)
+        elif tag == 0x63:  # c
+            return self.season_source(_U32.unpack_from(data, pos)[0]), pos + 4
+        elif tag == 0x43:  # C
+            first, count = _RECORD.unpack_from(data, pos)
+            return list(map(self.season_source, range(first, first+count))), pos + 8
+        raise ValueError('Unknown tag={!r} at position={}'.format(chr(tag), pos - 1))
+
+    def _decode_items(self, pos):
+        count = _U32.unpack_from(self.data, pos)[0]
+        pos += 4
+        strings = self.strings
+        items = {}
+        for _ in range(count):
+            key = strings[_U32.unpack_from(self.data, pos)[0]]
+            items[key], pos = self.decode(pos + 4)
+        return items, pos
+
+    def _decode_episodes(self, pos):
+        count = _U32.unpack_from(self.data, pos)[0]
+        pos += 4
+        end = pos + count * _EPISODE.size
+        if not count:
+            return EpisodeArray(), end
+
+        episodes, seasons, titles, ratings = zip(*_EPISODE.iter_unpack(self.data[pos:end]))
+        strings = self.strings
+        return EpisodeArray(seasons, episodes, ratings, [strings[t] for t in titles]), end
+
+    def _decode_records(self, pos):
+        count = _U32.unpack_from(self.data, pos)[0]
+        pos += 4
+        shows = {}
+        for _ in range(count):
+            key, length = _RECORD.unpack_from(self.data, pos)
+            pos += _RECORD.size
+            shows[self.strings[key]], _ = self.decode(pos)
+            pos += length
+        return shows, pos
+
+
+def loads_binary(data, season_source=None):
+    """Return the database encoded in *data* by dumps_binary.
+
+    A Season stored as a row number by dumps_binary is replaced with the
+    result of passing that row number to *season_source*.
+    """
+    data = memoryview(data)
+    magic, version = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('Not a binary database')
+    if version != VERSION:
+        raise ValueError('Unsupported binary database version={}'.format(version))
+
+    pos = _HEADER.size
+    length, count = _STRING_TABLE.unpack_from(data, pos)
+    pos += _STRING_TABLE.size
+    strings = bytes(data[pos:pos+length]).decode('utf-8').split('\0') if count else []
+    pos += length
+
+    database, _ = _BinaryDecoder(data, strings, season_source).decode(pos)
+    return database
+
+
+class EpisodeTable:
+    """The episode columns of a columnar database, read from a memory map.
+
+    Every column is a memoryview of the map, so opening a database costs
+    nothing per episode, and the pages are shared with every other
+    process which has the same database open.
+    """
+    def __init__(self, seasons, episodes, ratings, title_offsets, titles):
+        self.seasons = seasons
+        self.episodes = episodes
+        self.ratings = ratings
+        self.title_offsets = title_offsets
+        self.titles = titles
+        self.episode_class = registry['Episode']
+
+    def title(self, row):
+        return str(self.titles[self.title_offsets[row]:self.title_offsets[row+1]], 'utf-8')
+
+    def episode(self, row):
+        """Return the Episode stored in *row*."""
+        rating = self.ratings[row]
+        return self.episode_class(
+            self.episodes[row],
+            self.seasons[row],
+            self.title(row),
+            {'imdb': None if rating != rating else rating},
+        )
+
+
+def _ratings_from_column(column):
+    """Return the ratings of a rating column, with None in place of NaN."""
+    ratings = column.tolist()
+    # The sum is NaN only if a rating is, which is quicker to check than
+    # each rating in turn.
+    total = sum(ratings)
+    if total == total:
+        return ratings
+    return [None if r != r else r for r in ratings]
+
+
+class EpisodeView(collections.abc.Sequence):
+    """The episodes of one season of an EpisodeTable, as a sequence."""
+    def __init__(self, table, first, count):
+        self.table = table
+        self.first = first
+        self.count = count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError('episode index out of range')
+        return self.table.episode(self.first + index)
+
+    def __len__(self):
+        return self.count
+
+    def imdb_ratings(self):
+        """Return the IMDb rating of each episode, None where not rated."""
+        return _ratings_from_column(self.table.ratings[self.first:self.first+self.count])
+
+    def episode_numbers(self):
+        """Return the (season, episode) numbers of each episode."""
+        rows = slice(self.first, self.first + self.count)
+        return list(zip(self.table.seasons[rows], self.table.episodes[rows]))
+
+
+class EpisodeArray(collections.abc.MutableSequence):
+    """The episodes of a season, held in parallel columns.
+
+    Holds the season and episode numbers and IMDb ratings in arrays, and
+    the titles in a list, rather than an Episode instance per episode. An
+    Episode is built each time one is accessed, so changes to it are not
+    kept unless it is stored back, e.g., episodes[0] = episode.
+
+    Args:
+        seasons: Season number of each episode.
+        episodes: Episode number of each episode.
+        ratings: IMDb rating of each episode, NaN if not rated.
+        titles: Title of each episode.
+    """
+    __slots__ = ('seasons', 'episodes', 'ratings', 'titles')
+
+    def __init__(self, seasons=(), episodes=(), ratings=(), titles=()):
+        self.seasons = array('I', seasons)
+        self.episodes = array('I', episodes)
+        self.ratings = array('d', ratings)
+        self.titles = list(titles)
+
+    @classmethod
+    def from_episodes(cls, episodes):
+        """Return an EpisodeArray holding the episodes of *episodes*."""
+        columns = cls()
+        columns.extend(episodes)
+        return columns
+
+    def _episode(self, index):
+        rating = self.ratings[index]
+        return registry['Episode'](
+            self.episodes[index],
+            self.seasons[index],
+            self.titles[index],
+            {'imdb': None if rating != rating else rating},
+        )
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._episode(i) for i in range(*index.indices(len(self.titles)))]
+        return self._episode(index)
+
+    def __setitem__(self, index, episode):
+        rating = episode.imdb_rating
+        self.seasons[index] = episode.season
+        self.episodes[index] = episode.episode
+        self.ratings[index] = math.nan if rating is None else rating
+        self.titles[index] = episode.title
+
+    def __delitem__(self, index):
+        for column in (self.seasons, self.episodes, self.ratings, self.titles):
+            del column[index]
+
+    def insert(self, index, episode):
+        rating = episode.imdb_rating
+        self.seasons.insert(index, episode.season)
+        self.episodes.insert(index, episode.episode)
+        self.ratings.insert(index, math.nan if rating is None else rating)
+        self.titles.insert(index, episode.title)
+
+    def append(self, episode):
+        self.insert(len(self.titles), episode)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def imdb_ratings(self):
+        """Return the IMDb rating of each episode, None where not rated."""
+        return _ratings_from_column(self.ratings)
+
+    def episode_numbers(self):
+        """Return the (season, episode) numbers of each episode."""
+        return list(zip(self.seasons, self.episodes))
+
+    def __repr__(self):
+        return '{}({!r})'.format(self.__class__.__name__, list(self))
+
+
+class _Columns:
+    """Episode columns being collected for a columnar database."""
+    def __init__(self):
+        self.first = array('I')
+        self.count = array('I')
+        self.seasons = array('I')
+        self.episodes = array('I')
+        self.ratings = array('d')
+        self.title_offsets = array('I', [0])
+        self.titles = bytearray()
+
+    def add_season(self, season):
+        """Store the episodes of *season*, and return its row number."""
+        row = len(self.first)
+        self.first.append(len(self.ratings))
+        episodes = season._episodes
+
+        if isinstance(episodes, EpisodeView):
+            # Copy the columns of a mapped season without building Episodes
+            table, start, end = episodes.table, episodes.first, episodes.first + episodes.count
+            self.seasons.frombytes(table.seasons[start:end].cast('B'))
+            self.episodes.frombytes(table.episodes[start:end].cast('B'))
+            self.ratings.frombytes(table.ratings[start:end].cast('B'))
+            base = table.title_offsets[start]
+            shift = len(self.titles) - base
+            self.title_offsets.extend(o + shift for o in table.title_offsets[start+1:end+1])
+            self.titles += table.titles[base:table.title_offsets[end]]
+        elif isinstance(episodes, EpisodeArray):
+            self.seasons.extend(episodes.seasons)
+            self.episodes.extend(episodes.episodes)
+            self.ratings.extend(episodes.ratings)
+            for title in episodes.titles:
+                self.titles += title.encode('utf-8')
+                self.title_offsets.append(len(self.titles))
+        else:
+            for e in episodes:
+                rating = e.imdb_rating
+                self.seasons.append(e.season)
+                self.episodes.append(e.episode)
+                self.ratings.append(math.nan if rating is None else rating)
+                self.titles += e.title.encode('utf-8')
+                self.title_offsets.append(len(self.titles))
+
+        self.count.append(len(self.ratings) - self.first[row])
+        return row
+
+    def sections(self):
+        return (
+            self.first, self.count,
+            self.seasons, self.episodes, self.ratings,
+            self.title_offsets, self.titles,
+        )
+
+
+def dump_columnar(database, path, staged):
+    """Write *database* to *path* in the columnar format.
+
+    The file is added to *staged*, so it is moved into place rather than
+    overwritten, and a memory map of the previous file stays valid.
+    """
+    columns = _Columns()
+    blob = dumps_binary(database, season_sink=columns.add_season)
+    sections = (blob,) + columns.sections()
+
+    header_size = _COLUMNAR_HEADER.size + _SECTION.size * len(sections)
+    table = bytearray()
+    body = bytearray()
+    position = header_size
+    for section in sections:
+        data = memoryview(section).cast('B')
+        # Align every section to 8 bytes, so each column can be cast in
+        # place to an array of its type.
+        padding = -position % 8
+        body += b'\0' * padding
+        position += padding
+        table += _SECTION.pack(position, len(data))
+        body += data
+        position += len(data)
+
+    with staged.open(path) as f:
+        f.write(_COLUMNAR_HEADER.pack(COLUMNAR_MAGIC, VERSION, len(sections)))
+        f.write(table)
+        f.write(body)
+
+
+def load_columnar(path):
+    """Return the database stored in the columnar database at *path*.
+
+    The file is memory-mapped, and seasons are MappedSeason views of it.
+    """
+    with open(path, 'rb') as f:
+        data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    magic, version, count = _COLUMNAR_HEADER.unpack_from(data)
+    if version != VERSION:
+        raise ValueError('Unsupported columnar database version={}'.format(version))
+    sections = []
+    for n in range(count):
+        offset, length = _SECTION.unpack_from(data, _COLUMNAR_HEADER.size + n * _SECTION.size)
+        sections.append(data[offset:offset+length])
+
+    blob, first, counts, seasons, episodes, ratings, title_offsets, titles = sections
+    first, counts = first.cast('I'), counts.cast('I')
+    table = EpisodeTable(
+        seasons.cast('I'), episodes.cast('I'), ratings.cast('d'), title_offsets.cast('I'), titles,
+    )
+
+    MappedSeason = registry['MappedSeason']
+    return loads_binary(
+        blob,
+        season_source=partial(MappedSeason, table, first.tolist(), counts.tolist()),
+    )
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS shows (
+    ltitle TEXT PRIMARY KEY,
+    title TEXT,
+    request_title TEXT,
+    imdb_id TEXT,
+    short_code TEXT
+);
+CREATE INDEX IF NOT EXISTS shows_short_code ON shows (short_code);
+CREATE TABLE IF NOT EXISTS seasons (
+    ltitle TEXT,
+    season INTEGER,
+    episodes_this_season INTEGER,
+    PRIMARY KEY (ltitle, season)
+);
+CREATE TABLE IF NOT EXISTS episodes (
+    ltitle TEXT,
+    season INTEGER,
+    position INTEGER,
+    episode INTEGER,
+    episode_season INTEGER,
+    title TEXT,
+    imdb_rating REAL,
+    PRIMARY KEY (ltitle, season, position)
+);
+CREATE TABLE IF NOT EXISTS tracked_shows (
+    ltitle TEXT PRIMARY KEY,
+    title TEXT,
+    request_title TEXT,
+    short_code TEXT,
+    notes TEXT,
+    next_episode TEXT,
+    next_season INTEGER,
+    next_number INTEGER,
+    prev_season INTEGER,
+    prev_number INTEGER
+);
+CREATE INDEX IF NOT EXISTS tracked_shows_short_code ON tracked_shows (short_code);
+"""
+
+# Tables holding the rows of each show, for each kind of database
+_SHOW_TABLES = ('shows', 'seasons', 'episodes')
+_TRACKER_TABLES = ('tracked_shows',)
+
+
+def _coords_columns(coords):
+    return (None, None) if coords is None else coords
+
+
+def _coords_from_columns(season, number):
+    return None if season is None else (season, number)
+
+
+def _write_show(conn, ltitle, show):
+    conn.execute(
+        'INSERT INTO shows VALUES (?, ?, ?, ?, ?)',
+        (ltitle, show.title, show.request_title, show.imdb_id, show.short_code),
+    )
+    conn.executemany(
+        'INSERT INTO seasons VALUES (?, ?, ?)',
+        (
+            (ltitle, number, season.episodes_this_season)
+            for number, season in enumerate(show._seasons, 1)
+        ),
+    )
+    conn.executemany(
+        'INSERT INTO episodes VALUES (?, ?, ?, ?, ?, ?, ?)',
+        (
+            (ltitle, number, position, e.episode, e.season, e.title, e.imdb_rating)
+            for number, season in enumerate(show._seasons, 1)
+            for position, e in enumerate(season._episodes)
+        ),
+    )
+
+
+def _write_tracked_show(conn, ltitle, show):
+    # Columns are named, as tables created by earlier versions also have
+    # the title and rating of each episode.
+    conn.execute(
+        'INSERT INTO tracked_shows (ltitle, title, request_title, short_code, notes, '
+        'next_episode, next_season, next_number, prev_season, prev_number) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        (
+            ltitle,
+            show.title,
+            show.request_title,
+            show.short_code,
+            show.notes,
+            show._next_episode,
+            *_coords_columns(show._next_coords),
+            *_coords_columns(show._prev_coords),
+        ),
+    )
+
+
+def _write_sqlite(conn, database, changed):
+    # Rows of the shows in *changed* are replaced, or deleted for shows
+    # no longer in the database, in the transaction open on *conn*.
+    tracker = type(database).__name__ == 'TrackerDatabase'
+    tables = _TRACKER_TABLES if tracker else _SHOW_TABLES
+    write_show = _write_tracked_show if tracker else _write_show
+
+    # Committed straight away, creating the tables changes no rows
+    conn.executescript(_SCHEMA)
+    conn.executemany('INSERT OR REPLACE INTO meta VALUES (?, ?)', [
+        ('class', type(database).__name__),
+        ('database_dir', database.database_dir),
+        ('path_to_db', database.path_to_db),
+    ])
+    for ltitle in changed:
+        for table in tables:
+            conn.execute('DELETE FROM {} WHERE ltitle = ?'.format(table), (ltitle,))
+        if ltitle in database._shows:
+            write_show(conn, ltitle, database._shows[ltitle])
+
+
+def dump_sqlite(database, path, staged):
+    """Write *database* to the SQLite database at *path*.
+
+    Only the shows marked as changed are written, in a transaction which
+    is committed when *staged* is published. If the database was not
+    loaded from *path*, every show is written to a new file instead,
+    which is moved into place with the other files.
+    """
+    if database._changed is None or database._synced_path != path:
+        with staged.create(path) as temp_path:
+            with closing(sqlite3.connect(temp_path)) as conn:
+                with conn:
+                    _write_sqlite(conn, database, database._shows)
+    else:
+        conn = sqlite3.connect(path)
+        try:
+            _write_sqlite(conn, database, database._changed)
+        except BaseException:
+            conn.close()
+            raise
+        staged.transaction(conn)
+
+    def written():
+        database._changed = set()
+        database._synced_path = path
+
+    staged.on_publish(written)
+
+
+def _load_shows(conn):
+    Show, Season = registry['Show'], registry['Season']
+    Episode = registry['Episode']
+
+    # One copy of each distinct episode title, as decode_registered keeps
+    titles = {}
+    episodes = {}
+    for ltitle, number, episode, season, title, rating in conn.execute(
+        'SELECT ltitle, season, episode, episode_season, title, imdb_rating '
+        'FROM episodes ORDER BY ltitle, season, position'
+    ):
+        episodes.setdefault((ltitle, number), []).append(
+            Episode(episode, season, titles.setdefault(title, title), {'imdb': rating})
+        )
+
+    seasons = {}
+    for ltitle, number in conn.execute(
+        'SELECT ltitle, season FROM seasons ORDER BY ltitle, season'
+    ):
+        seasons.setdefault(ltitle, []).append(
+            Season(_episodes=episodes.get((ltitle, number), []))
+        )
+
+    shows = {}
+    for ltitle, title, imdb_id, short_code in conn.execute(
+        'SELECT ltitle, title, imdb_id, short_code FROM shows ORDER BY ltitle'
+    ):
+        shows[ltitle] = Show(
+            title=title,
+            imdb_id=imdb_id,
+            short_code=short_code,
+            _seasons=seasons.get(ltitle, []),
+        )
+    return shows
+
+
+def _load_tracked_shows(conn):
+    TrackedShow = registry['TrackedShow']
+
+    shows = {}
+    for row in conn.execute(
+        'SELECT ltitle, title, short_code, notes, next_episode, '
+        'next_season, next_number, prev_season, prev_number '
+        'FROM tracked_shows ORDER BY ltitle'
+    ):
+        ltitle, title, short_code, notes, next_episode = row[:5]
+        shows[ltitle] = TrackedShow(
+            title=title,
+            _next_episode=next_episode,
+            notes=notes,
+            short_code=short_code,
+            _next_coords=_coords_from_columns(*row[5:7]),
+            _prev_coords=_coords_from_columns(*row[7:9]),
+        )
+    return shows
+
+
+def load_sqlite(path):
+    """Return the database stored in the SQLite database at *path*."""
+    with closing(sqlite3.connect(path)) as conn:
+        meta = dict(conn.execute('SELECT key, value FROM meta'))
+        if meta['class'] == 'TrackerDatabase':
+            shows = _load_tracked_shows(conn)
+        else:
+            shows = _load_shows(conn)
+
+    database = registry[meta['class']](
+        database_dir=meta['database_dir'],
+        path_to_db=meta['path_to_db'],
+        _shows=shows,
+    )
+    database._changed = set()
+    database._synced_path = path
+    return database
+
+
+def shard_name(ltitle):
+    """Return the file name of the shard of the show stored under *ltitle*.
+
+    Usage:
+    >>> shard_name('game_of_thrones')
+    'game_of_thrones.json'
+    """
+    return urllib.parse.quote(ltitle, safe='') + '.json'
+
+
+class ShardedShows(_LazyMapping):
+    """The shows of a sharded database, each read from its shard on first access.
+
+    Args:
+        directory: Directory holding the shards.
+        shards: Dictionary of ltitle to the file name of the show's shard.
+        short_codes: Dictionary of short code to ltitle listed in the
+            manifest of a tracker.
+    """
+    def __init__(self, directory, shards, short_codes=None):
+        super().__init__(dict(shards))
+        self.directory = directory
+        # Shows, and short codes of a tracker, listed in the manifest on disk
+        self.manifest_keys = frozenset(self._keys)
+        self.manifest_short_codes = short_codes
+
+    def shard(self, key):
+        """Return the file name of the shard of the show stored under *key*."""
+        return self._keys[key]
+
+    def _read(self, key):
+        with open(os.path.join(self.directory, self._keys[key]), 'rb') as f:
+            data = f.read()
+        return json.loads(data.decode('utf-8'), object_hook=decode_registered)
+
+    def __setitem__(self, key, show):
+        self._loaded[key] = show
+        if key not in self._keys:
+            self._keys[key] = shard_name(key)
+
+    def __repr__(self):
+        return '{}({!r}, shows={!r}, decoded={!r})'.format(
+            self.__class__.__name__,
+            self.directory,
+            len(self),
+            self.decoded,
+        )
+
+
+def dump_sharded(database, path, staged):
+    """Write *database* to *path* in the sharded format.
+
+    Only the shards of the shows marked as changed are written, unless the
+    database was not loaded from *path*, in which case every shard is
+    written and shards of shows no longer in the database are removed.
+    The files are added to *staged*.
+    """
+    directory = shard_dir(path)
+    os.makedirs(directory, exist_ok=True)
+    attributes = database.serializable_attributes()
+    shows = attributes['_shows']
+    encoder = EncodeShow(sort_keys=True)
+    lazy = isinstance(shows, ShardedShows) and shows.directory == directory
+
+    full = database._changed is None or database._synced_path != path
+    if full:
+        changed = list(shows)
+        shards = {ltitle: shard_name(ltitle) for ltitle in changed}
+        stale = set(os.listdir(directory)) - set(shards.values())
+        for shard in stale:
+            staged.remove(os.path.join(directory, shard))
+    else:
+        changed = database._changed
+        shards = {ltitle: shows.shard(ltitle) if lazy else shard_name(ltitle) for ltitle in shows}
+
+    for ltitle in changed:
+        shard = os.path.join(directory, shards.get(ltitle) or shard_name(ltitle))
+        if ltitle in shows:
+            with staged.open(shard) as f:
+                f.write(encoder.encode(shows[ltitle]).encode('utf-8'))
+        else:
+            staged.remove(shard)
+
+    # The manifest only lists the shows and short codes, so it is left
+    # alone unless shows were added or removed, or short codes changed.
+    short_codes = _short_codes(database)
+    if (
+        full or not lazy or shows.manifest_keys != shards.keys()
+        or shows.manifest_short_codes != short_codes
+    ):
+        manifest = {
+            'class': type(database).__name__,
+            'attributes': {k: v for k, v in attributes.items() if k != '_shows'},
+            'shows': shards,
+        }
+        if short_codes is not None:
+            manifest['short_codes'] = short_codes
+        with staged.open(path) as f:
+            f.write(SHARDS_MAGIC)
+            f.write(json.dumps(manifest, cls=EncodeShow, sort_keys=True).encode('utf-8'))
+
+    def written():
+        database._changed = set()
+        if lazy:
+            shows.manifest_keys = frozenset(shards)
+            shows.manifest_short_codes = short_codes
+
+    staged.on_publish(written)
+
+
+def load_sharded(path):
+    """Return the database stored in the sharded database at *path*.
+
+    Only the manifest is read, and each show is read from its shard when
+    it is first accessed.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    manifest = json.loads(data[len(SHARDS_MAGIC):].decode('utf-8'), object_hook=decode_registered)
+
+    database = registry[manifest['class']](
+        _shows=ShardedShows(shard_dir(path), manifest['shows'], manifest.get('short_codes')),
+        **manifest['attributes']
+    )
+    if 'short_codes' in manifest:
+        database._short_code_index = dict(manifest['short_codes'])
+    database._changed = set()
+    database._synced_path = path
+    return database
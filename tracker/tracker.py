@@ -3,18 +3,26 @@
 Utility to keep track of TV shows
 """
 import argparse
+from bisect import bisect_right
 import collections
 # import datetime
+from functools import partial
+from itertools import repeat
 import json
 import logging
 import os
 # import re
-from Queue import Queue  # Python 3 only! module is queue in Python 2
 import sys
-import threading
-
-import requests
 
+from .api import (
+    close_session,
+    DEFAULT_CONCURRENCY,
+    DEFAULT_RATE,
+    request,
+    set_api_url,
+    set_rate_limit,
+)
+from .cache import ResponseCache
 from .exceptions import (
     APIRequestError,
     DatabaseError,
@@ -31,13 +39,30 @@ from .exceptions import (
     TrackerDatabaseNotFoundError,
     WatchlistError,
 )
+from .fetch import FetchEngine
+from .journal import Journal, journal_path
+from .storage import (
+    dump,
+    EpisodeArray,
+    EpisodeView,
+    format_from_path,
+    FORMATS,
+    INCREMENTAL_FORMATS,
+    LazyShows,
+    load,
+    path_for_format,
+    remove_database,
+    ShardedShows,
+    StagedWrite,
+)
 from .utils import (
     check_for_databases,
     check_for_season_episode_code,
-    Deserializer,
+    decode_season_response,
     extract_season_episode_from_str,
     EncodeShow,
     extract_episode_details,
+    find_database,
     get_show_database_entry,
     logging_init,
     lunderize,
@@ -57,6 +82,8 @@ logger = logging.getLogger(__name__)
 
 class Database(RegisteredSerializable):
     """Provide base method for different types of databases"""
+    _transient = ('_changed', '_synced_path', '_journal', '_dirty')
+
     def __init__(
         self,
         database_dir=None,
@@ -68,26 +95,120 @@ class Database(RegisteredSerializable):
 
         self._shows = {} if _shows is None else _shows
 
-    def create_db_from_watchlist(self, watchlist_path):
+        # Keys of the shows added, changed or removed since the database was
+        # loaded from _synced_path. None if unknown, in which case the whole
+        # database is written. Only used by the sqlite storage format.
+        self._changed = None
+        self._synced_path = None
+        self._journal = None
+        self._dirty = False
+
+    def mark_changed(self, key):
+        """Record that the show stored under *key* was added, changed or removed."""
+        self._dirty = True
+        if self._changed is not None:
+            self._changed.add(key)
+
+    def replace_show(self, key, show):
+        """Store *show* under *key*, or remove the show stored there if *show* is None."""
+        if show is None:
+            self._shows.pop(key, None)
+        else:
+            self._shows[key] = show
+        self.mark_changed(key)
+
+    @property
+    def dirty(self):
+        """True if the database has changes which have not been written.
+
+        A database which has never been written to path_to_db, e.g., a new
+        database, or one whose path has been changed, is also dirty.
+        """
+        return self._dirty or self._synced_path != self.path_to_db
+
+    @property
+    def journal(self):
+        """Journal of changes not yet written to the database, see tracker.journal"""
+        path = journal_path(self.path_to_db)
+        if self._journal is None or self._journal.path != path:
+            self._journal = Journal(path)
+        return self._journal
+
+    def journal_change(self, op, key):
+        """Append the current state of the show stored under *key* to the journal."""
+        self.journal.append(op, key, self._shows.get(key))
+
+    def create_db_from_watchlist(self, watchlist_path, session=None, concurrency=None, cache=True):
         """Create a database from a watchlist"""
         logger.info('Create show database from watchlist=%r', watchlist_path)
         watchlist = ProcessWatchlist(watchlist_path)
-        # TODO: Could multithread here
-        for show in watchlist:
-            self.add_show(show, from_watchlist=True)
+        self.add_shows(
+            list(watchlist),
+            from_watchlist=True,
+            session=session,
+            concurrency=concurrency,
+            cache=cache,
+        )
 
     def add_show(self, show):
         raise NotImplementedError
 
-    def write_db(self, indent=None):
-        """Write database to disk"""
+    def add_shows(self, shows, from_watchlist=False, session=None, concurrency=None, cache=True):
+        raise NotImplementedError
+
+    @property
+    def storage_format(self):
+        """Format the database is written in, see tracker.storage"""
+        return format_from_path(self.path_to_db)
+
+    def write_db(self, indent=None, storage_format=None, staged=None):
+        """Write database to disk.
+
+        The database is written whether or not it is dirty, see
+        commit_databases to only write databases which have changed.
+
+        Args:
+            indent: indentation used by the json format
+            storage_format: format to write the database in. Defaults to
+                the current format. If another format is given the
+                database is converted, and the file in the old format is
+                removed.
+            staged: StagedWrite to add the files to, which the caller then
+                publishes. By default the files are published straight
+                away.
+        """
         try:
             os.mkdir(self.database_dir)
         except OSError:
             logger.debug('os.mkdir failed: directory=%r already exists', self.database_dir)
 
-        with open(self.path_to_db, 'w', encoding='utf-8') as f:
-            json.dump(self, f, cls=EncodeShow, indent=indent, sort_keys=True)
+        old_path = self.path_to_db
+        if storage_format is not None:
+            self.path_to_db = path_for_format(old_path, storage_format)
+
+        publish = staged is None
+        if publish:
+            staged = StagedWrite()
+        try:
+            dump(self, self.path_to_db, self.storage_format, indent, staged)
+        except BaseException:
+            if publish:
+                staged.discard()
+            raise
+
+        if self.path_to_db != old_path and os.path.exists(old_path):
+            logger.info('Convert database=%r to %r', old_path, self.path_to_db)
+            remove_database(old_path, staged)
+
+        staged.on_publish(partial(self._written, self.path_to_db))
+        if publish:
+            staged.publish()
+
+    def _written(self, path):
+        # The database now holds every change recorded in the journal
+        self.journal.discard_applied()
+        self._dirty = False
+        self._synced_path = path
 
     def __iter__(self):
         return iter(self._shows)
@@ -113,7 +234,7 @@ class ShowDatabase(Database):
         # if not os.path.exists(self.path_to_showdb):
         #     self.create_database()
 
-    def add_show(self, show_details, from_watchlist=False):
+    def add_show(self, show_details, from_watchlist=False, session=None, cache=True):
         """Add a show to the database.
 
         Args:
@@ -121,26 +242,103 @@ class ShowDatabase(Database):
                 show_title
                 next_episode
                 notes
+            from_watchlist: log, rather than raise, a ShowNotFoundError
+            session: requests.Session used for the API requests. Defaults
+                to the session shared by the whole process.
+            cache: use the response cache in the database directory.
         Example show_details:
                 'Game of Thrones'
                 'S01E01'
                 'Pilot episode'
         """
-        title = show_details.show_title
-        # Create a Show() object
-        show = Show(title)
+        self.add_shows([show_details], from_watchlist, session=session, cache=cache)
+
+    def add_shows(self, shows, from_watchlist=False, session=None, concurrency=None, cache=True):
+        """Add several shows to the database, requesting them concurrently.
+
+        Shows are added in the order given, regardless of the order in
+        which their requests complete.
+
+        Args:
+            shows: list of namedtuples with a show_title field, as accepted
+                by add_show.
+            from_watchlist: log, rather than raise, a ShowNotFoundError
+            session: requests.Session used for the API requests.
+            concurrency: Maximum number of requests in flight at once,
+                across all of the shows.
+            cache: serve and store responses in the response cache kept
+                in the database directory, see response_cache.
+
+        Raises:
+            ShowNotFoundError: a show could not be found, and we are not
+                adding shows from a watchlist. Shows which were found are
+                still added.
+        """
+        new_shows = [Show(show_details.show_title) for show_details in shows]
+
         # FIXME: Hidden IO
-        try:
-            show.populate_seasons()
-        except ShowNotFoundError as e:
-            if not from_watchlist:
-                raise
-            # If we know we're adding multiple shows (i.e., from a
-            # watchlist) then we should not raise again.
-            logger.info(e)
-        else:
-            logger.info('Add show=%r to showdb', show.ltitle)
-            self._shows[show.ltitle] = show
+        cache = self.response_cache() if cache else None
+        engine = FetchEngine(session=session, concurrency=concurrency, cache=cache)
+        results = engine.run(engine.populate_shows, new_shows)
+        if cache is not None:
+            logger.info(cache)
+        logger.info('Shared %r identical in-flight requests.', engine.coalesced)
+
+        error = None
+        for show, result in zip(new_shows, results):
+            if result is None:
+                logger.info('Add show=%r to showdb', show.ltitle)
+                self._shows[show.ltitle] = show
+                self.mark_changed(show.ltitle)
+            elif isinstance(result, ShowNotFoundError) and from_watchlist:
+                # If we know we're adding multiple shows (i.e., from a
+                # watchlist) then we should not raise again.
+                logger.info(result)
+            elif error is None:
+                error = result
+
+        if error is not None:
+            raise error
+
+    def response_cache(self):
+        """ResponseCache stored in the .cache directory of the database"""
+        return ResponseCache(os.path.join(self.database_dir, '.cache'))
+
+    def refresh_shows(self, titles=None, session=None, concurrency=None, cache=True):
+        """Fetch new seasons and episodes for shows in the database.
+
+        A show which cannot be refreshed keeps its existing details.
+
+        Args:
+            titles: ltitles of the shows to refresh. Defaults to every show.
+            session: requests.Session used for the API requests.
+            concurrency: Maximum number of requests in flight at once.
+            cache: serve and store responses in the response cache kept
+                in the database directory, see response_cache.
+
+        Returns:
+            List of ltitles of the shows which could not be refreshed.
+        """
+        if titles is None:
+            titles = list(self._shows)
+        shows = [get_show_database_entry(self, title) for title in titles]
+
+        cache = self.response_cache() if cache else None
+        engine = FetchEngine(session=session, concurrency=concurrency, cache=cache)
+        results = engine.run(engine.refresh_shows, shows)
+        if cache is not None:
+            logger.info(cache)
+
+        failed = []
+        for show, result in zip(shows, results):
+            if result is None:
+                logger.info('Refreshed show=%r', show.ltitle)
+                self.mark_changed(show.ltitle)
+            else:
+                logger.error('Could not refresh show=%r: %r', show.ltitle, result)
+                failed.append(show.ltitle)
+
+        return failed
 
     def __contains__(self, key):
         return key in self._shows
@@ -155,6 +353,8 @@ class TrackerDatabase(Database):
     Available methods:
         next_episode:
     """
+    _transient = Database._transient + ('_showdb', '_short_code_index')
+
     def __init__(
         self,
         database_dir=None,
@@ -172,6 +372,10 @@ class TrackerDatabase(Database):
             self.path_to_db = os.path.join(self.database_dir, tracker_name)
         else:
             self.path_to_db = path_to_db
+        self._showdb = None
+        # Short code to ltitle of each tracked show which has one. Built on
+        # the first lookup, so loading a tracker does not decode every show.
+        self._short_code_index = None
 
         # self.path_to_tracker = os.path.join(self.database_dir, self.tracker_name)
 
@@ -183,6 +387,25 @@ class TrackerDatabase(Database):
         #     show_db = load_database(self.path_to_showdb)
         #     self._add_next_prev_episode(show_db)
 
+    def attach_showdb(self, showdb):
+        """Look up the next and previous episodes of tracked shows in *showdb*.
+
+        Shows which have not been decoded yet are attached as they are.
+        """
+        self._showdb = showdb
+
+        def attach(show):
+            show._showdb = showdb
+
+        if isinstance(self._shows, (LazyShows, ShardedShows)):
+            shows = self._shows.loaded()
+            self._shows.on_decode = attach
+        else:
+            shows = self._shows.values()
+
+        for show in shows:
+            attach(show)
+
     def create_tracker_from_watchlist(self, watchlist_path, showdb=None):
         """Create a tracker database from a watchlist"""
         logger.info('Create tracker database from watchlist=%r', watchlist_path)
@@ -215,6 +438,7 @@ class TrackerDatabase(Database):
                 self._shows[ltitle]._next_episode = show.next_episode
                 # Update the next and prev attributes
                 self._shows[ltitle]._set_next_prev(showdb)
+                self.mark_changed(ltitle)
 
             else:
                 self.add_tracked_show(show, showdb)
@@ -224,7 +448,11 @@ class TrackerDatabase(Database):
         if showdb is None:
             # Attempt to load the ShowDatabase from the common database
             # directory
-            path_to_showdb = os.path.join(os.path.dirname(self.path_to_db), '.showdb.json')
+            database_dir = os.path.dirname(self.path_to_db)
+            path_to_showdb = (
+                find_database(database_dir, '.showdb')
+                or os.path.join(database_dir, '.showdb.json')
+            )
 
             try:
                 showdb = load_database(path_to_showdb)
@@ -240,6 +468,7 @@ class TrackerDatabase(Database):
         )
         logger.info('Add show=%r to the tracker database.', show.ltitle)
         self._shows[show.ltitle] = show
+        self.mark_changed(show.ltitle)
 
         # Set the tracked show .title attribute to the 'official' show title
         # retrieved from the API request
@@ -254,20 +483,84 @@ class TrackerDatabase(Database):
         self._shows[show.ltitle]._set_next_prev(showdb)
 
     def _short_codes(self):
-        for s in self._shows:
-            yield self._shows[s].short_code
+        """Return the dictionary of short code to ltitle of the tracked shows.
+
+        The json and sharded formats store the dictionary alongside the
+        shows, so it is loaded without decoding any show. Otherwise it is
+        built from every show on first use.
+        """
+        if self._short_code_index is None:
+            self._short_code_index = {
+                show.short_code: ltitle
+                for ltitle, show in self._shows.items()
+                if show.short_code
+            }
+        return self._short_code_index
+
+    def find_short_code(self, short_code):
+        """Return the ltitle of the tracked show with *short_code*, or None."""
+        return self._short_codes().get(short_code.upper())
+
+    def set_short_code(self, ltitle, short_code):
+        """Set the short code of a tracked show, or remove it if *short_code* is None.
+
+        Short codes must be changed through here, to keep them unique, and
+        the index of them up to date. Removing the short code of a show
+        which has none changes nothing.
+
+        Raises:
+            ShortCodeAlreadyAssignedError: *short_code* is already in use.
+        """
+        short_codes = self._short_codes()
+        if short_code is not None:
+            short_code = short_code.upper()
+            if short_code in short_codes:
+                raise ShortCodeAlreadyAssignedError(
+                    'Short-code <{}> is already in use'.format(short_code)
+                )
+
+        show = self._shows[ltitle]
+        if short_code is None and not show.short_code:
+            return
+        if show.short_code:
+            short_codes.pop(show.short_code, None)
+        show.short_code = short_code
+        if short_code:
+            short_codes[short_code] = ltitle
+        self.mark_changed(ltitle)
+
+    def replace_show(self, key, show):
+        if self._short_code_index is not None:
+            for short_code in [c for c, ltitle in self._short_code_index.items() if ltitle == key]:
+                del self._short_code_index[short_code]
+            if show is not None and show.short_code:
+                self._short_code_index[show.short_code] = key
+        super().replace_show(key, show)
+
+    def remove_tracked_show(self, ltitle):
+        """Stop tracking the show stored under *ltitle*."""
+        show = self._shows.pop(ltitle)
+        if show.short_code and self._short_code_index is not None:
+            self._short_code_index.pop(show.short_code, None)
+        self.mark_changed(ltitle)
 
     def __contains__(self, key):
-        full_title = key in self._shows
-        short_code = key.upper() in self._short_codes()
-        return full_title or short_code
+        return key in self._shows or self.find_short_code(key) is not None
 
     def __repr__(self):
         return '{}({!r})'.format(self.__class__.__name__, self.path_to_db)
 
 
 class Season(RegisteredSerializable):
-    """Represent a season of a TV show"""
+    """Represent a season of a TV show
+
+    The episodes are a list of Episode instances, or an EpisodeArray when
+    the season was loaded from the binary format or packed (see pack), in
+    which case an Episode is only built when one is accessed.
+    """
+    __slots__ = ('_episodes', 'episodes_this_season')
+    _fields = __slots__
+
     def __init__(self, episodes_this_season=0, _episodes=None):
         self._episodes = [] if _episodes is None else _episodes
         self.episodes_this_season = 0 if episodes_this_season is None else len(self._episodes)
@@ -276,6 +569,33 @@ class Season(RegisteredSerializable):
         """Add an episode object to self._episodes"""
         self._episodes.append(episode)
 
+    def pack(self):
+        """Hold the episodes in an EpisodeArray rather than a list, and return self."""
+        if isinstance(self._episodes, list):
+            self._episodes = EpisodeArray.from_episodes(self._episodes)
+        return self
+
+    def imdb_ratings(self):
+        """Return the IMDb rating of each episode, None where not rated.
+
+        The ratings of a packed or mapped season are read from its rating
+        column, without building any Episode.
+        """
+        episodes = self._episodes
+        if isinstance(episodes, list):
+            return [e.imdb_rating for e in episodes]
+        return episodes.imdb_ratings()
+
+    def episode_numbers(self):
+        """Return the (season, episode) numbers of each episode.
+
+        Read from the columns of a packed or mapped season.
+        """
+        episodes = self._episodes
+        if isinstance(episodes, list):
+            return [(e.season, e.episode) for e in episodes]
+        return episodes.episode_numbers()
+
     def construct_episode(self, episode_details):
         """Return an Episode instance."""
         return Episode(**episode_details)
@@ -295,6 +615,22 @@ class Season(RegisteredSerializable):
         # Update the number of episodes this season
         self.episodes_this_season = len(self._episodes)
 
+    def build_season_from_content(self, content):
+        """Build a season of episodes from an undecoded season response.
+
+        Equivalent to build_season(json.loads(content)), but creates the
+        Episode instances as the response is decoded, see
+        decode_season_response.
+        """
+        season, titles, episodes, ratings = decode_season_response(content)
+
+        self._episodes.extend(
+            map(Episode, episodes, repeat(season), titles, [{'imdb': r} for r in ratings])
+        )
+
+        # Update the number of episodes this season
+        self.episodes_this_season = len(self._episodes)
+
     def __getitem__(self, index):
         return self._episodes[index]
 
@@ -305,27 +641,79 @@ class Season(RegisteredSerializable):
         return len(self._episodes)
 
 
+class MappedSeason(Season):
+    """A season whose episodes are read from a columnar database.
+
+    The episodes are an EpisodeView over the memory-mapped episode
+    columns, and Episode instances are only created as they are accessed.
+    A mapped season is read-only, and is written as a Season.
+
+    Args:
+        table: EpisodeTable of the database.
+        first: Episode row of the first episode of each season.
+        count: Number of episodes of each season.
+        row: Row of this season.
+    """
+    __slots__ = ('_table', '_first', '_count')
+    _serialized_as = 'Season'
+
+    def __init__(self, table, first, count, row):
+        self._table = table
+        self._first = first[row]
+        self._count = count[row]
+
+    @property
+    def _episodes(self):
+        return EpisodeView(self._table, self._first, self._count)
+
+    @property
+    def episodes_this_season(self):
+        return self._count
+
+    def add_episode(self, episode):
+        raise TypeError('Cannot add an episode to a season loaded from a columnar database')
+
+    def __len__(self):
+        return self._count
+
+    def serializable_attributes(self):
+        return {'_episodes': list(self._episodes), 'episodes_this_season': self._count}
+
+
 class Episode(RegisteredSerializable):
-    """Small class to represent an Episode of a TV show."""
+    """Small class to represent an Episode of a TV show.
+
+    Only the IMDb rating is kept. ratings returns it in the form it is
+    written to disk, {'imdb': rating}, and a new dict on each access, so
+    set ratings or imdb_rating to change it.
+    """
+    __slots__ = ('episode', 'season', 'title', 'imdb_rating')
+    _fields = ('episode', 'season', 'title', 'ratings')
+
     def __init__(self, episode, season, title, ratings):
         self.episode = episode
         self.season = season
         self.title = title
-        self.ratings = ratings
+        self.imdb_rating = ratings.get('imdb')
 
-    def __eq__(self, other):
-        for k in self.__dict__:
-            if self.__dict__[k] != other.__dict__[k]:
-                return False
+    @property
+    def ratings(self):
+        return {'imdb': self.imdb_rating}
 
-        return True
+    @ratings.setter
+    def ratings(self, ratings):
+        self.imdb_rating = ratings.get('imdb')
 
-    def __ne__(self, other):
-        for k in self.__dict__:
-            if self.__dict__[k] != other.__dict__[k]:
-                return True
+    def __eq__(self, other):
+        return (
+            self.episode == other.episode
+            and self.season == other.season
+            and self.title == other.title
+            and self.imdb_rating == other.imdb_rating
+        )
 
-        return False
+    def __ne__(self, other):
+        return not self == other
 
     def __repr__(self):
         return '{self.title} (S{self.season:02d}E{self.episode:02d})'.format(
@@ -333,18 +721,55 @@ class Episode(RegisteredSerializable):
         )
 
 
+def _intern(s):
+    """Return the interned copy of the string *s*, or *s* if it is not a str."""
+    return sys.intern(s) if type(s) is str else s
+
+
 class ShowDetails(RegisteredSerializable):
     """Provide basic information about a show.
 
     Provide access to various title formats and the short_code of
-    a Show.
+    a Show. request_title and ltitle are derived from the title on first
+    access and are not written to disk; they keep following the title
+    the show was created with when it is renamed, as ltitle keys the show.
+    Titles are interned, so a show and its tracked show share one string.
     """
+    __slots__ = ('_title', '_request_title', '_ltitle', 'short_code')
+    _fields = ('title', 'short_code')
+
     def __init__(self, title=None, short_code=None):
-        self.title = title
-        self.request_title = sanitize_title(title)
-        self.ltitle = lunderize(title)
+        self._title = _intern(title)
+        self._request_title = None
+        self._ltitle = None
         self.short_code = short_code
 
+    @property
+    def title(self):
+        return self._title
+
+    @title.setter
+    def title(self, title):
+        self._derive_titles()
+        self._title = _intern(title)
+
+    @property
+    def request_title(self):
+        if self._request_title is None:
+            self._derive_titles()
+        return self._request_title
+
+    @property
+    def ltitle(self):
+        if self._ltitle is None:
+            self._derive_titles()
+        return self._ltitle
+
+    def _derive_titles(self):
+        if self._ltitle is None and self._title is not None:
+            self._request_title = sanitize_title(self._title)
+            self._ltitle = sys.intern(lunderize(self._title))
+
     def __lt__(self, other):
         return self.ltitle < other.ltitle
 
@@ -361,12 +786,37 @@ class ShowDetails(RegisteredSerializable):
         return 'ShowDetails(title={!r})'.format(self.title)
 
 
+def _episode_coords(coords, episode=None):
+    """Return the (season, episode) coordinates of a tracked episode.
+
+    *coords* is a tuple or, when read from json, a list. *episode* is an
+    Episode stored by earlier versions of the tracker.
+    """
+    if coords is not None:
+        return tuple(coords)
+    if episode is not None:
+        return (episode.season, episode.episode)
+    return None
+
+
 class TrackedShow(ShowDetails):
     """Keep track of next and previous episodes of a tracked show.
 
+    Only the (season, episode) numbers of the next and previous episodes
+    are stored. The episodes themselves are looked up in the show database
+    on access (see Show.find_episode), so refreshed titles and ratings are
+    picked up without rewriting the tracker. The show database used is the one last
+    passed to _set_next_prev or inc_dec_episode, or the one attached to
+    the TrackerDatabase holding the show (see attach_showdb).
+
     Available methods:
         inc_episode
+        dec_episode
     """
+    __slots__ = ('notes', '_next_episode', '_showdb', '_next_coords', '_prev_coords')
+    _fields = ShowDetails._fields + ('notes', '_next_episode', '_next_coords', '_prev_coords')
+    _transient = ('_showdb',)
+
     def __init__(
         self,
         title=None,
@@ -375,14 +825,40 @@ class TrackedShow(ShowDetails):
         _next_episode='S01E01',
         notes=None,
         short_code=None,
+        _next_coords=None,
+        _prev_coords=None,
         _next=None,
         _prev=None,
     ):
         super().__init__(title, short_code)
-        self._next = _next
         self.notes = notes
-        self._prev = _prev
         self._next_episode = _next_episode
+        self._showdb = None
+        # Trackers written by earlier versions hold copies of the episodes
+        self._next_coords = _episode_coords(_next_coords, _next)
+        self._prev_coords = _episode_coords(_prev_coords, _prev)
+
+    @property
+    def _next(self):
+        """The next Episode, looked up in the show database."""
+        return self._episode_at(self._next_coords)
+
+    @property
+    def _prev(self):
+        """The previous Episode, looked up in the show database."""
+        return self._episode_at(self._prev_coords)
+
+    def _episode_at(self, coords):
+        if coords is None:
+            return None
+
+        if self._showdb is None:
+            raise DatabaseError(
+                'No show database attached to tracked show={!r}'.format(self.ltitle)
+            )
+
+        showdb_entry = get_show_database_entry(self._showdb, title=self.ltitle)
+        return showdb_entry.episode_at(showdb_entry.find_episode(*coords))
 
     def _set_next_prev(self, show_database):
         """Set up the next and previous episodes of a TrackedShow.
@@ -400,25 +876,9 @@ class TrackedShow(ShowDetails):
         # season=1, episode=1
         season, episode = extract_season_episode_from_str(self._next_episode)
 
-        # Account for zero-indexing.
-        season, episode = season-1, episode-1
-
-        self._validate_season_episode(showdb_entry, season, episode)
-
-        self._next = showdb_entry._seasons[season]._episodes[episode]
-
-        if season > 0:
-            if episode == 0:
-                season -= 1
-                episode = showdb_entry._seasons[season].episodes_this_season - 1
-            else:
-                episode -= 1
-
-        # If season or episode is non-zero, then a previous episode exists
-        if season or episode:
-            self._prev = showdb_entry._seasons[season]._episodes[episode]
-        else:
-            self._prev = None
+        position = showdb_entry.find_episode(season, episode)
+        self._showdb = show_database
+        self._move_to(showdb_entry, position)
 
     def inc_dec_episode(self, show_database, inc=False, dec=False, by=1):
         """Increment or decrement the next episode for a show.
@@ -433,42 +893,26 @@ class TrackedShow(ShowDetails):
             raise InvalidUsageError('Neither inc nor dec commands were passed.')
 
         showdb_entry = get_show_database_entry(show_database, title=self.ltitle)
+        self._showdb = show_database
 
-        season, episode = self._adjust_season_episode(inc, dec)
-
-        if inc:
-            self.inc_episode(showdb_entry, season, episode, by)
-        else:
-            self.dec_episode(showdb_entry, season, episode, by)
-
-    def _adjust_season_episode(self, inc, dec):
-        """Return a zero-index adjusted season and episode"""
         if inc:
-            return self._next.season-1, self._next.episode-1
+            self.inc_episode(showdb_entry, by)
         else:
-            try:
-                season, episode = self._prev.season-1, self._prev.episode-1
-            except AttributeError:
-                # self.prev is None, meaning we are dealing with the first
-                # episode of a show (S01E01).
-                season, episode = 0, 0
-
-            return season, episode
-
-    def _validate_season_episode(self, showdb, season, episode):
-        """Check that the season and episode passed are valid."""
+            self.dec_episode(showdb_entry, by)
 
-        try:
-            _ = showdb._seasons[season]
-        except IndexError:
-            raise SeasonOutOfBoundsError('Season={!r} is out of bounds.'.format(season))
+    def _position(self, showdb):
+        """Return the position of the next episode in *showdb*, a show entry."""
+        if self._next_coords is None:
+            return showdb.find_episode(*extract_season_episode_from_str(self._next_episode))
+        return showdb.find_episode(*self._next_coords)
 
-        try:
-            _ = showdb._seasons[season]._episodes[episode]
-        except IndexError:
-            raise EpisodeOutOfBoundsError('Episode={!r} is out of bounds.'.format(episode))
+    def _move_to(self, showdb, position):
+        """Make the episode at *position* in *showdb*, a show entry, the next one."""
+        numbers = showdb.episode_index().numbers
+        self._next_coords = numbers[position]
+        self._prev_coords = numbers[position-1] if position else None
 
-    def inc_episode(self, showdb, season, episode, by=1):
+    def inc_episode(self, showdb, by=1):
         """Advance the next episode for a tracked show.
 
         Args:
@@ -477,61 +921,34 @@ class TrackedShow(ShowDetails):
                 episode. Default is to advance by one episode.
 
         Raises:
-            SeasonOutOfBoundsError: invalid season
-            EpisodeOutOfBoundsError: invalid episode
+            SeasonOutOfBoundsError: advanced past the last episode
+            EpisodeOutOfBoundsError: the next episode is no longer in the
+                show database
         """
-        for inc in range(by):
-            # Check if the current ('old') next_episode is the season finale
-            # If so, the 'new' next_episode will be the next season premiere.
-            if self._next.episode == showdb._seasons[season].episodes_this_season:
-                season += 1
-                episode = 0
-            else:
-                episode += 1
-
-            self._validate_season_episode(showdb, season, episode)
-
-            self._prev = self._next
-            self._next = showdb._seasons[season]._episodes[episode]
+        position = self._position(showdb) + by
+        if position >= len(showdb.episode_index()):
+            raise SeasonOutOfBoundsError(
+                'Cannot advance by={!r} episodes past the last episode.'.format(by)
+            )
+        self._move_to(showdb, position)
 
-    def dec_episode(self, showdb, season, episode, by=1):
+    def dec_episode(self, showdb, by=1):
         """Decrement the next episode for a tracked show.
 
+        Decrementing past the first episode of the show stops there.
+
         Args:
             showdb: a ShowDatabase entry for the current show
             by: How many episodes to decrement from the current
                 episode. Default is to decrement by one episode.
         """
-        for dec in range(by):
-            if season == 0 and episode == 0:
-                self._next = showdb._seasons[season]._episodes[episode]
-                break  # TODO: Perhaps raise something
-            # Decrement over a season boundary, for season > 0.
-            # Set the episode to the finale of the previous season
-            elif episode == 0:
-                season -= 1
-                episode = showdb._seasons[season].episodes_this_season-1
-            else:
-                episode -= 1
-
-            self._validate_season_episode(showdb, season, episode)
-
-            self._next = self._prev
-            self._prev = showdb._seasons[season]._episodes[episode]
+        self._move_to(showdb, max(self._position(showdb) - by, 0))
 
     def __eq__(self, other):
-        for k in self.__dict__:
-            if self.__dict__[k] != other.__dict__[k]:
-                return False
-
-        return True
+        return self.serializable_attributes() == other.serializable_attributes()
 
     def __ne__(self, other):
-        for k in self.__dict__:
-            if self.__dict__[k] != other.__dict__[k]:
-                return True
-
-        return False
+        return not self == other
 
     def __repr__(self):
         return (
@@ -540,12 +957,70 @@ class TrackedShow(ShowDetails):
         )
 
 
+class EpisodeIndex:
+    """Positions of the episodes of a show, counted across its seasons.
+
+    Moving the next episode of a tracked show by any number of episodes
+    is arithmetic on its position, and finding an episode by its numbers
+    is a dictionary lookup, so neither steps through the seasons. Episodes
+    are found by their numbers rather than their place in a season, so
+    gaps in the numbering are handled.
+
+    Attributes:
+        offsets: Position of the first episode of each season, then the
+            number of episodes in the show.
+        numbers: (season, episode) numbers of the episode at each position.
+        positions: Position of the episode with each (season, episode)
+            numbers. The first is kept if numbers are repeated.
+        seasons: Each season indexed, and its length when it was, see
+            is_current.
+    """
+    __slots__ = ('offsets', 'numbers', 'positions', 'seasons')
+
+    def __init__(self, seasons):
+        self.seasons = [(season, len(season)) for season in seasons]
+        self.offsets = [0]
+        self.numbers = []
+        for season in seasons:
+            self.numbers.extend(season.episode_numbers())
+            self.offsets.append(len(self.numbers))
+
+        self.positions = {}
+        for position, numbers in enumerate(self.numbers):
+            self.positions.setdefault(numbers, position)
+
+    def is_current(self, seasons):
+        """Return whether *seasons* are still indexed, i.e., none was added, replaced or grew.
+
+        The indexed seasons are referenced, rather than identified by id(),
+        as the id of a replaced season may be reused by its replacement.
+        """
+        return len(seasons) == len(self.seasons) and all(
+            season is indexed and len(season) == length
+            for season, (indexed, length) in zip(seasons, self.seasons)
+        )
+
+    def locate(self, position):
+        """Return the season index, and the index within it, of *position*."""
+        if not 0 <= position < len(self.numbers):
+            raise EpisodeOutOfBoundsError('Position={!r} is out of bounds.'.format(position))
+        season = bisect_right(self.offsets, position) - 1
+        return season, position - self.offsets[season]
+
+    def __len__(self):
+        return len(self.numbers)
+
+
 class Show(ShowDetails):
     """Represent various details of a show.
 
     Available attributes:
         next
     """
+    __slots__ = ('_seasons', 'imdb_id', '_index')
+    _fields = ShowDetails._fields + ('_seasons', 'imdb_id')
+    _transient = ('_index',)
+
     def __init__(
         self,
         title=None,
@@ -558,41 +1033,86 @@ class Show(ShowDetails):
         super().__init__(title, short_code)
         self._seasons = [] if _seasons is None else _seasons
         self.imdb_id = imdb_id
+        self._index = None
+
+    def episode_index(self):
+        """Return the EpisodeIndex of this show, rebuilt if its seasons changed."""
+        if self._index is None or not self._index.is_current(self._seasons):
+            self._index = EpisodeIndex(self._seasons)
+        return self._index
+
+    def find_episode(self, season, episode):
+        """Return the position of the episode numbered *episode* of *season*.
+
+        Raises:
+            SeasonOutOfBoundsError: the show has no such season
+            EpisodeOutOfBoundsError: the season has no such episode
+        """
+        position = self.episode_index().positions.get((season, episode))
+        if position is not None:
+            return position
+
+        if not 1 <= season <= len(self._seasons):
+            raise SeasonOutOfBoundsError('Season={!r} is out of bounds.'.format(season))
+        raise EpisodeOutOfBoundsError('Episode={!r} is out of bounds.'.format(episode))
 
-    def request_show_info(self, q, season=None, search=False):
-        """Make API request with season information"""
+    def episode_at(self, position):
+        """Return the Episode at *position*, counted across every season."""
+        season, episode = self.episode_index().locate(position)
+        return self._seasons[season]._episodes[episode]
+
+    def payload(self, season=None, search=False):
+        """Return the query parameters for an API request about this show."""
         if season:
-            payload = {'i': self.imdb_id, 'season': season}
+            return {'i': self.imdb_id, 'season': season}
         elif search:
-            payload = {'s': self.request_title}
+            return {'s': self.request_title}
         else:
-            payload = {'i': self.imdb_id}
+            return {'i': self.imdb_id}
 
-        logger.debug('Make API request with payload=%r', payload)
-        with requests.Session() as s:
-            response = s.get('http://www.omdbapi.com', params=payload)
+    def request_show_info(self, season=None, search=False, session=None):
+        """Make API request with season information.
 
-        try:
-            response.raise_for_status()
-        except requests.exceptions.HTTPError as e:
-            logger.exception(e)
+        Args:
+            season: season number to request details for
+            search: search for the show by title
+            session: requests.Session to make the request with. Defaults
+                to the session shared by the whole process, so that
+                connections are kept alive between requests.
+
+        Returns:
+            Decoded JSON response.
+        """
+        return request(self.payload(season, search), session)
 
-        # return response.json()
-        q.put(response.json())
+    def populate_seasons(self, session=None, concurrency=None, cache=None):
+        """Request the details of every season of this show.
+
+        Thin synchronous wrapper around FetchEngine.populate_show.
+
+        Args:
+            session: requests.Session shared by every request made for
+                this show. Defaults to the session shared by the whole
+                process.
+            concurrency: Maximum number of requests in flight at once.
+            cache: ResponseCache to serve and store responses.
+        """
+        engine = FetchEngine(session=session, concurrency=concurrency, cache=cache)
+        engine.run(engine.populate_show, self)
 
-    def populate_seasons(self):
-        q = Queue()
-        # Make initial API request to search for the show we're interested in.
-        self.request_show_info(search=True)
-        response = q.get()
+    def set_imdb_id(self, search_response):
+        """Set the IMDb ID of this show from a search response.
 
+        Raises:
+            ShowNotFoundError: the search did not find a series.
+        """
         # Could not find the show in the external database (OMDbAPI)
-        if response['Response'] == 'False':
+        if search_response['Response'] == 'False':
             raise ShowNotFoundError(
                 'Could not find title={} in external database.'.format(self.request_title)
             )
 
-        for title in response['Search']:
+        for title in search_response['Search']:
             if title['Type'] == 'series':
                 self.imdb_id = title['imdbID']
                 break
@@ -603,39 +1123,8 @@ class Show(ShowDetails):
                 'Could not find show with title={}'.format(self.request_title)
             )
 
-        self.request_show_info()
-        show_details = q.get()
-        logger.debug(show_details)
-
-        total_seasons = int(show_details['totalSeasons'])
-        logger.debug('Total seasons for show <%r>: %r', self.request_title, total_seasons)
-
-        threads = []
-
-        # Make *total_seasons* API requests and pass responses to add_season
-        # to be stored.
-        for season in range(1, total_seasons+1):
-            t = threading.Thread(
-                target=self.request_show_info,
-                args=(q,),
-                kwargs={'season': season},
-            )
-            t.start()
-            threads.append(t)
-
-        # Wait for all threads to finish adding responses to the queue.
-        for t in threads:
-            t.join()
-
-        while not q.empty():
-            self.add_season(q.get())
-
-        # No guarantee that the seasons will be ordered correctly if we
-        # thread above
-        # TODO: verify that this works
-        self._seasons.sort(key=lambda k: k._episodes[0]['Season'])
-
-        # Update the show title
+    def set_title(self, show_details):
+        """Update the show title from a show details response."""
         logger.info(
             'Update show title from <%r> to "official" title retrieved '
             'from external database <%r>.',
@@ -645,26 +1134,80 @@ class Show(ShowDetails):
         self.title = show_details['Title']
 
     def add_season(self, season_details):
-        """Create a Season instance and store API response."""
+        """Create a Season instance and store API response.
+
+        Args:
+            season_details: season details response, either decoded or as
+                the undecoded response body
+        """
+        self._seasons.append(self._build_season(season_details))
+
+    def update_season(self, season, season_details):
+        """Replace the stored details for *season*, or add it if it is new.
+
+        Args:
+            season: season number, starting from one
+            season_details: season details response, either decoded or as
+                the undecoded response body
+        """
+        if season > len(self._seasons):
+            self.add_season(season_details)
+        else:
+            self._seasons[season-1] = self._build_season(season_details)
+
+    @staticmethod
+    def _build_season(season_details):
         s = Season()
-        s.build_season(season_details)
-        self._seasons.append(s)
+        if isinstance(season_details, bytes):
+            s.build_season_from_content(season_details)
+        else:
+            s.build_season(season_details)
+        return s
 
 
 def load_database(path_to_database):
-    """Return an existing database"""
+    """Return an existing database, in any of the storage formats.
+
+    Any changes recorded in the journal of the database are replayed.
+    """
     try:
-        with open(path_to_database, 'r') as db:
-            deserialized_data = json.load(db)
+        database = load(path_to_database)
     except FileNotFoundError:
         raise DatabaseError('Could not find database={}'.format(path_to_database))
-    else:
-        deserializer = Deserializer(deserialized_data)
-        database = deserializer.deserialize()
 
+    if database._synced_path is None:
+        database._synced_path = path_to_database
+    database.journal.replay(database)
     return database
 
 
+def commit_databases(*databases):
+    """Write each of *databases* which is dirty, and move them into place together.
+
+    Every database is written before any file is replaced, so an error
+    while writing one database leaves all of them as they were. The
+    renames are then flushed to disk once per directory, rather than once
+    per database.
+
+    Returns:
+        List of the databases which were written.
+    """
+    dirty = [database for database in databases if database.dirty]
+    if not dirty:
+        return dirty
+
+    staged = StagedWrite()
+    try:
+        for database in dirty:
+            logger.info('Write database=%r to disk.', database.path_to_db)
+            database.write_db(staged=staged)
+    except BaseException:
+        staged.discard()
+        raise
+    staged.publish()
+    return dirty
+
+
 def load_all_dbs(database_dir):
     """Load and return a ShowDB and TrackerDB.
 
@@ -673,29 +1216,52 @@ def load_all_dbs(database_dir):
         tracker: TrackerDatabase instance
 
     """
-    showdb = load_database(os.path.join(database_dir, '.showdb.json'))
-    tracker = load_database(os.path.join(database_dir, '.tracker.json'))
+    showdb = load_database(
+        find_database(database_dir, '.showdb') or os.path.join(database_dir, '.showdb.json')
+    )
+    tracker = load_database(
+        find_database(database_dir, '.tracker') or os.path.join(database_dir, '.tracker.json')
+    )
+    tracker.attach_showdb(showdb)
     return showdb, tracker
 
 
-def update_database():
-    """Update an existing ShowDatabase.
-    """
-    # TODO: Locate the database
-
-    # TODO: Rename the database
-
-    # TODO: Get list of existing shows in database
-
-    # TODO: Read watchlist
+def update_database(
+    showdb, trackerdb=None, titles=None, session=None, concurrency=None, cache=True
+):
+    """Update an existing ShowDatabase with new seasons and episodes.
 
-    # TODO: Combine two lists of shows
+    Only the seasons which may have changed are requested, see
+    FetchEngine.refresh_show. Both databases are written to disk
+    afterwards, if they changed.
 
-    # TODO: Create database
+    Args:
+        showdb: ShowDatabase instance to update
+        trackerdb: TrackerDatabase instance whose next and previous
+            episodes should pick up the refreshed details
+        titles: ltitles of the shows to refresh. Defaults to every show.
+        session: requests.Session used for the API requests.
+        concurrency: Maximum number of requests in flight at once.
+        cache: use the response cache in the database directory.
 
-    # TODO: Test database is valid
+    Returns:
+        List of ltitles of the shows which could not be refreshed.
+    """
+    failed = showdb.refresh_shows(titles, session=session, concurrency=concurrency, cache=cache)
+
+    if trackerdb is not None:
+        for ltitle in trackerdb:
+            if ltitle in showdb:
+                show = trackerdb._shows[ltitle]
+                was = (show._next_coords, show._prev_coords)
+                show._set_next_prev(showdb)
+                if (show._next_coords, show._prev_coords) != was:
+                    trackerdb.mark_changed(ltitle)
+        commit_databases(showdb, trackerdb)
+    else:
+        commit_databases(showdb)
 
-    # TODO: Write database, and exit
+    return failed
 
 
 # def update(self, from_file=True):
@@ -768,6 +1334,13 @@ def process_args():
         const='watchlist.txt',
     )
 
+    parser.add_argument(
+        '-u',
+        '--update',
+        help='fetch new seasons and episodes for shows in the database',
+        action='store_true',
+    )
+
     parser.add_argument(
         '--database-dir',
         help='directory where databases are located',
@@ -776,6 +1349,50 @@ def process_args():
         default=os.path.join(os.path.expanduser('~'), '.showtracker'),
     )
 
+    parser.add_argument(
+        '--api-url',
+        help='send API requests to this URL, e.g., a tracker.standin server',
+    )
+
+    parser.add_argument(
+        '-j',
+        '--concurrency',
+        help='maximum number of API requests in flight at once',
+        default=DEFAULT_CONCURRENCY,
+        metavar='N',
+        type=int,
+    )
+
+    parser.add_argument(
+        '--rate',
+        help='maximum number of API requests per second',
+        default=DEFAULT_RATE,
+        type=float,
+    )
+
+    parser.add_argument(
+        '--format',
+        help='format to store the databases in. Defaults to the format of '
+        'the existing databases, or json for new databases',
+        choices=FORMATS,
+    )
+
+    parser.add_argument(
+        '--no-journal',
+        help='write the whole tracker database after a sub-command, rather '
+        'than appending the change to its journal',
+        action='store_false',
+        dest='journal',
+    )
+
+    parser.add_argument(
+        '--no-cache',
+        help='request every show from the API, rather than reusing '
+        'responses cached in the database directory',
+        action='store_false',
+        dest='cache',
+    )
+
     parser.add_argument(
         '-v',
         '--verbose',
@@ -868,10 +1485,12 @@ def handle_watchlist(args, showdb, trackerdb):
     """Handle watchlist processing"""
     if not (showdb._shows and trackerdb._shows):
         # Both showdb and trackerdb are empty
-        showdb.create_db_from_watchlist(args.watchlist)
-        logger.info('Write show database to disk.')
-        showdb.write_db()
-        trackerdb.create_tracker_from_watchlist(args.watchlist)
+        showdb.create_db_from_watchlist(
+            args.watchlist,
+            concurrency=args.concurrency,
+            cache=args.cache,
+        )
+        trackerdb.create_tracker_from_watchlist(args.watchlist, showdb)
     else:
         # Get a list of shows currently in the showdb
         shows = set([showdb._shows[s].request_title for s in showdb])
@@ -884,20 +1503,34 @@ def handle_watchlist(args, showdb, trackerdb):
         new_shows = [s for s in wshows if s not in shows]
         logger.debug('Shows in watchlist, not in show database: %r', new_shows)
 
-        # TODO: Could multithread here
-        for s in new_shows:
-            add_show_to_showdb(s, showdb, from_watchlist=True)
-        logger.info('Write show database to disk.')
-        showdb.write_db()
-
+        add_shows_to_showdb(
+            new_shows,
+            showdb,
+            from_watchlist=True,
+            concurrency=args.concurrency,
+            cache=args.cache,
+        )
         trackerdb.update_tracker_from_watchlist(args.watchlist, showdb)
 
 
-def add_show_to_showdb(title, showdb, from_watchlist=False):
+def add_show_to_showdb(title, showdb, from_watchlist=False, session=None, cache=True):
     """Attempt to add a show to the showdb"""
+    add_shows_to_showdb([title], showdb, from_watchlist, session=session, cache=cache)
+
+
+def add_shows_to_showdb(
+    titles, showdb, from_watchlist=False, session=None, concurrency=None, cache=True
+):
+    """Attempt to add several shows to the showdb concurrently"""
     Show = collections.namedtuple('Show', ('show_title'))
     try:
-        showdb.add_show(Show(title), from_watchlist)
+        showdb.add_shows(
+            [Show(title) for title in titles],
+            from_watchlist,
+            session=session,
+            concurrency=concurrency,
+            cache=cache,
+        )
     except ShowNotFoundError as e:
         raise
     except FoundFilmError as f:
@@ -908,9 +1541,7 @@ def command_add(args, showdb, trackerdb):
     """Add a show or a detail to a show"""
     # Is show in the showdb?
     if args.ltitle not in showdb:
-        add_show_to_showdb(args.show, showdb)
-        logger.info('Write show database to disk.')
-        showdb.write_db()
+        add_show_to_showdb(args.show, showdb, cache=args.cache)
 
     if args.ltitle in trackerdb:
         if not args.note and not args.short_code:
@@ -925,18 +1556,14 @@ def command_add(args, showdb, trackerdb):
         logger.debug('Create NextEpisode namedtuple=%r', show)
         trackerdb.add_tracked_show(show, showdb)
 
-    if args.note:
+    if args.note and trackerdb._shows[args.ltitle].notes != args.note:
         logger.info('Add note=%r to show=%r.', args.note, args.ltitle)
         trackerdb._shows[args.ltitle].notes = args.note
+        trackerdb.mark_changed(args.ltitle)
 
     if args.short_code:
-        upper_sc = args.short_code.upper()
-        if upper_sc in trackerdb._short_codes():
-            raise ShortCodeAlreadyAssignedError(
-                'Short-code <{}> is already in use'.format(upper_sc)
-            )
-        logger.info('Add short-code=%r to show=%r.', upper_sc, args.ltitle)
-        trackerdb._shows[args.ltitle].short_code = upper_sc
+        logger.info('Add short-code=%r to show=%r.', args.short_code.upper(), args.ltitle)
+        trackerdb.set_short_code(args.ltitle, args.short_code)
 
 
 def command_inc_dec(args, showdb, trackerdb):
@@ -955,6 +1582,7 @@ def command_inc_dec(args, showdb, trackerdb):
         dec = True
 
     logger.info('%s. show=%r by %r episodes', args.sub_command, args.ltitle, args.by)
+    coords = show._next_coords
     show.inc_dec_episode(showdb, inc=inc, dec=dec, by=args.by)
 
     next_episode = season_episode_str_from_show(show)
@@ -965,7 +1593,9 @@ def command_inc_dec(args, showdb, trackerdb):
         next_episode,
     )
     # TODO: Set this in the correct location
-    show._next_episode = next_episode
+    if show._next_coords != coords or show._next_episode != next_episode:
+        show._next_episode = next_episode
+        trackerdb.mark_changed(args.ltitle)
 
 
 def command_rm(args, showdb, trackerdb):
@@ -973,25 +1603,26 @@ def command_rm(args, showdb, trackerdb):
     if args.ltitle not in trackerdb:
         raise ShowNotTrackedError('<{!r}> is not currently tracked.'.format(args.ltitle))
 
-    if args.note:
+    if args.note and trackerdb._shows[args.ltitle].notes is not None:
         logger.info(
             'Remove note for show=<%r>. Previous note=%r.',
             args.ltitle,
             trackerdb._shows[args.ltitle].notes,
         )
         trackerdb._shows[args.ltitle].notes = None
+        trackerdb.mark_changed(args.ltitle)
     if args.short_code:
         logger.info(
             'Remove short-code for show=<%r>. Previous short-code=%r.',
             args.ltitle,
             trackerdb._shows[args.ltitle].short_code,
         )
-        trackerdb._shows[args.ltitle].short_code = None
+        trackerdb.set_short_code(args.ltitle, None)
 
     if not (args.note or args.short_code):
         # If neither a note nor short_code were passed then remove the show
         logger.info('Remove show=<%r> from tracker database.', args.ltitle)
-        del trackerdb._shows[args.ltitle]
+        trackerdb.remove_tracked_show(args.ltitle)
 
 
 def tracker(args):
@@ -999,6 +1630,11 @@ def tracker(args):
     # For most of the actions, we will be modifying the tracker, and we
     # should save any changes made
     save = True
+    journal = False
+
+    if args.api_url:
+        set_api_url(args.api_url)
+    set_rate_limit(args.rate)
 
     db_check = check_for_databases(args.database_dir)
     logger.debug(db_check)
@@ -1021,12 +1657,20 @@ def tracker(args):
 
     # Handles case where databases are present, but a non-functional option
     # was passed, such as --database-dir
-    if not (args.list or args.watchlist or args.sub_command):
+    if not (args.list or args.watchlist or args.update or args.sub_command):
         raise InvalidUsageError('Databases present, but no other valid commands passed')
 
     if not (db_check.showdb_exists and db_check.tracker_exists):
         showdb = ShowDatabase(args.database_dir)
         trackerdb = TrackerDatabase(args.database_dir)
+        trackerdb.attach_showdb(showdb)
+        if args.format:
+            for db in (showdb, trackerdb):
+                db.path_to_db = path_for_format(db.path_to_db, args.format)
+    elif args.format:
+        for db in (showdb, trackerdb):
+            if db.storage_format != args.format:
+                db.write_db(storage_format=args.format)
 
     if args.list:
         # We haven't modified the tracker, so we shouldn't write to it
@@ -1034,6 +1678,8 @@ def tracker(args):
         tabulator([trackerdb._shows[key] for key in trackerdb])
     elif args.watchlist:
         handle_watchlist(args, showdb, trackerdb)
+    elif args.update:
+        update_database(showdb, trackerdb, concurrency=args.concurrency, cache=args.cache)
     else:
         # Check if there is a season-episode code passed in the show
         # field, e.g., 'game of thrones s06e10'
@@ -1050,22 +1696,37 @@ def tracker(args):
             # to the show premiere, i.e., 'S01E01'
             args.next_episode = 'S01E01'
 
-        # Save an uppercase version of the show
-        ushow = args.show.upper()
-
-        # Check to see if the show field is really a short_code
-        # TODO: Perhaps a mapping dict would be more suitable for this
-        if ushow in trackerdb._short_codes():
-            for ltitle, s in trackerdb._shows.items():
-                if s.short_code == ushow:
-                    args.show = s.title
+        # Check to see if the show field is really a short_code, unless
+        # it is the title of a tracked show, which needs no show decoded
+        if lunderize(args.show) not in trackerdb._shows:
+            ltitle = trackerdb.find_short_code(args.show)
+            if ltitle is not None:
+                args.show = trackerdb._shows[ltitle].title
 
         args.ltitle = lunderize(args.show)
+        # Sub-commands mark the tracked show they were given as changed,
+        # if they changed it
         args.func(args, showdb, trackerdb)
 
-    if save:
-        logger.info('Write tracker database to disk.')
-        trackerdb.write_db()
+        # Incremental formats already write only the changed show
+        journal = (
+            args.journal
+            and trackerdb.storage_format not in INCREMENTAL_FORMATS
+            and os.path.exists(trackerdb.path_to_db)
+        )
+
+    if journal:
+        # Record the change rather than writing the whole tracker. A show
+        # added to the show database is written first, as the record
+        # refers to it.
+        commit_databases(showdb)
+        if trackerdb.dirty:
+            trackerdb.journal_change(args.sub_command, args.ltitle)
+        if trackerdb.journal.needs_compaction():
+            trackerdb.journal.compact_in_background(trackerdb)
+    elif save:
+        # Only the databases which changed are written
+        commit_databases(showdb, trackerdb)
 
 
 def main():
@@ -1090,6 +1751,8 @@ def main():
     except InvalidUsageError as e:
         logger.exception(e)
         parser.print_help()
+    finally:
+        close_session()
 
 if __name__ == '__main__':
     sys.exit(main())
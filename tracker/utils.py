@@ -1,7 +1,9 @@
 import collections
+import collections.abc
 import json
 import logging
 import logging.config
+import operator
 import os
 import re
 
@@ -193,6 +195,61 @@ def extract_episode_details(season, episode_response):
     }
 
 
+def _season_object_pairs(pairs):
+    """object_pairs_hook used to decode season responses.
+
+    Called for every JSON object in the response, innermost first. An
+    episode object is reduced to a (title, episode, rating) tuple of the
+    raw strings, without building a dict for it. Any other object is
+    returned as a dict.
+    """
+    title = episode = rating = None
+    for key, value in pairs:
+        if key == 'Episode':
+            episode = value
+        elif key == 'Title':
+            title = value
+        elif key == 'imdbRating':
+            rating = value
+
+    if episode is None:
+        return dict(pairs)
+    return title, episode, rating
+
+
+def _to_rating(rating):
+    try:
+        return float(rating)
+    except (TypeError, ValueError):
+        # Rating may come through as 'N/A' if episode has not aired
+        return None
+
+
+def decode_season_response(content):
+    """Decode a season details response straight into episode columns.
+
+    A one pass alternative to decoding the response and then calling
+    extract_episode_details for each episode. Each episode's fields are
+    pulled out as the response is decoded, and the type conversions are
+    made for the whole season at once.
+
+    Args:
+        content: The undecoded season details response
+
+    Returns:
+        Tuple of the season number, and lists of the episode titles,
+        episode numbers and IMDb ratings (None where there is no rating).
+    """
+    details = json.loads(content, object_pairs_hook=_season_object_pairs)
+    season = int(details['Season'])
+
+    if not details['Episodes']:
+        return season, [], [], []
+
+    titles, episodes, ratings = zip(*details['Episodes'])
+    return season, list(titles), list(map(int, episodes)), list(map(_to_rating, ratings))
+
+
 def get_show_database_entry(show_database, title):
     """Get an entry in *show_database* for *title*.
 
@@ -239,6 +296,33 @@ def check_file_exists(directory, filename):
     return False
 
 
+# File extension used for each storage format, see tracker.storage.
+DATABASE_EXTENSIONS = {
+    'json': '.json',
+    'binary': '.bin',
+    'sqlite': '.sqlite',
+    'columnar': '.col',
+    'sharded': '.shards',
+}
+
+
+def find_database(database_dir, name):
+    """Return the path to database *name* in whichever format it is stored.
+
+    Args:
+        database_dir: directory containing databases
+        name: file name of the database without its extension, e.g.,
+            '.showdb'
+
+    Returns:
+        Path to the database, or None if it does not exist in any format.
+    """
+    for extension in DATABASE_EXTENSIONS.values():
+        if check_file_exists(database_dir, name + extension):
+            return os.path.join(database_dir, name + extension)
+    return None
+
+
 def check_for_databases(database_dir):
     """Check existence of Show Database and Tracker.
 
@@ -249,8 +333,8 @@ def check_for_databases(database_dir):
         Namedtuple with True/False flags based on whether
         or not the two databases exist.
     """
-    showdb_exists = check_file_exists(database_dir, '.showdb.json')
-    tracker_exists = check_file_exists(database_dir, '.tracker.json')
+    showdb_exists = find_database(database_dir, '.showdb') is not None
+    tracker_exists = find_database(database_dir, '.tracker') is not None
 
     DatabaseExistence = collections.namedtuple(
         'DatabaseExistence',
@@ -272,7 +356,7 @@ def extract_season_episode_from_str(s):
 
 def season_episode_str_from_show(show):
     """Return a season-episode code in the form SXXEYY"""
-    return 'S{:02d}E{:02d}'.format(show._next.season, show._next.episode)
+    return 'S{:02d}E{:02d}'.format(*show._next_coords)
 
 
 def check_for_season_episode_code(s):
@@ -285,7 +369,8 @@ def check_for_season_episode_code(s):
         m: regex match object if season-episode code present.
         False otherwise.
     """
-    se_pattern = r'[sS](\d{1,2})[eE](\d{1,2})'
+    # Long running shows have seasons of hundreds of episodes
+    se_pattern = r'[sS](\d{1,2})[eE](\d{1,4})'
 
     m = re.search(se_pattern, s)
 
@@ -295,71 +380,112 @@ def check_for_season_episode_code(s):
     return m
 
 
+def decode_registered(obj, titles=None):
+    """Return the instance of a registered class which the JSON object *obj* encodes.
+
+    Use as the object_hook of json.load. Objects are decoded innermost
+    first, so the episodes and seasons of a show are already built when
+    the show is, and a whole database is built in a single pass over the
+    JSON. Objects which do not encode a registered class, e.g., the
+    ratings of an episode, are returned unchanged.
+
+    *titles*, if given, is a dict shared by every object decoded in one
+    load, which keeps one copy of each distinct title; json gives every
+    occurrence of a string its own copy.
+
+    Usage:
+    >>> json.loads('{"__Episode__": {...}}', object_hook=decode_registered)
+    Episode(...)
+    >>> json.loads(data, object_hook=partial(decode_registered, titles={}))
+    """
+    if len(obj) == 1:
+        for key, value in obj.items():
+            if key[:2] == '__' and key[-2:] == '__':
+                cls = registry.get(key[2:-2])
+                if cls is not None:
+                    if titles is not None:
+                        title = value.get('title')
+                        if title is not None:
+                            value['title'] = titles.setdefault(title, title)
+                    return cls(**value)
+    return obj
+
+
 class Deserializer:
+    """Build the registered objects encoded in an already decoded JSON tree.
+
+    Loading decodes JSON with decode_registered as its object_hook
+    instead, which does not build the tree first.
+    """
     def __init__(self, deserialized_data):
         self.deserialized_data = deserialized_data
-        self.db = self._reconstruct_object(deserialized_data)
 
     def deserialize(self):
         """Construct a fully populated Database from deserialized_data."""
-        for show, details in self.db._shows.items():
-            self.db._shows[show] = self._reconstruct_object(details)
-            self._populate_attributes(self.db._shows[show])
-        return self.db
-
-    def _populate_attributes(self, obj, traverse_list=True):
-        """Populate attributes in *obj*.
+        return self._decode(self.deserialized_data)
 
-        Iterate through the keys in the instance dict of *obj* and
-        populate the attributes.
-
-        After initial attribute population, check to see if the
-        current attribute is a list. If so, then call this function
-        again with a flag to indicate not to attempt a further
-        recursion.
-
-        Args:
-            obj: An object
-            traverse_list: Flag to indicate whether or not to recurse
-        """
-        for key, value in obj.__dict__.items():
-            if isinstance(value, dict):
-                obj.__dict__[key] = self._reconstruct_object(value)
-            elif isinstance(value, list):
-                obj.__dict__[key] = [self._reconstruct_object(details) for details in value]
-                if traverse_list:
-                    # Iterate through each season in the list of seasons
-                    for season in obj.__dict__[key]:
-                        self._populate_attributes(season, traverse_list=False)
-
-    @staticmethod
-    def _reconstruct_object(deserialized_data):
-        """Reconstruct an object if the class has been registered.
-
-        Check if the key in deserialized_data corresponds to a
-        registered class and if so, construct and return an
-        instance of the class with keyword arguments given in
-        value in deserialized_data.
-
-        Args:
-            deserialized_data: dictionary of deserialized data
+    @classmethod
+    def deserialize_show(cls, details):
+        """Construct a fully populated show from its entry in a database."""
+        return cls._decode(details)
 
-        Returns:
-            an instance of a registered class
-        """
-        for key, value in deserialized_data.items():
-            key = key.strip('__')
-            if key in registry:
-                # Gather the keyword arguments for class *key*
-                kwargs = dict(value.items())
-                return registry[key](**kwargs)
+    @classmethod
+    def _decode(cls, value):
+        # Decode innermost first, as json.load does with an object_hook
+        if isinstance(value, dict):
+            for k, v in value.items():
+                if isinstance(v, (dict, list)):
+                    value[k] = cls._decode(v)
+            return decode_registered(value)
+        elif isinstance(value, list):
+            return [cls._decode(v) if isinstance(v, (dict, list)) else v for v in value]
+        return value
 
 
 registry = {}
 
+# JSON encoder of each registered class, keyed by the exact class, see
+# compile_encoder.
+encoders = {}
+
 
 def register_class(target_class):
     registry[target_class.__name__] = target_class
+    encoders[target_class] = compile_encoder(target_class)
+
+
+def compile_encoder(cls):
+    """Return a function which encodes an instance of *cls* for EncodeShow.
+
+    The function is specialised for how *cls* is written: its serialized
+    name is worked out once, the fields of a slotted class are read with a
+    single attrgetter, and the instance dict is passed straight through
+    unless the class has transient attributes or its own
+    serializable_attributes.
+    """
+    key = '__{}__'.format(cls._serialized_as or cls.__name__)
+
+    # The default serializable_attributes is defined by the root
+    # registered class, the last class before object in the MRO.
+    if any('serializable_attributes' in vars(base) for base in cls.__mro__[:-2]):
+        def encode(obj):
+            return {key: obj.serializable_attributes()}
+    elif cls._fields is not None:
+        fields = cls._fields
+        getter = operator.attrgetter(*fields)
+
+        def encode(obj):
+            return {key: dict(zip(fields, getter(obj)))}
+    elif cls._transient:
+        transient = frozenset(cls._transient)
+
+        def encode(obj):
+            return {key: {k: v for k, v in obj.__dict__.items() if k not in transient}}
+    else:
+        def encode(obj):
+            return {key: obj.__dict__}
+
+    return encode
 
 
 class Meta(type):
@@ -370,16 +496,50 @@ class Meta(type):
 
 
 class RegisteredSerializable(metaclass=Meta):
+    # Subclasses which are created in large numbers, e.g., Episode, declare
+    # __slots__ so their instances have no __dict__.
+    __slots__ = ()
+
+    # Names of the attributes which are written to disk, in order, for a
+    # class with __slots__. None if the instance dict is written.
+    _fields = None
+
+    # Names of instance attributes which only matter while the object is in
+    # memory, and are not written to disk.
+    _transient = ()
+
+    # Name of the registered class which instances are written as, if not
+    # their own class, e.g., a view which is written as the class it mimics.
+    _serialized_as = None
+
     @classmethod
     def load(cls, **kwargs):
         return cls(**kwargs)
 
+    def serialized_name(self):
+        """Return the name of the class this instance is written as."""
+        return self._serialized_as or type(self).__name__
+
+    def serializable_attributes(self):
+        """Return the instance attributes which are written to disk."""
+        if self._fields is not None:
+            return {field: getattr(self, field) for field in self._fields}
+        if not self._transient:
+            return self.__dict__
+        return {k: v for k, v in self.__dict__.items() if k not in self._transient}
+
 
 class EncodeShow(json.JSONEncoder):
     def default(self, obj):
-        if isinstance(obj, tuple(registry.values())):
-            key = '__{}__'.format(obj.__class__.__name__)
-            return {key: obj.__dict__}
+        encoder = encoders.get(type(obj))
+        if encoder is not None:
+            return encoder(obj)
+        elif isinstance(obj, collections.abc.Mapping):
+            # e.g., the shows of a lazily loaded database
+            return dict(obj)
+        elif isinstance(obj, collections.abc.Sequence):
+            # e.g., the episodes of a season held in columns
+            return list(obj)
         return json.JSONEncoder.default(self, obj)
 
 